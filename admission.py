@@ -0,0 +1,301 @@
+"""Admission control in front of ``Me.chat_stream``.
+
+Every chat message and menu press starts a full generation, and nothing
+stopped one visitor (or a script) from starting dozens at once and pushing
+everyone else's turns behind them. Two layers keep latency predictable:
+
+- ``admit(session_id, ip)``: token buckets per session and per client IP,
+  ``ADMISSION_SESSION_RATE``/``ADMISSION_SESSION_BURST`` (default one turn
+  every 3 s, bursts of 5) and ``ADMISSION_IP_RATE``/``ADMISSION_IP_BURST``
+  (1/s, bursts of 20, for offices behind one NAT). Rates are turns per
+  second, 0 turns a limit off. Callers check this before a turn, since only
+  they know the visitor.
+- ``upstream(open_stream)``: at most ``ADMISSION_MAX_STREAMS`` (default 32)
+  concurrent provider streams per process. ``Me`` takes a slot only for
+  turns that go upstream (cache replays and followers of an in-flight menu
+  answer are free) and holds it until the stream ends or is closed. When
+  every slot is taken, up to ``ADMISSION_QUEUE`` (default 64) turns wait
+  FIFO for at most ``ADMISSION_MAX_WAIT`` seconds (default 5, traced as
+  ``admission_wait``); beyond that they are turned away at once.
+  ``aupstream`` is the same for async iterators (the chat API's native
+  streams); only a queued wait takes a worker thread. A hedged turn's
+  second stream takes an extra slot with ``try_slot`` (see ``hedging``).
+
+A turn that is not admitted raises ``Busy`` with a reason and
+``retry_after`` seconds: the app shows a short "busy" note, the chat API
+answers 429 (rate limits) or 503 (no slot) with ``Retry-After``. Limits are
+per process, like the rest of the in-memory state.
+"""
+
+import asyncio
+import math
+import os
+import threading
+import time
+import weakref
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+
+from tracing import span
+
+RATE_LIMITED = ("session", "ip")
+REASONS = RATE_LIMITED + ("queue_full", "queue_timeout")
+
+
+class Busy(Exception):
+    """The turn was not admitted; retry after ``retry_after`` seconds."""
+
+    def __init__(self, reason, retry_after):
+        super().__init__(f"busy ({reason}), retry after {retry_after:.1f}s")
+        self.reason = reason
+        self.retry_after = retry_after
+
+    @property
+    def status_code(self):
+        return 429 if self.reason in RATE_LIMITED else 503
+
+    @property
+    def retry_after_header(self):
+        return str(max(math.ceil(self.retry_after), 1))
+
+
+class TokenBucket:
+    def __init__(self, rate, burst, now):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.stamp = now
+
+    def take(self, now):
+        """Take one token; 0 if admitted, else seconds until one is free."""
+        self.tokens = min(self.burst, self.tokens + (now - self.stamp) * self.rate)
+        self.stamp = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class RateLimiter:
+    """One ``TokenBucket`` per key, least recently used evicted first."""
+
+    def __init__(self, rate, burst, maxsize=10000, clock=time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self.maxsize = maxsize
+        self.clock = clock
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def check(self, key):
+        """0 if ``key`` may proceed, else seconds to wait."""
+        if not self.rate or not key:
+            return 0.0
+        now = self.clock()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = TokenBucket(self.rate, self.burst, now)
+                while len(self._buckets) > self.maxsize:
+                    self._buckets.popitem(last=False)
+            self._buckets.move_to_end(key)
+            return bucket.take(now)
+
+
+class _Slot:
+    """Releases its slot once, however many times it is called."""
+
+    def __init__(self, controller):
+        self._controller = controller
+        self._lock = threading.Lock()
+        self._held = True
+
+    def __call__(self):
+        with self._lock:
+            held, self._held = self._held, False
+        if held:
+            self._controller.release()
+
+
+class AdmissionController:
+    def __init__(
+        self,
+        session_rate=1 / 3,
+        session_burst=5,
+        ip_rate=1.0,
+        ip_burst=20,
+        max_streams=32,
+        max_queue=64,
+        max_wait=5.0,
+        clock=time.monotonic,
+    ):
+        self.sessions = RateLimiter(session_rate, session_burst, clock=clock)
+        self.ips = RateLimiter(ip_rate, ip_burst, clock=clock)
+        self.max_streams = max_streams
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.clock = clock
+        self.active = 0
+        self._waiting = deque()
+        self._cond = threading.Condition()
+        self.stats = dict.fromkeys(("admitted", "queued") + REASONS, 0)
+
+    # -- per-visitor rate limits -------------------------------------------
+
+    def admit(self, session_id=None, ip=None):
+        """Raise ``Busy`` if the session or IP is over its rate."""
+        for reason, limiter, key in (
+            ("session", self.sessions, session_id),
+            ("ip", self.ips, ip),
+        ):
+            wait = limiter.check(key)
+            if wait:
+                self._reject(reason)
+                raise Busy(reason, wait)
+
+    # -- global upstream slots ---------------------------------------------
+
+    def try_acquire(self):
+        """Take a free upstream slot without waiting; False if none is."""
+        with self._cond:
+            if self.active < self.max_streams and not self._waiting:
+                self.active += 1
+                self.stats["admitted"] += 1
+                return True
+            return False
+
+    def acquire(self):
+        """Take an upstream slot, waiting in the queue if needed."""
+        if self.try_acquire():
+            return
+        with self._cond:
+            if len(self._waiting) >= self.max_queue:
+                self.stats["queue_full"] += 1
+                raise Busy("queue_full", self.max_wait)
+            ticket = object()
+            self._waiting.append(ticket)
+            self.stats["queued"] += 1
+            deadline = self.clock() + self.max_wait
+            with span("admission_wait"):
+                try:
+                    while not (
+                        self._waiting[0] is ticket and self.active < self.max_streams
+                    ):
+                        remaining = deadline - self.clock()
+                        if remaining <= 0:
+                            self.stats["queue_timeout"] += 1
+                            raise Busy("queue_timeout", self.max_wait)
+                        self._cond.wait(remaining)
+                    self.active += 1
+                    self.stats["admitted"] += 1
+                finally:
+                    self._waiting.remove(ticket)
+                    self._cond.notify_all()  # the next in line may go now
+
+    def release(self):
+        with self._cond:
+            self.active -= 1
+            self._cond.notify_all()
+
+    def try_slot(self):
+        """Release callable for one more slot taken without waiting, or None
+        if none is free (optional extra streams, e.g. a hedge)."""
+        if not self.max_streams:
+            return lambda: None
+        return _Slot(self) if self.try_acquire() else None
+
+    @contextmanager
+    def slot(self):
+        """Hold an upstream slot for a non-streaming call."""
+        if not self.max_streams:
+            yield
+            return
+        self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def upstream(self, open_stream):
+        """``open_stream()``, holding a slot until the stream is finished,
+        closed or garbage collected."""
+        if not self.max_streams:
+            return open_stream()
+        self.acquire()
+        release = _Slot(self)
+        try:
+            chunks = open_stream()
+        except BaseException:
+            release()
+            raise
+        held = _hold(chunks, release)
+        weakref.finalize(held, release)  # never iterated, e.g. the caller failed
+        return held
+
+    async def aupstream(self, open_stream):
+        """``upstream`` for an async iterator returned by ``open_stream()``."""
+        if not self.max_streams:
+            return open_stream()
+        if not self.try_acquire():
+            waiter = asyncio.ensure_future(asyncio.to_thread(self.acquire))
+            try:
+                await asyncio.shield(waiter)
+            except asyncio.CancelledError:  # caller gone: free a late slot
+                waiter.add_done_callback(
+                    lambda f: f.cancelled() or f.exception() or self.release()
+                )
+                raise
+        release = _Slot(self)
+        try:
+            chunks = open_stream()
+        except BaseException:
+            release()
+            raise
+        held = _ahold(chunks, release)
+        weakref.finalize(held, release)
+        return held
+
+    def snapshot(self):
+        with self._cond:
+            return dict(self.stats, active=self.active, waiting=len(self._waiting))
+
+    def _reject(self, reason):
+        with self._cond:
+            self.stats[reason] += 1
+
+
+def _hold(chunks, release):
+    try:
+        yield from chunks
+    finally:
+        release()
+
+
+async def _ahold(chunks, release):
+    try:
+        async for item in chunks:
+            yield item
+    finally:
+        release()
+
+
+_controller = None
+_controller_lock = threading.Lock()
+
+
+def get_admission_controller():
+    """Return the process-wide ``AdmissionController``."""
+    global _controller
+    if _controller is None:
+        with _controller_lock:
+            if _controller is None:
+                _controller = AdmissionController(
+                    session_rate=float(os.getenv("ADMISSION_SESSION_RATE", "0.333")),
+                    session_burst=float(os.getenv("ADMISSION_SESSION_BURST", "5")),
+                    ip_rate=float(os.getenv("ADMISSION_IP_RATE", "1")),
+                    ip_burst=float(os.getenv("ADMISSION_IP_BURST", "20")),
+                    max_streams=int(os.getenv("ADMISSION_MAX_STREAMS", "32")),
+                    max_queue=int(os.getenv("ADMISSION_QUEUE", "64")),
+                    max_wait=float(os.getenv("ADMISSION_MAX_WAIT", "5")),
+                )
+    return _controller
@@ -1,29 +1,15 @@
-import re
+import os
 import streamlit as st
-import time
 import uuid
-import requests
-from me_chatbot import Me
-
-# 🚀 SILENT KEEP-AWAKE (Hidden from users)
-if "ping_count" not in st.session_state:
-    st.session_state.ping_count = 0
-    st.session_state.last_ping = time.time()
-
-# Silent ping every 10th reload or every 30 minutes
-current_time = time.time()
-if (st.session_state.ping_count % 10 == 0 or 
-    (current_time - st.session_state.last_ping) > 1800):  # 30 minutes
-    
-    try:
-        # Silent ping - no user feedback
-        requests.get("https://almateus.me", timeout=5)
-        st.session_state.last_ping = current_time
-    except:
-        pass  # Silent fail
-
-st.session_state.ping_count += 1
+from admission import Busy, get_admission_controller
+from me_chatbot import extract_email, get_me, localize_prompt, warm_up
+from scheduler import start_maintenance
+from session_store import get_session_store
+from stream_render import render_stream
+from tracing import get_tracer
 
+# 🔌 Optional: use the headless chat API (chat_api.py) instead of local logic
+CHAT_API_URL = os.getenv("CHAT_API_URL")
 
 # 🌐 Layout
 st.set_page_config(
@@ -149,7 +135,7 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 # 🌍 Language options
-@st.cache_data(ttl=3600)  # ✅ ADD CACHING
+@st.cache_resource  # ✅ one shared dict per process (cache_data copies it every rerun)
 def get_language_options():
     return {
         "English": {
@@ -158,6 +144,8 @@ def get_language_options():
             "consult_prompt": "💡 If you'd like a consultation with Al, feel free to share your email below. The chat will continue regardless.",
             "consult_input": "📧 Your email (optional)",
             "consult_success": "✅ Thanks! Al has been notified and will reach out to you soon.",
+            "show_earlier": "Show {count} earlier messages",
+            "busy": "⏳ Lots of questions right now. Please try again in {seconds} s.",
             "menu": ["📊 Projects", "💼 Experience", "🛠 Skills"]
         },
         "中文 (Chinese)": {
@@ -166,6 +154,8 @@ def get_language_options():
             "consult_prompt": "💡 如果您希望与 Al 进行咨询，请在下方留下您的邮箱。聊天将继续进行。",
             "consult_input": "📧 您的邮箱（可选）",
             "consult_success": "✅ 感谢！Al 已经收到通知，很快会与您联系。",
+            "show_earlier": "显示更早的 {count} 条消息",
+            "busy": "⏳ 当前提问较多，请 {seconds} 秒后再试。",
             "menu": ["📊 项目", "💼 经历", "🛠 技能"]
         },
         "Español": {
@@ -174,6 +164,8 @@ def get_language_options():
             "consult_prompt": "💡 Si deseas una consulta con Al, puedes dejar tu correo abajo. El chat seguirá normalmente.",
             "consult_input": "📧 Tu correo electrónico (opcional)",
             "consult_success": "✅ ¡Gracias! Al ha sido notificado y se pondrá en contacto contigo pronto.",
+            "show_earlier": "Mostrar {count} mensajes anteriores",
+            "busy": "⏳ Hay muchas preguntas ahora mismo. Inténtalo de nuevo en {seconds} s.",
             "menu": ["📊 Proyectos", "💼 Experiencia", "🛠 Habilidades"]
         }
     }
@@ -207,17 +199,29 @@ st.session_state.selected_lang = selected_lang
 ui = language_options[selected_lang]
 
 # 🧠 Session state
+if "session_id" not in st.session_state:
+    st.session_state.session_id = str(uuid.uuid4())
+
+# 💬 Compact history, spooled to disk while the session is idle (session_store.py)
+history = get_session_store().get(st.session_state.session_id)
+
+if "memory" not in st.session_state:
+    from history_manager import ConversationMemory
+    st.session_state.memory = ConversationMemory()
 if "lang_prev" not in st.session_state:
     st.session_state.lang_prev = selected_lang
 if st.session_state.lang_prev != selected_lang:
-    st.session_state.history = []
+    history.clear()
+    st.session_state.memory.reset()
     st.session_state.lang_prev = selected_lang
 
-if "history" not in st.session_state:
-    st.session_state.history = []
-
-if "session_id" not in st.session_state:
-    st.session_state.session_id = str(uuid.uuid4())
+# 🌍 Resolve visitor country ONCE per session (offline IP index, no network)
+if "user_country" not in st.session_state:
+    from geo import get_visitor_ip
+    from me_chatbot import get_user_country
+    st.session_state.visitor_ip = get_visitor_ip()  # also keys the IP rate limit
+    with get_tracer().start("session_start") as trace, trace.span("geo"):
+        st.session_state.user_country = get_user_country(st.session_state.visitor_ip)
 
 if "user_input" not in st.session_state:
     st.session_state.user_input = ""
@@ -232,8 +236,13 @@ if "email_prompt_shown" not in st.session_state:
     st.session_state.email_prompt_shown = False
 # >>> END CHANGE 1 <<<
 
-# 🤖 Load bot
-me = Me()
+# 🤖 Load bot: one instance per process, only when a question comes in
+@st.cache_resource
+def load_bot():
+    if CHAT_API_URL:
+        from chat_client import RemoteMe
+        return RemoteMe(CHAT_API_URL)
+    return get_me()
 
 # 🧢 Header
 #st.markdown(f"## {ui['title']}")
@@ -249,9 +258,14 @@ for idx, item in enumerate(menu_items):
     with cols[idx]:
         if st.button(item, key=f"menu_{idx}", use_container_width=True):
             st.session_state.user_input = f"Show me {item}"
-
-# 💬 History rendering
-for user, bot in st.session_state.history:
+            st.session_state.canned_prompt = True
+
+# 💬 History rendering: the recent turns; older (compressed) ones on request
+first_turn = history.hot_start
+earlier = first_turn - history.dropped
+if earlier and st.toggle(ui["show_earlier"].format(count=earlier), key="show_earlier"):
+    first_turn = history.dropped
+for user, bot in history[first_turn:]:
     with st.chat_message("user", avatar="🧑"):
         st.markdown(
             f"""
@@ -269,33 +283,46 @@ for user, bot in st.session_state.history:
 # 🧾 Input box
 user_input = st.chat_input(ui["input_placeholder"])
 
+is_canned_prompt = False
 if st.session_state.user_input:
     user_input = st.session_state.user_input
     st.session_state.user_input = ""
+    is_canned_prompt = st.session_state.pop("canned_prompt", False)
 
-if user_input:
+# 🚦 Per-session / per-IP rate limits before any work (see admission.py)
+busy = None
+if user_input and not CHAT_API_URL:  # the chat API admits its own turns
+    try:
+        get_admission_controller().admit(
+            st.session_state.session_id, st.session_state.get("visitor_ip")
+        )
+    except Busy as e:
+        busy = e
+
+if busy is not None:
+    st.warning(ui["busy"].format(seconds=busy.retry_after_header))
+elif user_input:
+    me = load_bot()
     st.session_state.prompt_count += 1
     display_input = user_input
 
     contact_keywords = ["contact", "reach", "connect", "talk", "email", "get in touch"]
 
     # 📧 Capture email typed directly in chat
-    email_match = re.search(r"[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}", user_input)
-    if email_match and not st.session_state.get("email"):
+    user_email = extract_email(user_input)
+    if user_email and not st.session_state.get("email"):
         from me_chatbot import send_email_alert
-        user_email = email_match.group(0)
         try:
-            send_email_alert(user_email)
+            if not CHAT_API_URL:  # the chat API sends its own alert
+                send_email_alert(user_email, st.session_state.session_id)
             st.success(f"✅ Thanks! Al has been notified of your email: {user_email}")
             st.session_state.email = user_email
         except Exception as e:
             st.error(f"❌ Failed to send email: {e}")
 
     # ---- multilingual transform after we've done any email capture ----
-    if selected_lang == "中文 (Chinese)":
-        user_input = f"请用中文回答：{user_input}"
-    elif selected_lang == "Español":
-        user_input = f"Por favor responde en español: {user_input}"
+    if not CHAT_API_URL:  # the chat API localizes server-side
+        user_input = localize_prompt(user_input, selected_lang)
 
     # ---- show email input ONCE if conditions match and we don't have an email yet ----
     should_suggest_email = (
@@ -330,37 +357,83 @@ if user_input:
         full_response = ""
         
         # ✅ USE STREAMING INSTEAD OF REGULAR CHAT
+        remote_kwargs = (
+            {
+                "session_id": st.session_state.session_id,
+                "client_ip": st.session_state.get("visitor_ip"),
+            }
+            if CHAT_API_URL else {}
+        )
+        # ⏱️ Per-stage timings for this turn (see tracing.py)
+        trace = get_tracer().start(
+            "chat", session_id=st.session_state.session_id, language=selected_lang
+        )
         try:
             # Just pass the history as-is (list of tuples)
-            chat_history = st.session_state.history
+            chat_history = history
                        
-            stream_generator = me.chat_stream(user_input, chat_history)
-            
-            for chunk, current_full in stream_generator:
-                full_response = current_full
-                stream_box.markdown(full_response + "▌")
+            with trace.active():
+                stream_generator = me.chat_stream(
+                    user_input, chat_history,
+                    user_country=st.session_state.user_country,
+                    memory=st.session_state.memory,
+                    language=selected_lang,
+                    cacheable=is_canned_prompt,  # ✅ menu answers are shared + cached
+                    **remote_kwargs,
+                )
             
-            stream_box.markdown(full_response)
+            # ✅ Coalesce chunks into frames instead of re-rendering per token
+            full_response = render_stream(
+                trace.stream(stream_generator), stream_box.markdown
+            )
             
+        except Busy as e:
+            # No upstream slot in time: say so instead of piling on a fallback
+            trace.status = "busy"
+            busy = e
+            stream_box.warning(ui["busy"].format(seconds=e.retry_after_header))
         except Exception as e:
-            # Fallback if streaming with history fails
-            fallback_response = me.chat(user_input, [])
-            stream_box.markdown(fallback_response)
-            full_response = fallback_response
+            trace.status = "error"
+            # Fallback if streaming fails - keep the conversation context
+            try:
+                fallback_response = me.chat(
+                    user_input, history,
+                    user_country=st.session_state.user_country,
+                    memory=st.session_state.memory,
+                    language=selected_lang,
+                    **remote_kwargs,
+                )
+                stream_box.markdown(fallback_response)
+                full_response = fallback_response
+            except Busy as e:
+                # The fallback waits for an upstream slot too
+                trace.status = "busy"
+                busy = e
+                stream_box.warning(ui["busy"].format(seconds=e.retry_after_header))
+
+    if busy is None:
+        # 💾 Save to history
+        history.append((display_input, full_response))
+
+        # 💾 Ship this turn to the background chat log (non-blocking)
+        from chat_log import get_chat_shipper
+        try:
+            if not CHAT_API_URL:  # the chat API logs its own transcripts
+                with trace.span("persist"):
+                    get_chat_shipper().record_turn(
+                        st.session_state.session_id,
+                        st.session_state.selected_lang,  # Keep language context
+                        display_input,
+                        full_response,
+                    )
+        except Exception as e:
+            # Silent fail - don't break the chat experience
+            pass
+    trace.finish()
 
-    # 💾 Save to history
-    st.session_state.history.append((display_input, full_response))
+# 🔥 Page is rendered: build the bot in the background for the first question
+if not CHAT_API_URL:
+    warm_up()
 
-    # ✅ CORRECT LOCATION: Save to S3 AFTER each message - WITH DEBUGGING
-    from me_chatbot import save_chat_to_s3
-    try:
-        
-        result = save_chat_to_s3(
-            history=st.session_state.history, 
-            session_id=st.session_state.session_id,
-            language=st.session_state.selected_lang  # Keep language context
-        )
-        
-    except Exception as e:
-        # Silent fail - don't break the chat experience
-        pass
\ No newline at end of file
+# ⏰ Keep-warm ping, log flush etc. run on one background thread per process
+start_maintenance()
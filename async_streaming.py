@@ -0,0 +1,268 @@
+"""Asyncio streaming engine for provider calls.
+
+The synchronous stream generators hold a thread for the whole upstream
+generation: socket reads, SSE parsing and all. This engine runs every
+upstream stream as a task on one background event loop, using
+``AsyncOpenAI`` and an ``httpx.AsyncClient`` for DeepSeek's SSE, so the
+sockets, pools and parsing live on a single thread.
+
+Each generation feeds a bounded ``asyncio.Queue`` (backpressure if a reader
+falls behind). ``AsyncStreamEngine.stream`` is the thin sync adapter that
+``call_openai_stream``/``call_deepseek_stream`` use: it yields text chunks
+like the sync calls, pulling queued chunks across threads in batches, and
+cancels the upstream task if the reader stops early. The adapter's caller
+still blocks one thread per open stream, which is what the Streamlit script
+thread does anyway. ``astream`` is the native path: it can be iterated from
+any event loop without a thread per stream, and the chat API's
+``Me.achat_stream`` uses it for free-text turns.
+``benchmarks/load_async_stream.py`` measures both.
+
+Enable with ``LLM_ASYNC_ENGINE=1``; pool/timeout settings are shared with
+``provider_clients.PoolConfig``.
+"""
+
+import asyncio
+import os
+import threading
+
+from prompt_cache import get_usage_tracker
+from provider_clients import DEEPSEEK_DEFAULT_BASE_URL, PoolConfig
+from sse_parser import aiter_content
+from tracing import current
+
+_END = object()
+_CONNECTED = object()  # response headers arrived
+
+
+class AsyncStreamEngine:
+    """Background event loop that owns async provider clients."""
+
+    def __init__(self, config=None, queue_size=64):
+        self.config = config or PoolConfig()
+        self.queue_size = queue_size
+        self.loop = asyncio.new_event_loop()
+        self._openai = None
+        self._http = None
+        self._thread = threading.Thread(
+            target=self.loop.run_forever, name="async-stream-engine", daemon=True
+        )
+        self._thread.start()
+
+    # -- clients (created on the loop thread) -------------------------------
+
+    def _limits(self):
+        import httpx
+
+        cfg = self.config
+        return dict(
+            limits=httpx.Limits(
+                max_connections=cfg.pool_size,
+                max_keepalive_connections=cfg.pool_size,
+                keepalive_expiry=cfg.keepalive_expiry,
+            ),
+            timeout=httpx.Timeout(cfg.read_timeout, connect=cfg.connect_timeout),
+        )
+
+    def _openai_client(self):
+        if self._openai is None:
+            import httpx
+            from openai import AsyncOpenAI
+
+            self._openai = AsyncOpenAI(
+                api_key=os.getenv("OPENAI_API_KEY"),
+                base_url=os.getenv("OPENAI_BASE_URL") or None,
+                http_client=httpx.AsyncClient(**self._limits()),
+            )
+        return self._openai
+
+    def _http_client(self):
+        if self._http is None:
+            import httpx
+
+            self._http = httpx.AsyncClient(**self._limits())
+        return self._http
+
+    # -- producers -----------------------------------------------------------
+
+    async def _openai_chunks(self, messages, model, options):
+        stream = await self._openai_client().chat.completions.create(
+            model=model,
+            messages=messages,
+            stream=True,
+            stream_options={"include_usage": True},
+            **options,
+        )
+        yield _CONNECTED
+        async for chunk in stream:
+            if getattr(chunk, "usage", None) is not None:
+                get_usage_tracker().record("openai", model, chunk.usage)
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+    async def _deepseek_chunks(self, messages, model, options):
+        base = os.getenv("DEEPSEEK_BASE_URL", DEEPSEEK_DEFAULT_BASE_URL)
+        payload = {
+            "model": model,
+            "messages": messages,
+            "stream": True,
+            "stream_options": {"include_usage": True},
+            **options,
+        }
+        headers = {"Authorization": f"Bearer {os.getenv('DEEPSEEK_API_KEY')}"}
+        async with self._http_client().stream(
+            "POST",
+            base.rstrip("/") + "/chat/completions",
+            json=payload,
+            headers=headers,
+        ) as response:
+            response.raise_for_status()
+            yield _CONNECTED
+            chunks = aiter_content(
+                response.aiter_bytes(),
+                on_usage=lambda usage: get_usage_tracker().record(
+                    "deepseek", model, usage
+                ),
+            )
+            async for content in chunks:
+                yield content
+
+    async def _produce(self, provider, messages, model, options, queue):
+        chunks = self._openai_chunks if provider == "openai" else self._deepseek_chunks
+        try:
+            async for content in chunks(messages, model, options):
+                await queue.put(content)
+            await queue.put(_END)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            await queue.put(e)
+
+    @staticmethod
+    async def _get_batch(queue):
+        """Wait for at least one item, then take everything already queued."""
+        items = [await queue.get()]
+        while not queue.empty():
+            items.append(queue.get_nowait())
+        return items
+
+    # -- public API ----------------------------------------------------------
+
+    async def _start(self, provider, messages, model, options):
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        task = asyncio.ensure_future(
+            self._produce(provider, messages, model, options, queue)
+        )
+        return queue, task
+
+    async def astream(self, provider, messages, model, **options):
+        """Async generator of content chunks, for callers on any event loop.
+
+        On the engine's loop it reads the queue directly; from another loop
+        (the chat API's) each batch is awaited across loops, so no thread
+        waits while the stream is open.
+        """
+        connect = _ConnectTimer()
+        if asyncio.get_running_loop() is self.loop:
+            queue, task = await self._start(provider, messages, model, options)
+
+            def get_batch():
+                return self._get_batch(queue)
+
+        else:
+            queue, task = await asyncio.wrap_future(
+                asyncio.run_coroutine_threadsafe(
+                    self._start(provider, messages, model, options), self.loop
+                )
+            )
+
+            def get_batch():
+                return asyncio.wrap_future(
+                    asyncio.run_coroutine_threadsafe(self._get_batch(queue), self.loop)
+                )
+
+        try:
+            while True:
+                for item in await get_batch():
+                    if item is _END:
+                        return
+                    if isinstance(item, Exception):
+                        raise item
+                    if item is _CONNECTED:
+                        connect.record()
+                        continue
+                    yield item
+        finally:
+            self.loop.call_soon_threadsafe(task.cancel)
+
+    def stream(self, provider, messages, model, **options):
+        """Sync adapter yielding text chunks like the sync calls (the caller's
+        thread waits on every batch; see ``astream``)."""
+        connect = _ConnectTimer()
+        queue, task = asyncio.run_coroutine_threadsafe(
+            self._start(provider, messages, model, options), self.loop
+        ).result()
+        try:
+            while True:
+                batch = asyncio.run_coroutine_threadsafe(
+                    self._get_batch(queue), self.loop
+                ).result()
+                for item in batch:
+                    if item is _END:
+                        return
+                    if isinstance(item, Exception):
+                        raise item
+                    if item is _CONNECTED:
+                        connect.record()
+                        continue
+                    yield item
+        finally:
+            self.loop.call_soon_threadsafe(task.cancel)
+
+
+class _ConnectTimer:
+    """Records the ``connect`` span into the caller's trace, if any (the
+    engine loop does not see the turn's context)."""
+
+    def __init__(self):
+        self.trace = current()
+        self.start = self.trace.tracer.clock() if self.trace is not None else None
+
+    def record(self):
+        if self.trace is not None:
+            self.trace.record("connect", self.trace.tracer.clock() - self.start)
+
+
+async def iterate_in_thread(chunks):
+    """Async iterator over a sync stream, one worker-thread hop per chunk
+    (what Starlette does for a sync ``StreamingResponse`` body)."""
+    iterator = iter(chunks)
+    done = object()
+    try:
+        while True:
+            item = await asyncio.to_thread(next, iterator, done)
+            if item is done:
+                return
+            yield item
+    finally:
+        if hasattr(iterator, "close"):
+            await asyncio.to_thread(iterator.close)
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_engine():
+    """Return the process-wide ``AsyncStreamEngine`` (started on first use)."""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = AsyncStreamEngine(
+                    queue_size=int(os.getenv("LLM_STREAM_QUEUE_SIZE", "64"))
+                )
+    return _engine
+
+
+def async_engine_enabled():
+    return os.getenv("LLM_ASYNC_ENGINE", "").lower() in ("1", "true", "yes")
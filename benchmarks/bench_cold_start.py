@@ -0,0 +1,124 @@
+"""Cold-start report: per-module import time and time to first page.
+
+Usage::
+
+    python benchmarks/bench_cold_start.py --runs 5 --top 15
+
+Every measurement runs in a fresh interpreter, like a host waking a
+sleeping app:
+
+- ``import me_chatbot`` under ``python -X importtime``: wall time plus the
+  slowest modules it pulls in (cumulative and self time, median of runs);
+- ``get_me()``: import plus the first ``Me`` (resume load, index load or
+  build, frozen prompt);
+- first rendered page: ``app.py`` run once through Streamlit's ``AppTest``,
+  minus the same for a one-line page (Streamlit's own import and component
+  discovery, which the server pays at boot before any visitor arrives).
+
+Needs a resume: set ``RESUME_PATH`` (and ``RESUME_INDEX_DIR``) or keep
+``me/linkedin.md`` in place.
+"""
+
+import argparse
+import os
+import pathlib
+import re
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+IMPORTTIME = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)")
+
+TIMED = """
+import time
+start = time.perf_counter()
+{body}
+print("ELAPSED", time.perf_counter() - start)
+"""
+
+BODIES = {
+    "import me_chatbot": "import me_chatbot",
+    "first Me ready": (
+        "import me_chatbot\n"
+        "me = me_chatbot.get_me() if hasattr(me_chatbot, 'get_me') "
+        "else me_chatbot.Me()\n"
+        "me.build_messages('hello', [])"
+    ),
+    "streamlit + empty page": (
+        "from streamlit.testing.v1 import AppTest\n"
+        "at = AppTest.from_string('import streamlit as st\\nst.write(1)')\n"
+        "at.run()"
+    ),
+    "streamlit + first page": (
+        "from streamlit.testing.v1 import AppTest\n"
+        f"at = AppTest.from_file({str(ROOT / 'app.py')!r}, default_timeout=120)\n"
+        "at.run()\n"
+        "assert not at.exception, [e.message for e in at.exception]"
+    ),
+}
+
+
+def run(body, importtime=False):
+    cmd = [sys.executable]
+    if importtime:
+        cmd += ["-X", "importtime"]
+    cmd += ["-c", TIMED.format(body=body)]
+    env = dict(os.environ, PYTHONPATH=str(ROOT), RESUME_REFRESH_INTERVAL="0")
+    proc = subprocess.run(
+        cmd, cwd=ROOT, env=env, capture_output=True, text=True, timeout=300
+    )
+    if proc.returncode:
+        raise RuntimeError(proc.stderr[-2000:])
+    elapsed = float(re.search(r"ELAPSED (\S+)", proc.stdout).group(1))
+    return elapsed, proc.stderr
+
+
+def module_times(stderr):
+    """``{module: (self_us, cumulative_us, depth)}`` from ``-X importtime``."""
+    times = {}
+    for self_us, cumulative_us, indent, name in IMPORTTIME.findall(stderr):
+        times[name] = (int(self_us), int(cumulative_us), (len(indent) - 1) // 2)
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    results = {}
+    for label, body in BODIES.items():
+        samples = [run(body)[0] for _ in range(args.runs)]
+        results[label] = statistics.median(samples)
+        print(f"{label:>24}: {results[label] * 1000:8.1f} ms (median of {args.runs})")
+    page = results["streamlit + first page"] - results["streamlit + empty page"]
+    print(
+        f"{'app cold start':>24}: {page * 1000:8.1f} ms (first page minus empty page)"
+    )
+
+    cumulative = defaultdict(list)
+    own = defaultdict(list)
+    depth = {}
+    for _ in range(args.runs):
+        for name, (self_us, cum_us, level) in module_times(
+            run("import me_chatbot", importtime=True)[1]
+        ).items():
+            cumulative[name].append(cum_us)
+            own[name].append(self_us)
+            depth[name] = level
+    print("\nslowest imports under `import me_chatbot` (median, ms):")
+    print(f"{'cumulative':>11} {'self':>8}  module")
+    ranked = sorted(cumulative, key=lambda n: -statistics.median(cumulative[n]))
+    for name in ranked[: args.top]:
+        print(
+            f"{statistics.median(cumulative[name]) / 1000:11.1f} "
+            f"{statistics.median(own[name]) / 1000:8.1f}  "
+            f"{'  ' * depth[name]}{name}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+"""Memory per session: list of string tuples vs ``session_store``.
+
+Usage::
+
+    python benchmarks/bench_session_memory.py --sessions 500 --turns 12
+
+Builds ``--sessions`` histories of ``--turns`` turns each (about 1.5 KB
+answers in the bot's style: Markdown, emoji bullets, some Chinese) three
+ways and measures the Python heap with ``tracemalloc``:
+
+- ``list``: ``st.session_state.history`` as it was, ``(user, bot)`` tuples;
+- ``compact``: one ``SessionHistory`` per session (UTF-8 ``Turn`` records,
+  older turns compressed);
+- ``evicted``: the same sessions after ``SessionStore.evict_idle`` spooled
+  them to a temporary directory (what an idle session costs).
+
+It also shows what every Streamlit rerun re-emits (the Markdown of all
+turns before, of the hot turns now) and times reading them and
+``ConversationMemory.messages``; decoding UTF-8 and the occasional
+decompression costs microseconds per turn.
+"""
+
+import argparse
+import gc
+import pathlib
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+
+from history_manager import ConversationMemory  # noqa: E402
+from session_store import SessionHistory, SessionStore  # noqa: E402
+
+WORDS = (
+    "I deployed **Agentic AI** and MLOps platforms across 9 countries, "
+    "cutting delivery time by 80% with multi-agent pipelines on Azure DevOps. "
+    "我在深圳和香港之间工作。 Landing Zones, FastAPI, MLflow, Evidently, "
+    "Streamlit and Kubernetes across AWS, Azure and GCP."
+).split(" ")
+BULLETS = ("✅", "🚀", "📊", "🛠️", "💼")
+QUESTIONS = (
+    "What do you do?",
+    "Tell me about your AWS experience.",
+    "Can you give a concrete example?",
+    "Which technologies did you use there?",
+    "Show me 📊 Projects",
+)
+
+
+def answer(rng, chars):
+    lines = []
+    size = 0
+    while size < chars:
+        line = f"{rng.choice(BULLETS)} " + " ".join(
+            rng.choice(WORDS) for _ in range(rng.randint(8, 20))
+        )
+        lines.append(line)
+        size += len(line)
+    return "\n".join(lines)
+
+
+def conversations(args):
+    rng = random.Random(args.seed)
+    return [
+        [
+            (rng.choice(QUESTIONS), answer(rng, args.answer_chars))
+            for _ in range(args.turns)
+        ]
+        for _ in range(args.sessions)
+    ]
+
+
+def measure(build):
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    kept = build()
+    gc.collect()
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return kept, used
+
+
+def timed(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=500)
+    parser.add_argument("--turns", type=int, default=12)
+    parser.add_argument("--answer-chars", type=int, default=1500)
+    parser.add_argument("--hot-turns", type=int, default=6)
+    parser.add_argument("--max-bytes", type=int, default=64 * 1024)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    # Each variant generates its own text so that only what it keeps counts.
+    limits = {"hot_turns": args.hot_turns, "max_bytes": args.max_bytes}
+
+    def lists():
+        return conversations(args)
+
+    def compact():
+        histories = []
+        for turns in conversations(args):
+            history = SessionHistory(**limits)
+            for turn in turns:
+                history.append(turn)
+            histories.append(history)
+        return histories
+
+    baseline, list_bytes = measure(lists)
+    histories, compact_bytes = measure(compact)
+
+    clock = [0.0]
+    spool = pathlib.Path(tempfile.mkdtemp(prefix="session-spool-"))
+    store = SessionStore(spool, **limits, idle_timeout=60, clock=lambda: clock[0])
+
+    def evicted():
+        for i, turns in enumerate(conversations(args)):
+            history = store.get(f"s{i:05d}")
+            for turn in turns:
+                history.append(turn)
+        clock[0] += 120
+        store.evict_idle()
+        return store
+
+    _, evicted_bytes = measure(evicted)
+    disk = sum(p.stat().st_size for p in spool.iterdir())
+    restored = store.get("s00000")
+    source = conversations(args)
+
+    n = args.sessions
+    print(
+        f"{n} sessions x {args.turns} turns, ~{args.answer_chars} char answers, "
+        f"{args.hot_turns} hot turns, cap {args.max_bytes} bytes\n"
+    )
+    print(f"{'':>10} {'heap':>12} {'per session':>12}")
+    for label, used in (
+        ("list", list_bytes),
+        ("compact", compact_bytes),
+        ("evicted", evicted_bytes),
+    ):
+        print(f"{label:>10} {used / 1024:10.0f} KB {used / n / 1024:9.1f} KB")
+    print(
+        f"\ncompact is {compact_bytes / list_bytes:.0%} of list, evicted "
+        f"{evicted_bytes / list_bytes:.1%}; spool on disk {disk / n / 1024:.1f} KB "
+        f"per session; restored turns match: {restored[:] == source[0]}"
+    )
+
+    old, new = baseline[0], histories[0]
+    repeat = 200
+    render_all = timed(lambda: [(u, b) for u, b in old], repeat)
+    render_hot = timed(lambda: new[new.hot_start :], repeat)
+    sent_all = sum(len((u + b).encode("utf-8")) for u, b in old)
+    sent_hot = sum(len((u + b).encode("utf-8")) for u, b in new[new.hot_start :])
+    memory_old, memory_new = ConversationMemory(), ConversationMemory()
+    prompt_old = timed(lambda: memory_old.messages(old), repeat)
+    prompt_new = timed(lambda: memory_new.messages(new), repeat)
+    print(
+        f"\nper rerun: {len(old)} turns, {sent_all / 1024:.1f} KB of Markdown "
+        f"re-emitted, {render_all:.1f} us to read (list) vs "
+        f"{len(old) - new.hot_start} hot turns, {sent_hot / 1024:.1f} KB, "
+        f"{render_hot:.1f} us"
+    )
+    print(
+        f"per prompt: ConversationMemory.messages {prompt_old:.1f} us (list) vs "
+        f"{prompt_new:.1f} us"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""Microbenchmark: line-based DeepSeek SSE decoding vs ``sse_parser``.
+
+Usage::
+
+    python benchmarks/bench_sse_parser.py --repeat 200 --chunk-size 512
+
+Replays the recorded streams in ``streams/`` through a ``requests``
+``Response`` backed by an in-memory body, so both paths go through the
+same ``iter_content`` reads. The legacy path is the loop
+``call_deepseek_stream`` used before (``iter_lines`` + ``decode`` +
+``json.loads`` per line); the new one feeds raw chunks to
+``sse_parser.iter_content``. Reports time per stream, throughput and peak
+traced memory, and checks both produce the same answer.
+"""
+
+import argparse
+import io
+import json
+import pathlib
+import sys
+import time
+import tracemalloc
+
+import requests
+
+ROOT = pathlib.Path(__file__).resolve().parent
+sys.path.insert(0, str(ROOT.parent))
+
+from sse_parser import iter_content  # noqa: E402
+
+
+def response_for(data):
+    response = requests.Response()
+    response.raw = io.BytesIO(data)
+    response.status_code = 200
+    return response
+
+
+def legacy(response, chunk_size):
+    for line in response.iter_lines(chunk_size=chunk_size):
+        if line:
+            line = line.decode("utf-8")
+            if line.startswith("data: "):
+                data = line[6:]
+                if data != "[DONE]":
+                    try:
+                        chunk = json.loads(data)
+                        if "choices" in chunk and chunk["choices"]:
+                            delta = chunk["choices"][0].get("delta", {})
+                            if "content" in delta and delta["content"]:
+                                yield delta["content"]
+                    except json.JSONDecodeError:
+                        continue
+
+
+def incremental(response, chunk_size):
+    yield from iter_content(response.iter_content(chunk_size=chunk_size))
+
+
+def measure(decode, data, repeat, chunk_size):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        text = "".join(decode(response_for(data), chunk_size))
+    elapsed = (time.perf_counter() - start) / repeat
+    tracemalloc.start()
+    "".join(decode(response_for(data), chunk_size))
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return text, elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--chunk-size", type=int, default=512)
+    args = parser.parse_args()
+
+    for path in sorted((ROOT / "streams").glob("deepseek_*.sse")):
+        data = path.read_bytes()
+        print(f"{path.name} ({len(data) / 1024:.1f} KiB, chunks of {args.chunk_size})")
+        results = {}
+        for name, decode in (("legacy", legacy), ("incremental", incremental)):
+            text, elapsed, peak = measure(decode, data, args.repeat, args.chunk_size)
+            results[name] = (text, elapsed)
+            print(
+                f"  {name:>11}: {elapsed * 1e6:8.0f} us/stream "
+                f"{len(data) / elapsed / 1e6:7.1f} MB/s  peak {peak / 1024:6.1f} KiB"
+            )
+        assert results["legacy"][0] == results["incremental"][0], "answers differ"
+        speedup = results["legacy"][1] / results["incremental"][1]
+        print(f"  speedup: {speedup:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
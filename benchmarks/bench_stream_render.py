@@ -0,0 +1,129 @@
+"""Render calls and bytes sent while streaming a long answer.
+
+Usage::
+
+    python benchmarks/bench_stream_render.py --tokens 2000 --rate 40
+
+Compares the old per-token loop (``full += chunk`` then
+``st.markdown(full + "▌")`` for every chunk) with ``stream_render`` frames.
+Tokens arrive on a simulated clock at ``--rate`` tokens/second, plus an
+instant replay as served by the response/semantic caches. ``Box`` is a
+counter standing in for ``st.empty().markdown``: every call re-sends the
+whole Markdown text over the websocket, so bytes are counted as the UTF-8
+size of each rendered string. CPU time is real.
+"""
+
+import argparse
+import pathlib
+import random
+import sys
+import time
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+
+from stream_render import frames, render_stream  # noqa: E402
+
+WORDS = (
+    "I deployed **Agentic AI** and MLOps platforms across 9 countries, "
+    "cutting delivery time by 80% with multi-agent pipelines on Azure DevOps. "
+    "我在深圳和香港之间工作。 Landing Zones, FastAPI, MLflow, Evidently, "
+    "Streamlit and Kubernetes across AWS, Azure and GCP."
+).split(" ")
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class Box:
+    """Counts what a Streamlit placeholder would send."""
+
+    def __init__(self):
+        self.calls = 0
+        self.bytes = 0
+
+    def markdown(self, text):
+        self.calls += 1
+        self.bytes += len(text.encode("utf-8"))
+
+
+def token_stream(tokens, clock, rate, seed=0):
+    rng = random.Random(seed)
+    for i in range(tokens):
+        if rate:
+            clock.now += rng.expovariate(rate)
+        yield WORDS[i % len(WORDS)] + " "
+
+
+def per_token(chunks, box):
+    """The loop app.py used to run."""
+    full = ""
+    for chunk in chunks:
+        full += chunk
+        box.markdown(full + "▌")
+    box.markdown(full)
+    return full
+
+
+def coalesced(chunks, box, clock, interval, min_chars):
+    return render_stream(
+        chunks, box.markdown, interval=interval, min_chars=min_chars, clock=clock
+    )
+
+
+def run(label, tokens, rate, interval, min_chars):
+    results = {}
+    for name in ("per-token", "coalesced"):
+        clock = FakeClock()
+        box = Box()
+        chunks = list(token_stream(tokens, FakeClock(), 0))
+        stream = token_stream(tokens, clock, rate)
+        start = time.process_time()
+        if name == "per-token":
+            text = per_token(stream, box)
+        else:
+            text = coalesced(stream, box, clock, interval, min_chars)
+        cpu = time.process_time() - start
+        assert text == "".join(chunks), "rendered answer differs from the stream"
+        results[name] = (box.calls, box.bytes, cpu)
+        print(
+            f"{label:>14} {name:>10}: {box.calls:6d} renders "
+            f"{box.bytes / 1e6:9.2f} MB sent  {cpu * 1000:8.1f} ms CPU"
+        )
+    base, new = results["per-token"], results["coalesced"]
+    print(
+        f"{'':>14} {'':>10}  {base[0] / max(new[0], 1):6.1f}x fewer renders, "
+        f"{base[1] / max(new[1], 1):6.1f}x fewer bytes"
+    )
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tokens", type=int, default=2000)
+    parser.add_argument("--rate", type=float, default=40.0, help="tokens/second")
+    parser.add_argument("--frame-ms", type=int, default=75)
+    parser.add_argument("--frame-chars", type=int, default=256)
+    args = parser.parse_args()
+
+    interval = args.frame_ms / 1000
+    print(
+        f"{args.tokens} tokens, frames every {args.frame_ms} ms "
+        f"or {args.frame_chars} chars"
+    )
+    run("live", args.tokens, args.rate, interval, args.frame_chars)
+    run("cached replay", args.tokens, 0, interval, args.frame_chars)
+
+    # Sanity check: the last frame is always the complete answer.
+    clock = FakeClock()
+    chunks = list(token_stream(37, clock, 0))
+    *_, last = frames(iter(chunks), interval=10, min_chars=0, clock=clock)
+    assert last == "".join(chunks)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""Time-to-first-token: fresh client per message vs pooled registry.
+
+Usage::
+
+    python benchmarks/bench_ttft.py --provider deepseek --runs 10
+
+Talks to the real provider (needs ``OPENAI_API_KEY`` / ``DEEPSEEK_API_KEY``)
+unless ``OPENAI_BASE_URL`` / ``DEEPSEEK_BASE_URL`` point somewhere else.
+"""
+
+import argparse
+import pathlib
+import statistics
+import sys
+import time
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+
+import provider_clients  # noqa: E402
+from me_chatbot import call_deepseek_stream, call_openai_stream  # noqa: E402
+
+STREAMS = {"openai": call_openai_stream, "deepseek": call_deepseek_stream}
+MESSAGES = [{"role": "user", "content": "Reply with the single word: pong"}]
+
+
+def measure_ttft(stream_fn):
+    start = time.perf_counter()
+    stream = stream_fn(MESSAGES)
+    try:
+        next(stream)
+        return time.perf_counter() - start
+    finally:
+        stream.close()
+
+
+def run(provider, runs, pooled):
+    stream_fn = STREAMS[provider]
+    samples = []
+    for _ in range(runs):
+        if not pooled:
+            # Simulates the old behaviour: a brand-new client per message.
+            provider_clients._registry = provider_clients.ProviderClientRegistry()
+        samples.append(measure_ttft(stream_fn))
+    provider_clients.get_registry().close()
+    provider_clients._registry = None
+    return samples
+
+
+def report(label, samples):
+    ms = sorted(s * 1000 for s in samples)
+    print(
+        f"{label:<8} runs={len(ms):<3} "
+        f"p50={statistics.median(ms):7.1f}ms "
+        f"mean={statistics.fmean(ms):7.1f}ms "
+        f"max={ms[-1]:7.1f}ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--provider", choices=sorted(STREAMS), default="openai")
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+
+    cold = run(args.provider, args.runs, pooled=False)
+    warm = run(args.provider, args.runs, pooled=True)
+    report("fresh", cold)
+    report("pooled", warm)
+    saved = statistics.median(cold) - statistics.median(warm)
+    print(f"median TTFT reduction: {saved * 1000:.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
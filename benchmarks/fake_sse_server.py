@@ -0,0 +1,285 @@
+"""Local mock LLM server speaking OpenAI/DeepSeek chat completions.
+
+Good enough for load tests: HTTP/1.1 keep-alive, chunked transfer encoding,
+``POST .../chat/completions`` only. Point the app at it with::
+
+    OPENAI_BASE_URL=http://127.0.0.1:8765/openai/v1
+    DEEPSEEK_BASE_URL=http://127.0.0.1:8765/deepseek
+
+The path decides the dialect of the usage block: under ``/deepseek`` it
+carries ``prompt_cache_hit_tokens``/``prompt_cache_miss_tokens`` in the last
+content chunk; otherwise it is OpenAI's ``prompt_tokens_details`` in a
+separate ``choices: []`` chunk, sent only when the request asks for it with
+``stream_options.include_usage``. Non-streaming requests get a plain
+``chat.completion`` body.
+
+Streams ``tokens`` chunks, the first after ``ttft`` seconds (± ``jitter``
+as a fraction) and then one every ``interval`` seconds. Faults are injected
+per request with a seeded RNG:
+
+- ``error_rate``: respond ``error_status`` (default 500) with an error body;
+- ``disconnect_rate``: drop the connection halfway through the stream;
+- ``stall_rate``: wait ``stall`` seconds before the first token (read
+  timeouts, hedging).
+
+    python benchmarks/fake_sse_server.py --port 8765 --rate 40 --error-rate 0.05
+"""
+
+import argparse
+import asyncio
+import json
+import pathlib
+import random
+import socket
+import subprocess
+import sys
+import time
+from collections import Counter
+
+REASONS = {200: "OK", 429: "Too Many Requests", 500: "Internal Server Error"}
+
+
+class FakeSSEServer:
+    def __init__(
+        self,
+        tokens=50,
+        ttft=0.2,
+        interval=0.02,
+        jitter=0.0,
+        error_rate=0.0,
+        error_status=500,
+        disconnect_rate=0.0,
+        stall_rate=0.0,
+        stall=30.0,
+        seed=0,
+    ):
+        self.tokens = tokens
+        self.ttft = ttft
+        self.interval = interval
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.disconnect_rate = disconnect_rate
+        self.stall_rate = stall_rate
+        self.stall = stall
+        self.rng = random.Random(seed)
+        self.stats = Counter()
+        self.server = None
+        self.port = None
+
+    async def start(self, host="127.0.0.1", port=0):
+        self.server = await asyncio.start_server(self._handle, host, port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self
+
+    async def close(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def _handle(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    return
+                path = request_line.split(b" ")[1].decode("latin-1")
+                length = 0
+                while True:
+                    header = await reader.readline()
+                    if header in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = header.decode("latin-1").partition(":")
+                    if name.strip().lower() == "content-length":
+                        length = int(value.strip())
+                body = await reader.readexactly(length) if length else b""
+                if not await self._respond(writer, path, body):
+                    return
+        except (ConnectionError, asyncio.IncompleteReadError, IndexError):
+            pass
+        finally:
+            writer.close()
+
+    async def _respond(self, writer, path, body):
+        """Answer one request; False if the connection must be dropped."""
+        try:
+            request = json.loads(body) if body else {}
+        except ValueError:
+            request = {}
+        self.stats["requests"] += 1
+        deepseek = "/deepseek" in path
+        roll = self.rng.random()
+        if roll < self.error_rate:
+            self.stats["errors"] += 1
+            error = {"error": {"message": "injected failure", "type": "server_error"}}
+            self._write_response(writer, self.error_status, json.dumps(error).encode())
+            await writer.drain()
+            return True
+        disconnect = roll < self.error_rate + self.disconnect_rate
+        stall = self.rng.random() < self.stall_rate
+
+        prompt_tokens = max(
+            sum(len(str(m.get("content", ""))) for m in request.get("messages", []))
+            // 4,
+            1,
+        )
+        usage = self._usage(deepseek, prompt_tokens)
+        delay = self.ttft * (1 + self.rng.uniform(-self.jitter, self.jitter))
+        if stall:
+            self.stats["stalls"] += 1
+            delay = self.stall
+        model = request.get("model", "fake")
+
+        if not request.get("stream"):
+            await asyncio.sleep(delay + self.interval * (self.tokens - 1))
+            answer = {
+                "id": "fake",
+                "object": "chat.completion",
+                "created": 0,
+                "model": model,
+                "choices": [
+                    {
+                        "index": 0,
+                        "message": {"role": "assistant", "content": self._text()},
+                        "finish_reason": "stop",
+                    }
+                ],
+                "usage": usage,
+            }
+            self._write_response(writer, 200, json.dumps(answer).encode())
+            await writer.drain()
+            return True
+
+        writer.write(
+            b"HTTP/1.1 200 OK\r\n"
+            b"Content-Type: text/event-stream\r\n"
+            b"Transfer-Encoding: chunked\r\n\r\n"
+        )
+        await asyncio.sleep(delay)
+        for i in range(self.tokens):
+            if disconnect and i == self.tokens // 2:
+                self.stats["disconnects"] += 1
+                writer.transport.abort()
+                return False
+            chunk = self._chunk(model, {"content": f"tok{i} "})
+            if deepseek and i == self.tokens - 1:
+                chunk["choices"][0]["finish_reason"] = "stop"
+                chunk["usage"] = usage
+            self._write_event(writer, chunk)
+            await writer.drain()
+            if i < self.tokens - 1:
+                await asyncio.sleep(self.interval)
+        if not deepseek and (request.get("stream_options") or {}).get("include_usage"):
+            chunk = self._chunk(model, None)
+            chunk["usage"] = usage
+            self._write_event(writer, chunk)
+        self._write_chunk(writer, b"data: [DONE]\n\n")
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+        self.stats["completed"] += 1
+        return True
+
+    def _text(self):
+        return "".join(f"tok{i} " for i in range(self.tokens))
+
+    def _usage(self, deepseek, prompt_tokens):
+        cached = prompt_tokens // 2
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": self.tokens,
+            "total_tokens": prompt_tokens + self.tokens,
+        }
+        if deepseek:
+            usage["prompt_cache_hit_tokens"] = cached
+            usage["prompt_cache_miss_tokens"] = prompt_tokens - cached
+        else:
+            usage["prompt_tokens_details"] = {"cached_tokens": cached}
+        return usage
+
+    @staticmethod
+    def _chunk(model, delta):
+        return {
+            "id": "fake",
+            "object": "chat.completion.chunk",
+            "created": 0,
+            "model": model,
+            "choices": (
+                [] if delta is None else [{"index": 0, "delta": delta}]
+            ),  # OpenAI's usage-only chunk has no choices
+        }
+
+    def _write_event(self, writer, chunk):
+        self._write_chunk(writer, f"data: {json.dumps(chunk)}\n\n".encode())
+
+    @staticmethod
+    def _write_chunk(writer, data):
+        writer.write(b"%x\r\n%s\r\n" % (len(data), data))
+
+    @staticmethod
+    def _write_response(writer, status, body):
+        writer.write(
+            b"HTTP/1.1 %d %s\r\n"
+            b"Content-Type: application/json\r\n"
+            b"Content-Length: %d\r\n\r\n%s"
+            % (status, REASONS.get(status, "Error").encode(), len(body), body)
+        )
+
+
+def spawn(**options):
+    """Run the server in a subprocess; return ``(process, base_url)``.
+
+    ``options`` are command-line flags without dashes, e.g. ``rate=40``.
+    """
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    cmd = [sys.executable, str(pathlib.Path(__file__).resolve()), f"--port={port}"]
+    cmd += [f"--{k.replace('_', '-')}={v}" for k, v in options.items()]
+    proc = subprocess.Popen(cmd, stdout=subprocess.DEVNULL)
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+            return proc, f"http://127.0.0.1:{port}"
+        except OSError:
+            time.sleep(0.05)
+    proc.kill()
+    raise RuntimeError("fake LLM server did not start")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--tokens", type=int, default=50)
+    parser.add_argument("--ttft", type=float, default=0.2)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--interval", type=float, default=0.02)
+    parser.add_argument("--rate", type=float, help="tokens/s (overrides --interval)")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=500)
+    parser.add_argument("--disconnect-rate", type=float, default=0.0)
+    parser.add_argument("--stall-rate", type=float, default=0.0)
+    parser.add_argument("--stall", type=float, default=30.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    async def run():
+        server = await FakeSSEServer(
+            tokens=args.tokens,
+            ttft=args.ttft,
+            interval=1 / args.rate if args.rate else args.interval,
+            jitter=args.jitter,
+            error_rate=args.error_rate,
+            error_status=args.error_status,
+            disconnect_rate=args.disconnect_rate,
+            stall_rate=args.stall_rate,
+            stall=args.stall,
+            seed=args.seed,
+        ).start(port=args.port)
+        print(f"fake LLM server on http://127.0.0.1:{server.port}")
+        await server.server.serve_forever()
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""Exercise LeadNotifier against MemoryTransport (no Resend, no network).
+
+Usage::
+
+    python benchmarks/lead_notify_harness.py
+
+Scenarios, each with short real-time windows:
+
+- latency: ``notify`` vs a synchronous send through a transport that takes
+  300 ms (roughly a Resend round-trip);
+- dedupe: the same address, in any case, alerts once;
+- digest: a burst of leads inside the digest window becomes one email;
+- retry: a transport failing twice still delivers, merged with a lead that
+  arrived during the backoff;
+- shutdown: ``close()`` during a backoff makes one last attempt instead of
+  losing the batch, and drops it (addresses eligible again) if that fails.
+
+Exits non-zero if a scenario's expectation is not met.
+"""
+
+import pathlib
+import sys
+import time
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+
+from lead_notifier import Lead, LeadNotifier, MemoryTransport  # noqa: E402
+
+
+def wait_for(predicate, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while not predicate() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return predicate()
+
+
+def main():
+    failed = []
+
+    transport = MemoryTransport(delay=0.3)
+    start = time.perf_counter()
+    transport.send([Lead("sync@example.com")])
+    sync_ms = (time.perf_counter() - start) * 1000
+    notifier = LeadNotifier(transport, digest_window=0.0)
+    start = time.perf_counter()
+    notifier.notify("async@example.com")
+    queued_ms = (time.perf_counter() - start) * 1000
+    print(f"latency: synchronous send {sync_ms:.1f} ms, notify() {queued_ms:.3f} ms")
+    if not wait_for(lambda: len(transport.sent) == 2) or queued_ms > 10:
+        failed.append("latency")
+    notifier.close()
+
+    transport = MemoryTransport()
+    notifier = LeadNotifier(transport, digest_window=0.05)
+    results = [
+        notifier.notify("dup@example.com"),
+        notifier.notify(" DUP@example.com"),
+        notifier.notify("dup@example.com"),
+    ]
+    wait_for(lambda: transport.sent)
+    notifier.close()
+    print(f"dedupe: accepted {results}, sent {len(transport.sent)} alert(s)")
+    if results != [True, False, False] or len(transport.sent) != 1:
+        failed.append("dedupe")
+
+    transport = MemoryTransport()
+    notifier = LeadNotifier(transport, digest_window=0.2)
+    for i in range(5):
+        notifier.notify(f"lead{i}@example.com")
+    wait_for(lambda: transport.sent)
+    notifier.close()
+    sizes = [len(batch) for batch in transport.sent]
+    print(f"digest: 5 leads in a burst -> batches {sizes}")
+    if sizes != [5]:
+        failed.append("digest")
+
+    transport = MemoryTransport(failures=2)
+    notifier = LeadNotifier(transport, digest_window=0.0, max_backoff=0.2)
+    notifier.notify("retry@example.com")
+    wait_for(lambda: transport.attempts >= 1)
+    notifier.notify("late@example.com")
+    wait_for(lambda: transport.sent)
+    notifier.close()
+    delivered = [lead.email for batch in transport.sent for lead in batch]
+    print(f"retry: {transport.attempts} attempts, delivered {delivered}")
+    if sorted(delivered) != ["late@example.com", "retry@example.com"]:
+        failed.append("retry")
+
+    outcomes = []
+    for failures in (1, 2):
+        transport = MemoryTransport(failures=failures)
+        notifier = LeadNotifier(transport, digest_window=0.0, max_backoff=60.0)
+        notifier.notify("stop@example.com")
+        wait_for(lambda: transport.attempts >= 1)
+        start = time.perf_counter()
+        notifier.close()
+        closed_s = time.perf_counter() - start
+        outcomes.append((transport.attempts, len(transport.sent), closed_s))
+    print(
+        "shutdown: close() in backoff -> "
+        + ", ".join(f"{a} attempts, {n} sent in {s:.2f}s" for a, n, s in outcomes)
+    )
+    if [(a, n) for a, n, _ in outcomes] != [(2, 1), (2, 0)] or any(
+        s > 1 for *_, s in outcomes
+    ):
+        failed.append("shutdown")
+
+    if failed:
+        print(f"❌ failed: {', '.join(failed)}")
+        sys.exit(1)
+    print("✅ all scenarios passed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,250 @@
+"""Load test: async streaming engine vs thread-per-stream, against a fake server.
+
+Usage::
+
+    python benchmarks/load_async_stream.py --sessions 200 --tokens 50
+
+Starts ``FakeSSEServer`` in-process, then runs ``--sessions`` concurrent
+DeepSeek-style generations these ways:
+
+- ``threads``: ``call_deepseek_stream`` on one thread per session through
+  the sync ``requests`` path (a Streamlit script thread per visitor);
+- ``engine``:  the same calls with ``LLM_ASYNC_ENGINE=1``: the upstream I/O
+  runs on the ``AsyncStreamEngine`` loop, but each caller still blocks one
+  thread in the ``AsyncStreamEngine.stream`` sync adapter;
+- ``native``:  ``engine.astream`` as tasks on the loop, no caller threads;
+- ``api-sync`` / ``api-async``: streaming ``POST /v1/chat/completions``
+  against ``chat_api`` under uvicorn (in-process, admission limits off),
+  without and with ``LLM_ASYNC_ENGINE=1``. This is the production path:
+  without the engine every open stream occupies a threadpool worker (and
+  streams beyond the pool's 40 wait), with it they are async generators on
+  the server loop. ``--no-api`` skips these; they need a resume like
+  ``load_sessions.py`` (``RESUME_PATH``/``RESUME_INDEX_DIR``).
+
+Reports wall time, TTFT p50/p95 and peak thread count for each. The fake
+server shares the process (and GIL) with the clients, so absolute latencies
+include its overhead. Expect ``threads`` and ``engine`` to peak at about one
+thread per session (``engine`` moves the sockets, not the waiting) and
+``native`` at a handful. Both api modes also show the AnyIO pool (at most
+40): ``api-sync`` holds a worker per open stream and queues the rest, so
+its TTFT grows with the sessions; ``api-async`` only borrows one at the end
+of a turn to persist it.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import pathlib
+import socket
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent))
+
+from fake_sse_server import FakeSSEServer  # noqa: E402
+
+MESSAGES = [{"role": "user", "content": "hello"}]
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(int(len(ordered) * pct / 100), len(ordered) - 1)]
+
+
+class PeakThreads:
+    def __init__(self):
+        self.peak = threading.active_count()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._watch, daemon=True)
+
+    def _watch(self):
+        while not self._stop.wait(0.01):
+            self.peak = max(self.peak, threading.active_count())
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+
+
+def run_threads(sessions, engine=False):
+    from me_chatbot import call_deepseek_stream
+    import provider_clients
+
+    provider_clients.get_registry().config.pool_size = sessions
+    os.environ["LLM_ASYNC_ENGINE"] = "1" if engine else ""
+    ttfts = []
+
+    def one():
+        start = time.perf_counter()
+        first = None
+        for _ in call_deepseek_stream(MESSAGES):
+            if first is None:
+                first = time.perf_counter() - start
+        ttfts.append(first)
+
+    one()  # warm up: imports, connection pool
+    ttfts.clear()
+    threads = [threading.Thread(target=one) for _ in range(sessions)]
+    with PeakThreads() as peak:
+        start = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        wall = time.perf_counter() - start
+    return wall, ttfts, peak.peak
+
+
+def run_engine(sessions):
+    return run_threads(sessions, engine=True)
+
+
+def run_native(sessions):
+    from async_streaming import AsyncStreamEngine
+    from provider_clients import PoolConfig
+
+    engine = AsyncStreamEngine(PoolConfig(pool_size=sessions))
+    ttfts = []
+
+    async def one():
+        start = time.perf_counter()
+        first = None
+        async for _ in engine.astream("deepseek", MESSAGES, "fake"):
+            if first is None:
+                first = time.perf_counter() - start
+        ttfts.append(first)
+
+    async def all_sessions():
+        await asyncio.gather(*(one() for _ in range(sessions)))
+
+    # Warm up: imports, client creation, connection pool.
+    asyncio.run_coroutine_threadsafe(one(), engine.loop).result()
+    ttfts.clear()
+
+    with PeakThreads() as peak:
+        start = time.perf_counter()
+        asyncio.run_coroutine_threadsafe(all_sessions(), engine.loop).result()
+        wall = time.perf_counter() - start
+    return wall, ttfts, peak.peak
+
+
+def start_api():
+    """Serve ``chat_api`` with uvicorn on its own thread; return the URL."""
+    import uvicorn
+
+    from chat_api import app
+
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    config = uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning")
+    server = uvicorn.Server(config)
+    threading.Thread(target=server.run, name="uvicorn", daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return f"http://127.0.0.1:{port}/v1/chat/completions"
+
+
+def run_api(sessions, url, engine):
+    import httpx
+
+    os.environ["LLM_ASYNC_ENGINE"] = "1" if engine else ""
+    ttfts = []
+
+    async def one(client, index):
+        payload = {
+            "messages": [
+                {"role": "user", "content": f"question {index}"},
+                {"role": "assistant", "content": "answer"},
+                {"role": "user", "content": "hello"},
+            ],
+            "user_country": "cn",  # DeepSeek, the fake server
+            "stream": True,
+        }
+        start = time.perf_counter()
+        first = None
+        async with client.stream("POST", url, json=payload) as response:
+            async for line in response.aiter_lines():
+                if first is None and line.startswith("data: {"):
+                    delta = json.loads(line[6:])["choices"][0]["delta"]
+                    if delta.get("content"):
+                        first = time.perf_counter() - start
+        ttfts.append(first)
+
+    async def all_sessions(count):
+        limits = httpx.Limits(max_connections=count)
+        async with httpx.AsyncClient(limits=limits, timeout=120) as client:
+            await asyncio.gather(*(one(client, i) for i in range(count)))
+
+    asyncio.run(all_sessions(1))  # warm up: Me, engine, connection pools
+    ttfts.clear()
+    with PeakThreads() as peak:
+        start = time.perf_counter()
+        asyncio.run(all_sessions(sessions))
+        wall = time.perf_counter() - start
+    return wall, ttfts, peak.peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--tokens", type=int, default=50)
+    parser.add_argument("--ttft", type=float, default=0.2)
+    parser.add_argument("--interval", type=float, default=0.02)
+    parser.add_argument("--no-api", action="store_true")
+    args = parser.parse_args()
+
+    server_loop = asyncio.new_event_loop()
+    threading.Thread(target=server_loop.run_forever, daemon=True).start()
+    server = asyncio.run_coroutine_threadsafe(
+        FakeSSEServer(args.tokens, args.ttft, args.interval).start(), server_loop
+    ).result()
+    os.environ["DEEPSEEK_BASE_URL"] = f"http://127.0.0.1:{server.port}"
+    os.environ.setdefault("DEEPSEEK_API_KEY", "fake")
+    os.environ["LLM_POOL_SIZE"] = str(args.sessions)  # the engine's pool too
+
+    runners = [
+        ("threads", run_threads),
+        ("engine", run_engine),
+        ("native", run_native),
+    ]
+    if not args.no_api:
+        workdir = pathlib.Path(tempfile.mkdtemp(prefix="load-async-"))
+        os.environ.update(
+            CHAT_LOG_DIR=str(workdir / "chats"),
+            CHAT_SPOOL_DIR=str(workdir / "spool"),
+            LEAD_ALERT_DIR=str(workdir / "leads"),
+            KEEP_WARM_URL="",
+            PROMPT_CACHE_LOG="0",
+            ADMISSION_SESSION_RATE="0",
+            ADMISSION_IP_RATE="0",
+            ADMISSION_MAX_STREAMS="0",
+        )
+        url = start_api()
+        runners += [  # async first: idle pool threads outlive a run
+            ("api-async", lambda n: run_api(n, url, engine=True)),
+            ("api-sync", lambda n: run_api(n, url, engine=False)),
+        ]
+
+    print(f"{args.sessions} concurrent sessions x {args.tokens} tokens")
+    for label, runner in runners:
+        wall, ttfts, peak = runner(args.sessions)
+        ms = [t * 1000 for t in ttfts if t is not None]
+        print(
+            f"{label:<9} wall={wall:6.2f}s "
+            f"ttft_p50={statistics.median(ms):7.1f}ms "
+            f"ttft_p95={percentile(ms, 95):7.1f}ms "
+            f"peak_threads={peak}"
+        )
+
+
+if __name__ == "__main__":
+    main()
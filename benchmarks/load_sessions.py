@@ -0,0 +1,311 @@
+"""Load test: N concurrent visitor sessions through the full chat path.
+
+Usage::
+
+    python benchmarks/load_sessions.py --sessions 50 --turns 3 --rate 40
+
+Starts ``fake_sse_server.py`` in a subprocess (or uses ``--base-url``) and
+points both providers at it, with transcripts, the spool and lead alerts
+redirected to a temporary directory, so nothing leaves the machine. Each
+session runs on its own thread, like a Streamlit script run, and does
+what ``app.py`` does per turn:
+
+- email capture (``--email`` share of turns) → ``send_email_alert``;
+- ``Me.chat_stream`` with the session's history and ``ConversationMemory``
+  (``--canned`` share of turns are menu prompts, ``--cn`` share of sessions
+  are routed to DeepSeek);
+- frame-coalesced rendering through ``render_stream`` into a no-op sink;
+- ``record_turn`` on the chat-log shipper, ``end_session`` at the end.
+
+Sessions start spread over ``--ramp`` seconds and pause ``--think`` seconds
+(±50%) between turns. Every turn is traced (``tracing``); the report shows
+throughput, errors and p50/p95/p99 per stage, overall, by cache path and by
+visitor kind.
+
+Each turn first passes ``admission`` like in ``app.py``. ``--abusers N``
+adds sessions that fire ``--abuser-turns`` free-text questions back to back
+from one shared IP; compare the regular visitors' TTFT with and without
+``--no-admission`` (all limits off) to see what the limits buy. Turns
+turned away as busy are counted per visitor kind and left out of the
+latency tables.
+
+Needs a resume: set ``RESUME_PATH`` (and ``RESUME_INDEX_DIR``) or keep
+``me/linkedin.md`` in place.
+"""
+
+import argparse
+import os
+import pathlib
+import random
+import sys
+import tempfile
+import threading
+import time
+
+HERE = pathlib.Path(__file__).resolve().parent
+sys.path.insert(0, str(HERE.parent))
+sys.path.insert(0, str(HERE))
+
+from fake_sse_server import spawn  # noqa: E402
+
+FIRST_QUESTIONS = [
+    "What do you do?",
+    "Tell me about your AWS experience.",
+    "What kind of projects have you led?",
+    "Are you open to consulting work?",
+    "What is your background in DevOps?",
+    "Which certifications do you hold?",
+]
+FOLLOW_UPS = [
+    "Can you give a concrete example?",
+    "What was the hardest part?",
+    "Which technologies did you use there?",
+    "How big was the team?",
+    "What results did that deliver?",
+]
+MENU = ["📊 Projects", "💼 Experience", "🛠️ Skills", "📞 Contact"]
+
+
+def start_server(args):
+    return spawn(
+        tokens=args.tokens,
+        ttft=args.ttft,
+        jitter=args.jitter,
+        rate=args.rate,
+        error_rate=args.error_rate,
+        disconnect_rate=args.disconnect_rate,
+        stall_rate=args.stall_rate,
+        stall=args.stall,
+    )
+
+
+def configure(base_url, workdir, sessions):
+    os.environ.update(
+        OPENAI_BASE_URL=f"{base_url}/openai/v1",
+        DEEPSEEK_BASE_URL=f"{base_url}/deepseek",
+        OPENAI_API_KEY="fake",
+        DEEPSEEK_API_KEY="fake",
+        CHAT_LOG_DIR=str(workdir / "chats"),
+        CHAT_SPOOL_DIR=str(workdir / "spool"),
+        LEAD_ALERT_DIR=str(workdir / "leads"),
+        KEEP_WARM_URL="",
+        RESUME_REFRESH_INTERVAL="0",
+        PROMPT_CACHE_LOG="0",
+        LLM_POOL_SIZE=str(max(sessions, 20)),
+    )
+
+
+def disable_admission():
+    os.environ.update(
+        ADMISSION_SESSION_RATE="0", ADMISSION_IP_RATE="0", ADMISSION_MAX_STREAMS="0"
+    )
+
+
+class Session(threading.Thread):
+    def __init__(self, index, args, rng, results, abusive=False):
+        super().__init__(name=f"session-{index}", daemon=True)
+        self.index = index
+        self.args = args
+        self.rng = rng
+        self.results = results
+        self.abusive = abusive
+        self.session_id = f"load-{index:05d}"
+        self.country = "cn" if rng.random() < args.cn else "us"
+        self.ip = (
+            "203.0.113.7" if abusive else f"10.{index // 256 % 256}.{index % 256}.1"
+        )
+
+    def questions(self):
+        yield self.rng.choice(FIRST_QUESTIONS), False
+        if self.abusive:
+            for _ in range(self.args.abuser_turns - 1):
+                yield self.rng.choice(FOLLOW_UPS), False
+            return
+        for _ in range(self.args.turns - 1):
+            if self.rng.random() < self.args.canned:
+                yield f"Show me {self.rng.choice(MENU)}", True
+            else:
+                yield self.rng.choice(FOLLOW_UPS), False
+
+    def run(self):
+        from admission import Busy, get_admission_controller
+        from chat_log import get_chat_shipper
+        from history_manager import ConversationMemory
+        from me_chatbot import extract_email, get_me, send_email_alert
+        from stream_render import render_stream
+        from tracing import get_tracer
+
+        me = get_me()
+        shipper = get_chat_shipper()
+        memory = ConversationMemory()
+        history = []
+        emailed = False
+        visitor = "abuser" if self.abusive else "regular"
+        for turn, (question, canned) in enumerate(self.questions()):
+            if turn and not self.abusive:
+                time.sleep(self.args.think * self.rng.uniform(0.5, 1.5))
+            if not emailed and self.rng.random() < self.args.email:
+                question += f" Reach me at visitor{self.index}@example.com"
+            trace = get_tracer().start(
+                "chat",
+                session_id=self.session_id,
+                country=self.country,
+                visitor=visitor,
+            )
+            try:
+                get_admission_controller().admit(self.session_id, self.ip)
+                email = extract_email(question)
+                if email and not emailed:
+                    with trace.span("lead"):
+                        send_email_alert(email, self.session_id)
+                    emailed = True
+                with trace.active():
+                    chunks = me.chat_stream(
+                        question,
+                        history,
+                        user_country=self.country,
+                        memory=memory,
+                        language="English",
+                        cacheable=canned,
+                    )
+                answer = render_stream(trace.stream(chunks), lambda text: None)
+                history.append((question, answer))
+                with trace.span("persist"):
+                    shipper.record_turn(self.session_id, "English", question, answer)
+            except Busy:
+                trace.finish("busy")
+                self.results.append((trace.to_dict(), None))
+                continue
+            except Exception as e:
+                trace.finish("error")
+                self.results.append((trace.to_dict(), repr(e)))
+                continue
+            trace.finish()
+            self.results.append((trace.to_dict(), None))
+        shipper.end_session(self.session_id)
+
+
+def report(records, wall, peak_threads):
+    from tracing import percentile, summarize
+
+    busy = [r for r, _ in records if r["status"] == "busy"]
+    records = [(r, error) for r, error in records if r["status"] != "busy"]
+    ok = [r for r, error in records if error is None]
+    errors = [error for _, error in records if error is not None]
+    tokens = sum(r["tokens"] for r in ok)
+    print(
+        f"\n{len(records)} turns in {wall:.2f}s: "
+        f"{len(ok) / wall:.1f} turns/s, {tokens / wall:.0f} tokens/s, "
+        f"{len(errors)} errors, {len(busy)} busy, peak threads {peak_threads}"
+    )
+    for error in sorted(set(errors))[:5]:
+        print(f"  error: {error} (x{errors.count(error)})")
+    for visitor in sorted({r["attrs"]["visitor"] for r in busy}):
+        count = sum(r["attrs"]["visitor"] == visitor for r in busy)
+        print(f"  busy: {visitor} x{count}")
+    stages = (
+        "ttft",
+        "total",
+        "stream",
+        "tokens/s",
+        "connect",
+        "admission_wait",
+        "semantic_lookup",
+        "prompt_build",
+        "persist",
+    )
+    for by in (None, "cache", "visitor"):
+        for group, values in sorted(summarize([r for r, _ in records], by).items()):
+            label = f"{by} = {group or '-'}" if by else "all turns"
+            print(f"\n{label}")
+            print(f"{'stage':>16} {'n':>6} {'p50':>9} {'p95':>9} {'p99':>9}")
+            for stage in stages:
+                samples = values.get(stage)
+                if not samples:
+                    continue
+                p50, p95, p99 = (percentile(samples, q) for q in (50, 95, 99))
+                unit = "" if stage == "tokens/s" else " ms"
+                print(
+                    f"{stage:>16} {len(samples):>6} "
+                    f"{p50:9.1f} {p95:9.1f} {p99:9.1f}{unit}"
+                )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=50)
+    parser.add_argument("--turns", type=int, default=3)
+    parser.add_argument("--think", type=float, default=0.5)
+    parser.add_argument("--ramp", type=float, default=2.0)
+    parser.add_argument("--canned", type=float, default=0.2)
+    parser.add_argument("--cn", type=float, default=0.1)
+    parser.add_argument("--email", type=float, default=0.05)
+    parser.add_argument("--abusers", type=int, default=0)
+    parser.add_argument("--abuser-turns", type=int, default=30)
+    parser.add_argument("--no-admission", action="store_true")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--base-url", help="use a running fake_sse_server.py")
+    parser.add_argument("--tokens", type=int, default=120)
+    parser.add_argument("--ttft", type=float, default=0.4)
+    parser.add_argument("--jitter", type=float, default=0.3)
+    parser.add_argument("--rate", type=float, default=40.0, help="tokens/s")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--disconnect-rate", type=float, default=0.0)
+    parser.add_argument("--stall-rate", type=float, default=0.0)
+    parser.add_argument("--stall", type=float, default=30.0)
+    args = parser.parse_args()
+
+    server = None
+    base_url = args.base_url
+    if base_url is None:
+        server, base_url = start_server(args)
+    workdir = pathlib.Path(tempfile.mkdtemp(prefix="load-sessions-"))
+    configure(base_url, workdir, args.sessions + args.abusers)
+    if args.no_admission:
+        disable_admission()
+    try:
+        from me_chatbot import get_me
+
+        get_me()  # resume, index, frozen prompt: built before the clock starts
+        rng = random.Random(args.seed)
+        results = []
+        sessions = [
+            Session(i, args, random.Random(rng.random()), results)
+            for i in range(args.sessions)
+        ]
+        abusers = [
+            Session(args.sessions + i, args, random.Random(rng.random()), results, True)
+            for i in range(args.abusers)
+        ]
+        print(
+            f"{args.sessions} sessions x {args.turns} turns against {base_url} "
+            f"({args.tokens} tokens at {args.rate:g}/s, ttft {args.ttft}s)"
+        )
+        if abusers:
+            print(
+                f"+ {args.abusers} abusive sessions x {args.abuser_turns} turns, "
+                f"admission {'off' if args.no_admission else 'on'}"
+            )
+        for session in abusers:  # they hit from the start
+            session.start()
+        peak = threading.active_count()
+        start = time.perf_counter()
+        for i, session in enumerate(sessions):
+            delay = start + args.ramp * i / max(len(sessions), 1)
+            time.sleep(max(delay - time.perf_counter(), 0))
+            session.start()
+            peak = max(peak, threading.active_count())
+        for session in sessions + abusers:
+            while session.is_alive():
+                peak = max(peak, threading.active_count())
+                session.join(0.05)
+        wall = time.perf_counter() - start
+        report(results, wall, peak)
+        print(f"\ntranscripts and lead alerts in {workdir}")
+    finally:
+        if server is not None:
+            server.terminate()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,354 @@
+"""Replay archived chat transcripts against a provider and compare runs.
+
+Usage::
+
+    python benchmarks/replay_transcripts.py chats/ --provider deepseek --out run.json
+    python benchmarks/replay_transcripts.py chats/ --mock --baseline run.json
+    python benchmarks/replay_transcripts.py chats/ --provider none   # prompts only
+
+Loads every ``<timestamp>_<session>.json`` transcript under the given
+directories (what ``save_chat_to_s3`` and the chat-log shipper write; pull
+them with ``aws s3 sync s3://$S3_BUCKET/chats/ chats/``) and replays each
+conversation turn by turn: the question is localized for the transcript's
+language, ``Me.build_messages`` builds the prompt with a per-session
+``ConversationMemory``, and the messages go straight to the provider's
+stream function. The response cache, semantic cache, router and hedging
+are bypassed, so every turn measures prompt construction plus the provider.
+
+By default the history passed to later turns is the *recorded* answers, so
+every run sends the same conversation shapes whatever the model says;
+``--history generated`` feeds back the replayed answers instead.
+
+Per turn: messages, local and provider prompt tokens, cached prompt tokens,
+TTFT, total latency, output chars and tokens. ``--out`` saves the run;
+``--baseline`` compares p50/p95 per metric with a saved run and the paired
+per-turn delta of prompt tokens. With ``--max-regression PCT`` the exit
+status is non-zero when prompt tokens, TTFT or latency get worse by more
+than ``PCT`` percent at p50 or p95.
+
+``--provider none`` skips the provider and only measures prompts, which is
+enough to judge ``Me.system_prompt()`` or history changes for free.
+Provider usage is captured for the sync stream paths; with
+``LLM_ASYNC_ENGINE=1`` prompt tokens fall back to the local count.
+
+Needs a resume: set ``RESUME_PATH`` (and ``RESUME_INDEX_DIR``) or keep
+``me/linkedin.md`` in place.
+"""
+
+import argparse
+import contextvars
+import json
+import os
+import pathlib
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+HERE = pathlib.Path(__file__).resolve().parent
+sys.path.insert(0, str(HERE.parent))
+sys.path.insert(0, str(HERE))
+
+from fake_sse_server import spawn  # noqa: E402
+
+METRICS = (
+    "prompt_tokens",
+    "uncached_tokens",
+    "local_prompt_tokens",
+    "ttft_ms",
+    "latency_ms",
+    "output_chars",
+    "output_tokens",
+)
+# Higher is worse for these; the others are reported but never fail a run.
+GATED = ("prompt_tokens", "uncached_tokens", "ttft_ms", "latency_ms")
+
+_turn = contextvars.ContextVar("replay_turn", default=None)
+
+
+def _on_usage(entry):
+    record = _turn.get()
+    if record is not None:
+        record["prompt_tokens"] = entry.prompt_tokens
+        record["uncached_tokens"] = entry.uncached_tokens
+        record["output_tokens"] = entry.completion_tokens
+
+
+def load_transcripts(paths, limit=None):
+    transcripts = []
+    for root in paths:
+        root = pathlib.Path(root)
+        files = [root] if root.is_file() else sorted(root.rglob("*.json"))
+        for path in files:
+            if "deltas" in path.parts:
+                continue
+            try:
+                data = json.loads(path.read_text(encoding="utf-8"))
+            except (OSError, ValueError) as e:
+                print(f"⚠️ Skipping {path}: {e}")
+                continue
+            if isinstance(data, dict) and data.get("history"):
+                data.setdefault("session_id", path.stem)
+                transcripts.append(data)
+    transcripts.sort(key=lambda t: t.get("timestamp", ""))
+    return transcripts[:limit] if limit else transcripts
+
+
+def replay_session(me, transcript, stream_fn, args):
+    from history_manager import ConversationMemory, count_tokens
+    from me_chatbot import localize_prompt
+
+    language = transcript.get("language") or "English"
+    memory = ConversationMemory()
+    history = []
+    records = []
+    for turn, (user_msg, recorded_answer) in enumerate(
+        transcript["history"][: args.max_turns]
+    ):
+        record = {
+            "session_id": transcript["session_id"],
+            "turn": turn,
+            "language": language,
+            "error": None,
+        }
+        start = time.perf_counter()
+        messages = me.build_messages(
+            localize_prompt(user_msg, language), history, memory
+        )
+        record["build_ms"] = (time.perf_counter() - start) * 1000
+        record["messages"] = len(messages)
+        record["local_prompt_tokens"] = sum(
+            count_tokens(m["content"]) for m in messages
+        )
+        record["prompt_tokens"] = record["uncached_tokens"] = None
+        record["output_tokens"] = None
+        answer = ""
+        if stream_fn is not None:
+            token = _turn.set(record)
+            parts = []
+            start = time.perf_counter()
+            try:
+                for chunk in stream_fn(messages):
+                    if not parts:
+                        record["ttft_ms"] = (time.perf_counter() - start) * 1000
+                    parts.append(chunk)
+            except Exception as e:
+                record["error"] = repr(e)
+            finally:
+                _turn.reset(token)
+            record["latency_ms"] = (time.perf_counter() - start) * 1000
+            answer = "".join(parts)
+            record["output_chars"] = len(answer)
+            if record["output_tokens"] is None:
+                record["output_tokens"] = count_tokens(answer)
+        if record["prompt_tokens"] is None:
+            record["prompt_tokens"] = record["local_prompt_tokens"]
+            record["uncached_tokens"] = None
+        records.append(record)
+        generated = args.history == "generated" and stream_fn is not None
+        history.append((user_msg, answer if generated else recorded_answer))
+    return records
+
+
+def percentile(values, q):
+    from tracing import percentile as nearest_rank
+
+    return nearest_rank(sorted(values), q)
+
+
+def summarize(turns):
+    summary = {}
+    for metric in METRICS:
+        values = [t[metric] for t in turns if t.get(metric) is not None]
+        if values:
+            summary[metric] = {
+                "n": len(values),
+                "mean": sum(values) / len(values),
+                "p50": percentile(values, 50),
+                "p95": percentile(values, 95),
+            }
+    summary["errors"] = sum(1 for t in turns if t["error"])
+    return summary
+
+
+def print_summary(summary):
+    print(f"{'metric':>20} {'n':>6} {'mean':>10} {'p50':>10} {'p95':>10}")
+    for metric in METRICS:
+        s = summary.get(metric)
+        if s:
+            print(
+                f"{metric:>20} {s['n']:>6} {s['mean']:10.1f} "
+                f"{s['p50']:10.1f} {s['p95']:10.1f}"
+            )
+    print(f"{'errors':>20} {summary['errors']:>6}")
+
+
+def compare(run, baseline, max_regression=None):
+    """Print the comparison; return the list of gated regressions."""
+    print(
+        f"\nvs baseline {baseline['meta']['label']} ({baseline['meta']['started_at']})"
+    )
+    sources = [(r["meta"]["provider"], r["meta"]["mock"]) for r in (baseline, run)]
+    if sources[0] != sources[1]:
+        print(
+            "⚠️ different providers: prompt_tokens mix provider and local counts, "
+            "compare local_prompt_tokens"
+        )
+    print(f"{'metric':>20} {'':>4} {'baseline':>10} {'current':>10} {'delta':>8}")
+    regressions = []
+    for metric in METRICS:
+        old, new = baseline["summary"].get(metric), run["summary"].get(metric)
+        if not old or not new:
+            continue
+        for stat in ("p50", "p95"):
+            delta = (new[stat] - old[stat]) / old[stat] * 100 if old[stat] else 0.0
+            flag = ""
+            if (
+                max_regression is not None
+                and metric in GATED
+                and delta > max_regression
+            ):
+                flag = " ❌"
+                regressions.append(f"{metric} {stat} {delta:+.1f}%")
+            print(
+                f"{metric:>20} {stat:>4} {old[stat]:10.1f} {new[stat]:10.1f} "
+                f"{delta:+7.1f}%{flag}"
+            )
+
+    old_turns = {(t["session_id"], t["turn"]): t for t in baseline["turns"]}
+    paired = [
+        (old_turns[(t["session_id"], t["turn"])], t)
+        for t in run["turns"]
+        if (t["session_id"], t["turn"]) in old_turns
+    ]
+    if paired:
+        diffs = [new["prompt_tokens"] - old["prompt_tokens"] for old, new in paired]
+        print(
+            f"\nprompt tokens per turn, paired over {len(paired)} turns: "
+            f"mean {sum(diffs) / len(diffs):+.1f}, "
+            f"{sum(d < 0 for d in diffs)} smaller, {sum(d > 0 for d in diffs)} larger"
+        )
+    return regressions
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=HERE,
+            capture_output=True,
+            text=True,
+            timeout=5,
+        ).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return ""
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("paths", nargs="+", help="transcript files or directories")
+    parser.add_argument(
+        "--provider", default="deepseek", choices=("openai", "deepseek", "none")
+    )
+    parser.add_argument("--mock", action="store_true", help="use fake_sse_server.py")
+    parser.add_argument(
+        "--history", default="recorded", choices=("recorded", "generated")
+    )
+    parser.add_argument("--limit", type=int, help="replay at most this many sessions")
+    parser.add_argument("--max-turns", type=int, help="turns per session")
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--label", help="name for this run (default: git revision)")
+    parser.add_argument("--out", help="save the run as JSON")
+    parser.add_argument("--baseline", help="compare with a saved run")
+    parser.add_argument("--max-regression", type=float, metavar="PCT")
+    args = parser.parse_args()
+
+    transcripts = load_transcripts(args.paths, args.limit)
+    if not transcripts:
+        sys.exit("no transcripts found")
+
+    server = None
+    if args.mock:
+        server, base_url = spawn(ttft=0.2, rate=60, tokens=120)
+        os.environ.update(
+            OPENAI_BASE_URL=f"{base_url}/openai/v1",
+            DEEPSEEK_BASE_URL=f"{base_url}/deepseek",
+            OPENAI_API_KEY="fake",
+            DEEPSEEK_API_KEY="fake",
+        )
+    os.environ.setdefault("PROMPT_CACHE_LOG", "0")
+    os.environ.setdefault("RESUME_REFRESH_INTERVAL", "0")
+    try:
+        from me_chatbot import PROVIDERS, get_me
+        from prompt_cache import get_usage_tracker
+
+        me = get_me()
+        get_usage_tracker().add_listener(_on_usage)
+        stream_fn = None
+        model = None
+        if args.provider != "none":
+            stream_fn = PROVIDERS[args.provider]["stream"]
+            model = PROVIDERS[args.provider]["model"]
+
+        turns = sum(len(t["history"][: args.max_turns]) for t in transcripts)
+        print(
+            f"replaying {len(transcripts)} sessions, {turns} turns "
+            f"({args.provider}{' mock' if args.mock else ''}, "
+            f"history {args.history}, concurrency {args.concurrency})"
+        )
+        started_at = datetime.now().isoformat()
+        lock = threading.Lock()
+        results = []
+
+        def run(transcript):
+            records = replay_session(me, transcript, stream_fn, args)
+            with lock:
+                results.extend(records)
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            list(pool.map(run, transcripts))
+        wall = time.perf_counter() - start
+    finally:
+        if server is not None:
+            server.terminate()
+
+    results.sort(key=lambda t: (t["session_id"], t["turn"]))
+    run = {
+        "meta": {
+            "label": args.label or git_revision() or "run",
+            "started_at": started_at,
+            "wall_s": wall,
+            "provider": args.provider,
+            "model": model,
+            "mock": args.mock,
+            "history": args.history,
+            "sessions": len(transcripts),
+            "resume_version": me.resume_store.snapshot.version,
+            "prompt_digest": me.prompt_prefix().digest,
+        },
+        "summary": summarize(results),
+        "turns": results,
+    }
+    print(f"done in {wall:.1f}s\n")
+    print_summary(run["summary"])
+    if args.out:
+        pathlib.Path(args.out).write_text(
+            json.dumps(run, ensure_ascii=False, indent=1), encoding="utf-8"
+        )
+        print(f"\nsaved {args.out}")
+
+    if args.baseline:
+        baseline = json.loads(pathlib.Path(args.baseline).read_text(encoding="utf-8"))
+        regressions = compare(run, baseline, args.max_regression)
+        if regressions:
+            print(
+                f"\n❌ regressions over {args.max_regression}%: {', '.join(regressions)}"
+            )
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""Drive ProviderRouter with fake providers that inject latency and errors.
+
+Usage::
+
+    python benchmarks/router_harness.py
+
+Runs a few scripted scenarios on a simulated clock (no sleeping, no network)
+and prints, per phase, where traffic went and the router's view of each
+provider. Exits non-zero if a scenario's expectation is not met.
+"""
+
+import pathlib
+import random
+import sys
+from collections import Counter
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+
+from provider_router import ProviderRouter  # noqa: E402
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeProvider:
+    """Streams a few chunks after ``ttft`` seconds, failing with ``error_rate``."""
+
+    def __init__(self, clock, ttft, error_rate=0.0, rng=None):
+        self.clock = clock
+        self.ttft = ttft
+        self.error_rate = error_rate
+        self.rng = rng or random.Random(0)
+
+    def stream(self, messages):
+        if self.rng.random() < self.error_rate:
+            self.clock.now += min(self.ttft, 30.0)  # time spent until the timeout
+            raise ConnectionError("injected failure")
+        self.clock.now += self.ttft
+        yield from ("fake ", "answer")
+
+
+def run_phase(router, providers, allowed, requests):
+    routed = Counter()
+    errors = 0
+    for _ in range(requests):
+        name = router.choose(allowed)
+        routed[name] += 1
+        try:
+            for _ in router.stream(name, providers[name].stream([])):
+                pass
+        except ConnectionError:
+            errors += 1
+        router.clock.now += 1.0  # gap between visitors
+    return routed, errors
+
+
+def scenario(title, phases, expect):
+    clock = FakeClock()
+    rng = random.Random(42)
+    router = ProviderRouter(failure_threshold=3, cooldown=30.0, clock=clock)
+    providers = {
+        "openai": FakeProvider(clock, 0.4, rng=rng),
+        "deepseek": FakeProvider(clock, 0.6, rng=rng),
+    }
+    print(f"\n== {title}")
+    routed = None
+    for label, changes, allowed, requests in phases:
+        for name, attrs in changes.items():
+            for attr, value in attrs.items():
+                setattr(providers[name], attr, value)
+        routed, errors = run_phase(router, providers, allowed, requests)
+        print(f"  {label:<28} routed={dict(routed)} errors={errors}")
+        for name, stats in router.snapshot().items():
+            ttft = stats["median_ttft"]
+            ttft = f"{ttft:.2f}s" if ttft is not None else "-"
+            print(
+                f"    {name:<9} state={stats['state']:<9} p50_ttft={ttft:<6} "
+                f"error_rate={stats['error_rate']:.2f}"
+            )
+    ok = expect(routed)
+    print(f"  -> {'OK' if ok else 'FAILED'}")
+    return ok
+
+
+def main():
+    both = ["openai", "deepseek"]
+    results = [
+        scenario(
+            "preferred provider healthy",
+            [("baseline", {}, both, 50)],
+            lambda r: r["openai"] >= 45,
+        ),
+        scenario(
+            "preferred provider becomes slow",
+            [
+                ("baseline", {}, both, 20),
+                ("openai ttft 4s", {"openai": {"ttft": 4.0}}, both, 60),
+            ],
+            lambda r: r["deepseek"] > r["openai"],
+        ),
+        scenario(
+            "preferred provider outage and recovery",
+            [
+                ("baseline", {}, both, 20),
+                ("openai failing", {"openai": {"error_rate": 1.0}}, both, 40),
+                ("openai recovered", {"openai": {"error_rate": 0.0}}, both, 60),
+            ],
+            lambda r: r["openai"] > r["deepseek"],
+        ),
+        scenario(
+            "china visitors only use deepseek",
+            [("deepseek only", {"openai": {"ttft": 0.1}}, ["deepseek"], 30)],
+            lambda r: set(r) == {"deepseek"},
+        ),
+    ]
+    sys.exit(0 if all(results) else 1)
+
+
+if __name__ == "__main__":
+    main()
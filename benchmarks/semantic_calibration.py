@@ -0,0 +1,87 @@
+"""Calibrate the semantic cache against paraphrase pairs.
+
+Usage::
+
+    python benchmarks/semantic_calibration.py [--threshold 0.9]
+
+Scores pairs of first-turn questions the way ``SemanticCache.lookup`` does
+(cosine similarity of the n-gram fingerprints, then the content-word check)
+and prints them. Positive pairs should share a cached answer; negative pairs
+differ in one entity (a cloud, a month, an industry, a language) and must
+not. Exits non-zero if any negative pair would be served from the cache;
+missed positives only lower the hit rate and are reported.
+"""
+
+import argparse
+import pathlib
+import sys
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+
+from semantic_cache import SemanticCache, content_words  # noqa: E402
+
+POSITIVE = (
+    ("What do you do?", "what do you do"),
+    ("What do you do?", "So, what do you do?"),
+    ("Tell me about your projects", "Tell me about your projects."),
+    ("Tell me about your projects", "Tell me more about your projects"),
+    ("What is your AWS experience?", "What's your AWS experience?"),
+    ("Can you describe your MLOps experience?", "Describe your MLOps experience"),
+    ("What skills do you have?", "Which skills do you have?"),
+    ("Show me 📊 Projects", "📊 Projects"),
+    ("Who are you?", "Hi, who are you?"),
+    ("你做过哪些项目？", "你做过什么项目"),
+    ("请用中文回答：What do you do?", "请用中文回答：what do you do"),
+)
+
+NEGATIVE = (
+    ("Do you have experience with Kubernetes on Azure?",
+     "Do you have experience with Kubernetes on AWS?"),
+    ("Are you available in March?", "Are you available in May?"),
+    ("Can you build MLOps for my bank?", "Can you build MLOps for my bakery?"),
+    ("What did you do in Shenzhen?", "What did you do in Hong Kong?"),
+    ("Do you speak Chinese?", "Do you speak Spanish?"),
+    ("Have you used MLflow?", "Have you used Evidently?"),
+    ("Tell me about your projects in 2023", "Tell me about your projects in 2021"),
+    ("What is your AWS experience?", "What is your GCP experience?"),
+    ("Are you open to remote work?", "Are you open to onsite work?"),
+    ("你在深圳做什么？", "你在香港做什么？"),
+)  # fmt: skip
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--threshold", type=float, default=None)
+    args = parser.parse_args()
+
+    cache = SemanticCache(capacity=1)
+    if args.threshold is not None:
+        cache.threshold = args.threshold
+
+    failures = misses = 0
+    for label, pairs in (("positive", POSITIVE), ("negative", NEGATIVE)):
+        print(f"\n{label} pairs (threshold {cache.threshold:.2f}):")
+        for a, b in pairs:
+            score, hit = cache.matches(a, b)
+            same = content_words(a) == content_words(b)
+            wrong = hit if label == "negative" else not hit
+            if wrong and label == "negative":
+                failures += 1
+            elif wrong:
+                misses += 1
+            mark = ("❌" if label == "negative" else "⚠️") if wrong else "✅"
+            print(
+                f"{mark} {score:.3f} words {'=' if same else '≠'} "
+                f"{'hit ' if hit else 'miss'}  {a!r} / {b!r}"
+            )
+
+    print(
+        f"\n{len(POSITIVE) - misses}/{len(POSITIVE)} positive pairs hit, "
+        f"{failures}/{len(NEGATIVE)} negative pairs served a wrong answer"
+    )
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""Fuzz the incremental SSE parser against recorded streams.
+
+Usage::
+
+    python benchmarks/sse_fuzz.py --rounds 500
+
+Each ``streams/*.sse`` file is a recorded provider stream and the ``.txt``
+next to it holds the answer it spells out. Every round cuts the bytes at
+random points (single bytes, inside multi-byte UTF-8 characters, between
+``\\r`` and ``\\n``) and checks that ``sse_parser.iter_content`` still
+reassembles exactly that answer. Random mutations (truncation, garbage
+bytes) must either parse or raise ``ValueError``, never hang or return the
+wrong type. Exits non-zero on the first mismatch, printing a reproducer.
+"""
+
+import argparse
+import pathlib
+import random
+import sys
+
+ROOT = pathlib.Path(__file__).resolve().parent
+sys.path.insert(0, str(ROOT.parent))
+
+from sse_parser import SSEParser, iter_content  # noqa: E402
+
+STREAMS = ROOT / "streams"
+
+
+def recorded():
+    for path in sorted(STREAMS.glob("*.sse")):
+        expected = path.with_suffix(".txt").read_bytes().decode("utf-8")
+        yield path.name, path.read_bytes(), expected
+
+
+def split(data, rng):
+    """Cut ``data`` into random chunks, favouring awkward boundaries."""
+    mode = rng.choice(("bytes", "small", "large", "utf8"))
+    if mode == "bytes":
+        return [data[i : i + 1] for i in range(len(data))]
+    if mode == "utf8":
+        # Cut right after the first byte of multi-byte characters and CRs.
+        cuts = [i + 1 for i, b in enumerate(data) if b >= 0xC0 or b == 13]
+        cuts = sorted(rng.sample(cuts, min(len(cuts), rng.randint(1, 64))))
+    else:
+        size = 16 if mode == "small" else 4096
+        cuts, pos = [], 0
+        while pos < len(data):
+            pos += rng.randint(1, size)
+            cuts.append(pos)
+    chunks, prev = [], 0
+    for cut in cuts + [len(data)]:
+        chunks.append(data[prev:cut])
+        prev = cut
+    return chunks
+
+
+def mutate(data, rng):
+    data = bytearray(data)
+    for _ in range(rng.randint(1, 4)):
+        op = rng.choice(("truncate", "flip", "insert"))
+        pos = rng.randrange(len(data))
+        if op == "truncate":
+            del data[pos:]
+        elif op == "flip":
+            data[pos] = rng.randrange(256)
+        else:
+            data[pos:pos] = bytes(rng.randrange(256) for _ in range(rng.randint(1, 8)))
+        if not data:
+            break
+    return bytes(data)
+
+
+def check_round(name, data, expected, rng, seed):
+    chunks = split(data, rng)
+    got = "".join(iter_content(chunks))
+    if got != expected:
+        cuts = [len(c) for c in chunks]
+        print(f"FAIL {name} seed={seed}: chunk sizes {cuts[:20]}...")
+        print(f"  expected {expected[:60]!r}")
+        print(f"  got      {got[:60]!r}")
+        return False
+    broken = mutate(data, rng)
+    try:
+        for content in iter_content(split(broken, rng)):
+            assert isinstance(content, str)
+    except (ValueError, RuntimeError):
+        pass  # malformed payloads are reported, not skipped
+    return True
+
+
+def check_events():
+    """Event framing that the recorded streams do not cover."""
+    parser = SSEParser()
+    events = parser.feed(b"data: a\r\n\r\ndata: b\ndata:c\n\n: note\nda")
+    events += parser.feed(b"ta: tail")
+    events += parser.close()
+    return events == [b"a", b"b\nc", b"tail"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    ok = check_events()
+    print(f"event framing: {'OK' if ok else 'FAIL'}")
+    streams = list(recorded())
+    for name, data, expected in streams:
+        for i in range(args.rounds):
+            seed = args.seed * 1_000_003 + i
+            if not check_round(name, data, expected, random.Random(seed), seed):
+                ok = False
+                break
+        else:
+            print(f"{name}: {args.rounds} rounds OK")
+    sys.exit(0 if ok and streams else 1)
+
+
+if __name__ == "__main__":
+    main()
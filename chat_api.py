@@ -0,0 +1,342 @@
+"""Headless, OpenAI-compatible chat API around ``Me.chat_stream``.
+
+The Streamlit script re-executes top to bottom on every interaction and
+can't be scaled out behind a load balancer. This service exposes the same
+chat logic over HTTP so it can run under several worker processes:
+
+    uvicorn chat_api:app --host 0.0.0.0 --port 8000 --workers 4
+
+``POST /v1/chat/completions`` accepts the OpenAI request shape plus a few
+optional fields:
+
+- ``session_id`` (or ``X-Session-Id`` header): used for transcript logging,
+  email capture and the per-session rate limit; generated if missing (such
+  a turn is only limited per client IP) and echoed in ``X-Session-Id``.
+- ``language``: UI language ("English", "中文 (Chinese)", "Español").
+- ``user_country``: visitor country when the caller already knows it (the
+  Streamlit thin client does); otherwise resolved from the client IP.
+- ``cacheable``: the prompt is a canned menu prompt.
+
+History is taken from ``messages`` (stateless, so any worker can serve any
+request). If only a single user message is sent together with a
+``session_id``, the worker falls back to its own in-process session
+history, which needs sticky sessions when running several workers. Either
+way a ``session_id`` keeps the session's ``ConversationMemory``, so only
+turns it has not folded yet are summarized.
+
+With ``"stream": true`` the answer is sent as Server-Sent Events in the
+OpenAI ``chat.completion.chunk`` format, terminated by ``data: [DONE]``.
+Answers come from ``Me.achat_stream``: with ``LLM_ASYNC_ENGINE=1`` an open
+free-text stream is an async generator on the event loop, not a blocked
+threadpool worker (see ``async_streaming``).
+
+Turns go through ``admission``: a session or client IP (``X-Forwarded-For``
+resolved with ``TRUSTED_PROXY_HOPS``, see ``geo``) over its rate gets 429,
+and when every upstream slot is taken and the wait queue is full (or the
+wait times out) the answer is 503; both carry ``Retry-After``.
+"""
+
+import json
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+
+from admission import Busy, get_admission_controller
+from chat_log import get_chat_shipper
+from cost_ledger import KEY_FIELDS, get_cost_ledger
+from geo import forwarded_client_ip
+from history_manager import ConversationMemory
+from me_chatbot import (
+    extract_email,
+    get_me,
+    get_user_country,
+    localize_prompt,
+    send_email_alert,
+    warm_up,
+)
+from scheduler import start_maintenance
+from session_store import SessionHistory, history_limits
+from stream_render import StreamBuffer
+from tracing import get_tracer
+
+
+@asynccontextmanager
+async def lifespan(app):
+    warm_up()  # build Me while the worker starts accepting connections
+    start_maintenance(keep_warm_enabled=False)  # no page to keep warm here
+    yield
+
+
+app = FastAPI(title="AI Resume Chatbot API", lifespan=lifespan)
+
+
+class ApiSessionHistory:
+    """Bounded in-process session state (history, memory, captured email)."""
+
+    def __init__(self, maxsize=1000, **history_limits):
+        self.maxsize = maxsize
+        self.history_limits = history_limits  # see session_store.SessionHistory
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, session_id):
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                session = {
+                    "history": SessionHistory(**self.history_limits),
+                    "memory": ConversationMemory(),
+                    "folded": hash(()),  # turns already in the memory's summary
+                    "email": None,
+                }
+                self._sessions[session_id] = session
+                while len(self._sessions) > self.maxsize:
+                    self._sessions.popitem(last=False)
+            self._sessions.move_to_end(session_id)
+            return session
+
+
+sessions = ApiSessionHistory(
+    int(os.getenv("CHAT_API_MAX_SESSIONS", "1000")), **history_limits()
+)
+
+
+def _client_ip(request):
+    peer = request.client.host if request.client else ""
+    return forwarded_client_ip(request.headers.get("x-forwarded-for", ""), peer)
+
+
+def _bad_request(message):
+    return JSONResponse({"error": {"message": message}}, status_code=400)
+
+
+def _busy(error, headers):
+    """429 (visitor over its rate) or 503 (no upstream slot), OpenAI style."""
+    kind = "rate_limit_exceeded" if error.status_code == 429 else "server_busy"
+    return JSONResponse(
+        {"error": {"message": str(error), "type": kind, "code": error.reason}},
+        status_code=error.status_code,
+        headers=dict(headers, **{"Retry-After": error.retry_after_header}),
+    )
+
+
+def _history_from_messages(messages):
+    """Pair prior user/assistant messages into ``(user, bot)`` tuples."""
+    history = []
+    pending_user = None
+    for msg in messages:
+        if msg.get("role") == "user":
+            pending_user = msg.get("content", "")
+        elif msg.get("role") == "assistant" and pending_user is not None:
+            history.append((pending_user, msg.get("content", "")))
+            pending_user = None
+    return history
+
+
+def _folded(history, memory):
+    return hash(tuple(history[: memory.folded]))
+
+
+def _chunk(completion_id, model, content=None, finish_reason=None):
+    delta = {"content": content} if content is not None else {}
+    return {
+        "id": completion_id,
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+    }
+
+
+@app.get("/healthz")
+def healthz():
+    return {"status": "ok"}
+
+
+@app.get("/metrics")
+def metrics():
+    """Stage latency histograms of this worker (Prometheus text format)."""
+    return PlainTextResponse(
+        get_tracer().prometheus(), media_type="text/plain; version=0.0.4"
+    )
+
+
+@app.get("/v1/usage")
+def usage(
+    group_by: str = "provider",
+    day: str = None,
+    session_id: str = None,
+    provider: str = None,
+    language: str = None,
+):
+    """Tokens and cost recorded by this worker, e.g. ``?group_by=day,language``."""
+    keys = tuple(k for k in group_by.split(",") if k)
+    if not set(keys) <= set(KEY_FIELDS):
+        return _bad_request(f"group_by must be among {', '.join(KEY_FIELDS)}")
+    rows = get_cost_ledger().query(
+        keys, day=day, session_id=session_id, provider=provider, language=language
+    )
+    return {"object": "list", "data": rows}
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    try:
+        body = await request.json()
+        messages = body.get("messages") or []
+    except (json.JSONDecodeError, ValueError, AttributeError):
+        return _bad_request("body must be a JSON object")
+    if not isinstance(messages, list) or not all(
+        isinstance(msg, dict) for msg in messages
+    ):
+        return _bad_request("messages must be a list of objects")
+    if not messages or messages[-1].get("role") != "user":
+        return _bad_request("last message must have role 'user'")
+    if not isinstance(messages[-1].get("content", ""), str):
+        return _bad_request("last message content must be a string")
+    client_session = body.get("session_id") or request.headers.get("x-session-id")
+    if client_session is not None:
+        client_session = str(client_session)
+    session_id = client_session or str(uuid.uuid4())
+    language = body.get("language") or "English"
+    headers = {"X-Session-Id": session_id}
+    client_ip = _client_ip(request)
+    trace = get_tracer().start("chat", session_id=session_id, language=language)
+    try:
+        # A fresh id per request would dodge the session limit: IP only then
+        get_admission_controller().admit(client_session, client_ip)
+    except Busy as e:
+        trace.finish("busy")
+        return _busy(e, headers)
+    user_country = body.get("user_country")
+    if user_country is None:
+        with trace.span("geo"):
+            user_country = get_user_country(client_ip)
+    display_message = messages[-1].get("content", "")
+    session = sessions.get(session_id)
+
+    history = _history_from_messages(messages[:-1])
+    memory = session["memory"] if client_session else None
+    server_history = len(messages) == 1 and bool(session["history"])
+    if server_history:
+        history = session["history"]
+    elif memory is not None and _folded(history, memory) != session["folded"]:
+        # The client resends the whole conversation; the summary only stays
+        # valid while the turns it already folded are unchanged.
+        memory.reset()
+
+    # 📧 Same email capture as the Streamlit app
+    email = extract_email(display_message)
+    if email and not session["email"]:
+        session["email"] = email
+        send_email_alert(email, session_id)  # queued, never blocks the reply
+
+    model = body.get("model") or "al-mateus"
+    completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+
+    async def generate():
+        with trace.active():
+            chunks = await get_me().achat_stream(
+                localize_prompt(display_message, language),
+                history,
+                user_country=user_country,
+                memory=memory,
+                language=language,
+                cacheable=bool(body.get("cacheable")),
+            )
+        return trace.astream(chunks)
+
+    def finish(full_response):
+        if server_history or not history:
+            session["history"].append((display_message, full_response))
+        if memory is not None:
+            session["folded"] = _folded(history, memory)
+        with trace.span("persist"):
+            get_chat_shipper().record_turn(
+                session_id, language, display_message, full_response
+            )
+        trace.finish()
+
+    async def collect():
+        try:
+            full_response = "".join([content async for content in await generate()])
+        except Busy:
+            trace.finish("busy")
+            raise
+        except Exception:
+            trace.finish("error")
+            raise
+        await run_in_threadpool(finish, full_response)  # spool write
+        return full_response
+
+    if not body.get("stream"):
+        try:
+            full_response = await collect()
+        except Busy as e:
+            return _busy(e, headers)
+        return JSONResponse(
+            {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [
+                    {
+                        "index": 0,
+                        "message": {"role": "assistant", "content": full_response},
+                        "finish_reason": "stop",
+                    }
+                ],
+            },
+            headers=headers,
+        )
+
+    # Admitted (or queued for a slot) before the response starts, so a busy
+    # worker can still answer with a status code.
+    try:
+        chunks = await generate()
+    except Busy as e:
+        trace.finish("busy")
+        return _busy(e, headers)
+    except Exception as e:
+        trace.finish("error")
+        return JSONResponse(
+            {"error": {"message": str(e), "type": type(e).__name__}},
+            status_code=500,
+            headers=headers,
+        )
+
+    async def sse():
+        answer = StreamBuffer()
+        try:
+            async for content in chunks:
+                answer.append(content)
+                yield f"data: {json.dumps(_chunk(completion_id, model, content), ensure_ascii=False)}\n\n"
+        except Exception as e:
+            trace.finish("error")
+            error = {"error": {"message": str(e), "type": type(e).__name__}}
+            yield f"data: {json.dumps(error)}\n\n"
+            return
+        await run_in_threadpool(finish, answer.text())
+        yield f"data: {json.dumps(_chunk(completion_id, model, finish_reason='stop'))}\n\n"
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(sse(), media_type="text/event-stream", headers=headers)
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run(
+        "chat_api:app",
+        host=os.getenv("CHAT_API_HOST", "0.0.0.0"),
+        port=int(os.getenv("CHAT_API_PORT", "8000")),
+        workers=int(os.getenv("CHAT_API_WORKERS", "4")),
+    )
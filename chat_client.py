@@ -0,0 +1,109 @@
+"""Thin client for ``chat_api`` so the Streamlit app can run without local LLM logic.
+
+Set ``CHAT_API_URL`` (e.g. ``http://chat-api:8000``) and ``app.py`` uses
+``RemoteMe`` in place of ``Me``. It speaks the API's OpenAI-compatible SSE
+stream and yields the same text chunks as ``Me.chat_stream``. Email capture, localization and transcript logging
+then happen server-side, and so does admission control: pass the visitor's
+``client_ip`` (sent as ``X-Forwarded-For``) and a 429/503 answer raises
+``admission.Busy`` like a local rejection.
+"""
+
+import os
+
+import requests
+
+from admission import Busy
+from sse_parser import iter_content
+
+
+class RemoteMe:
+    def __init__(self, base_url=None, timeout=(5, 120)):
+        self.base_url = (base_url or os.getenv("CHAT_API_URL", "")).rstrip("/")
+        self.timeout = timeout
+        self.session = requests.Session()
+
+    def _payload(self, message, history, stream, **options):
+        messages = []
+        for user_msg, bot_msg in history:
+            if not user_msg and not bot_msg:
+                continue  # dropped by the session byte cap (session_store)
+            messages.append({"role": "user", "content": user_msg})
+            messages.append({"role": "assistant", "content": bot_msg})
+        messages.append({"role": "user", "content": message})
+        payload = {"messages": messages, "stream": stream}
+        payload.update({k: v for k, v in options.items() if v is not None})
+        return payload
+
+    @staticmethod
+    def _headers(client_ip):
+        return {"X-Forwarded-For": client_ip} if client_ip else {}
+
+    @staticmethod
+    def _check(response):
+        if response.status_code in (429, 503):
+            try:
+                reason = response.json()["error"]["code"]
+            except (ValueError, KeyError, TypeError):
+                reason = "busy"  # e.g. a proxy's own 503 page
+            retry_after = float(response.headers.get("Retry-After", "1"))
+            response.close()
+            raise Busy(reason, retry_after)
+        response.raise_for_status()
+
+    def chat_stream(
+        self,
+        message,
+        history,
+        session_id=None,
+        language=None,
+        user_country=None,
+        cacheable=False,
+        client_ip=None,
+        **_,
+    ):
+        payload = self._payload(
+            message,
+            history,
+            True,
+            session_id=session_id,
+            language=language,
+            user_country=user_country,
+            cacheable=cacheable,
+        )
+        response = self.session.post(
+            f"{self.base_url}/v1/chat/completions",
+            json=payload,
+            headers=self._headers(client_ip),
+            stream=True,
+            timeout=self.timeout,
+        )
+        self._check(response)
+        with response:
+            yield from iter_content(response.iter_content(chunk_size=None))
+
+    def chat(
+        self,
+        message,
+        history,
+        session_id=None,
+        language=None,
+        user_country=None,
+        client_ip=None,
+        **_,
+    ):
+        payload = self._payload(
+            message,
+            history,
+            False,
+            session_id=session_id,
+            language=language,
+            user_country=user_country,
+        )
+        response = self.session.post(
+            f"{self.base_url}/v1/chat/completions",
+            json=payload,
+            headers=self._headers(client_ip),
+            timeout=self.timeout,
+        )
+        self._check(response)
+        return response.json()["choices"][0]["message"]["content"]
@@ -0,0 +1,352 @@
+"""Background chat-log shipping.
+
+``save_chat_to_s3`` used to run after every reply: a fresh boto3 client, the
+whole history re-serialized, and a blocking ``put_object`` under a new key.
+That is O(history) per turn and leaves one redundant object per turn.
+
+``ChatLogShipper`` instead appends one small delta record per turn to a
+local write-ahead spool (``transcript_spool``). A worker thread drains the
+spool as append-only JSONL objects under
+``chats/deltas/<session_id>/`` whenever the maintenance scheduler's
+``chat-log-flush`` job fires (every ``CHAT_LOG_FLUSH_INTERVAL`` seconds,
+default 5), retrying with backoff while S3 is down.
+When a session ends (explicitly, idle timeout, or process exit) its deltas
+are compacted into a single
+``chats/<timestamp>_<session_id>.json`` transcript in the same format
+``save_chat_to_s3`` always produced.
+
+Backends are pluggable: ``S3Backend`` for production and
+``FilesystemBackend`` for local development and tests (moto works too,
+since ``S3Backend`` accepts any boto3-compatible client).
+"""
+
+import atexit
+import json
+import os
+import pathlib
+import queue
+import threading
+import time
+from datetime import datetime
+
+from scheduler import get_scheduler
+from transcript_spool import TranscriptSpool
+
+DELTA_DIR = "deltas"
+DEFAULT_SPOOL_DIR = pathlib.Path(__file__).parent / ".cache" / "spool"
+
+
+class FilesystemBackend:
+    """Stores objects as files under ``root`` (keys map to relative paths)."""
+
+    def __init__(self, root):
+        self.root = pathlib.Path(root)
+
+    def put(self, key, body):
+        path = self.root / key
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(path.name + ".tmp")
+        tmp.write_bytes(body)
+        os.replace(tmp, path)
+
+    def get(self, key):
+        return (self.root / key).read_bytes()
+
+    def list(self, prefix):
+        base = self.root / prefix
+        if not base.exists():
+            return []
+        return sorted(
+            str(p.relative_to(self.root)).replace(os.sep, "/")
+            for p in base.rglob("*")
+            if p.is_file() and not p.name.endswith(".tmp")
+        )
+
+    def delete(self, keys):
+        for key in keys:
+            try:
+                (self.root / key).unlink()
+            except FileNotFoundError:
+                pass
+
+
+class S3Backend:
+    """Stores objects in an S3 bucket using one long-lived client."""
+
+    def __init__(self, bucket, client=None):
+        if client is None:
+            import boto3
+
+            client = boto3.client(
+                "s3",
+                aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID"),
+                aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY"),
+                region_name=os.getenv("AWS_REGION"),
+            )
+        self.bucket = bucket
+        self.client = client
+
+    def put(self, key, body):
+        content_type = "application/json"
+        if key.endswith(".jsonl"):
+            content_type = "application/x-ndjson"
+        self.client.put_object(
+            Bucket=self.bucket, Key=key, Body=body, ContentType=content_type
+        )
+
+    def get(self, key):
+        return self.client.get_object(Bucket=self.bucket, Key=key)["Body"].read()
+
+    def list(self, prefix):
+        keys = []
+        paginator = self.client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=prefix):
+            keys.extend(obj["Key"] for obj in page.get("Contents", []))
+        return sorted(keys)
+
+    def delete(self, keys):
+        keys = list(keys)
+        for i in range(0, len(keys), 1000):
+            self.client.delete_objects(
+                Bucket=self.bucket,
+                Delete={"Objects": [{"Key": k} for k in keys[i : i + 1000]]},
+            )
+
+
+def _dumps(obj):
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
+
+
+class ChatLogShipper:
+    """Spool-backed worker that ships per-turn deltas and compacts sessions.
+
+    Turns are appended to a local ``TranscriptSpool`` first; on every
+    ``flush()`` (the scheduler's job for the process-wide shipper) the
+    worker drains sealed spool segments to the backend, retrying failed
+    uploads with exponential backoff. Segments left over from dead
+    processes are claimed and replayed.
+    """
+
+    def __init__(
+        self,
+        backend,
+        spool,
+        prefix="chats/",
+        max_queue=1000,
+        idle_timeout=1800.0,
+        fsync_interval=0.5,
+        max_backoff=300.0,
+    ):
+        self.backend = backend
+        self.spool = spool
+        self.prefix = prefix
+        self.idle_timeout = idle_timeout
+        self.fsync_interval = fsync_interval
+        self.max_backoff = max_backoff
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._seq = {}  # session_id -> next sequence number
+        self._sessions = {}  # session_id -> last_seen (worker thread only)
+        self._failures = 0
+        self._retry_at = 0.0
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._replay()
+        self._thread = threading.Thread(
+            target=self._run, name="chat-log-shipper", daemon=True
+        )
+        self._thread.start()
+
+    # -- producer side (called from request threads) ----------------------
+
+    def record_turn(self, session_id, language, user_msg, bot_msg):
+        """Durably spool one turn; never waits on the network."""
+        with self._lock:
+            seq = self._seq.get(session_id, 0)
+            self._seq[session_id] = seq + 1
+        record = {
+            "session_id": session_id,
+            "seq": seq,
+            "timestamp": datetime.now().isoformat(),
+            "language": language,
+            "user": user_msg,
+            "bot": bot_msg,
+        }
+        try:
+            self.spool.append(record)
+        except OSError as e:
+            print(f"❌ Failed to spool chat turn for {session_id}: {e}")
+            return False
+        try:
+            self._queue.put_nowait(("turn", session_id))
+        except queue.Full:
+            pass  # the record is spooled; only idle tracking is delayed
+        return True
+
+    def end_session(self, session_id):
+        """Ask the worker to upload and compact ``session_id``."""
+        try:
+            self._queue.put_nowait(("end", session_id))
+        except queue.Full:
+            pass  # picked up later by the idle sweep
+
+    def flush(self):
+        """Ask the worker to upload sealed segments and compact idle sessions."""
+        if self._stopped.is_set():
+            return
+        try:
+            self._queue.put_nowait(("flush", None))
+        except queue.Full:
+            pass  # the worker is busy; the next flush catches up
+
+    def close(self, timeout=10.0):
+        """Upload everything, compact all known sessions and stop the worker."""
+        if self._stopped.is_set():
+            return
+        self._queue.put(("stop", None))
+        self._thread.join(timeout)
+
+    # -- worker side -------------------------------------------------------
+
+    def _replay(self):
+        """Claim segments of dead processes and register their sessions."""
+        now = time.monotonic()
+        for path in self.spool.claim_orphans():
+            for record in self.spool.read(path):
+                self._sessions[record["session_id"]] = now
+
+    def _run(self):
+        next_sync = time.monotonic() + self.fsync_interval
+        while True:
+            timeout = max(next_sync - time.monotonic(), 0)
+            try:
+                kind, item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                kind, item = "tick", None
+
+            if kind == "turn":
+                self._sessions[item] = time.monotonic()
+            elif kind == "flush":
+                if self._upload():
+                    self._compact_idle()
+            elif kind == "end":
+                if self._upload(force=True):
+                    self._compact(item)
+            elif kind == "stop":
+                if self._upload(force=True):
+                    for session_id in list(self._sessions):
+                        self._compact(session_id)
+                self.spool.close()
+                self._stopped.set()
+                return
+
+            now = time.monotonic()
+            if now >= next_sync:
+                self.spool.sync()
+                next_sync = now + self.fsync_interval
+
+    def _delta_prefix(self, session_id):
+        return f"{self.prefix}{DELTA_DIR}/{session_id}/"
+
+    def _upload(self, force=False):
+        """Drain sealed spool segments; True once the spool is fully shipped."""
+        if not force and time.monotonic() < self._retry_at:
+            return False
+        self._replay()  # a worker that died since the last flush
+        if self.spool.has_active_data():
+            self.spool.seal()
+        for path in self.spool.pending_segments():
+            try:
+                self._ship_segment(path)
+            except Exception as e:
+                self._failures += 1
+                backoff = min(2 ** (self._failures - 1), self.max_backoff)
+                self._retry_at = time.monotonic() + backoff
+                print(f"❌ Chat log upload failed (retry in {backoff:.0f}s): {e}")
+                return False
+            self.spool.remove(path)
+        self._failures = 0
+        return True
+
+    def _ship_segment(self, path):
+        by_session = {}
+        for record in self.spool.read(path):
+            by_session.setdefault(record["session_id"], []).append(record)
+        for session_id, records in by_session.items():
+            # Keyed by segment name, so a retried upload overwrites itself.
+            key = f"{self._delta_prefix(session_id)}{path.stem}.jsonl"
+            body = "".join(_dumps(r) + "\n" for r in records).encode("utf-8")
+            self.backend.put(key, body)
+
+    def _compact_idle(self):
+        cutoff = time.monotonic() - self.idle_timeout
+        for session_id, last_seen in list(self._sessions.items()):
+            if last_seen < cutoff:
+                self._compact(session_id)
+
+    def _compact(self, session_id):
+        """Merge a session's deltas into one transcript object."""
+        try:
+            keys = self.backend.list(self._delta_prefix(session_id))
+            if not keys:
+                self._forget(session_id)
+                return
+            records = []
+            for key in keys:
+                for line in self.backend.get(key).decode("utf-8").splitlines():
+                    if line:
+                        records.append(json.loads(line))
+            # seq restarts after a process restart; the timestamp orders runs.
+            records.sort(key=lambda r: (r["timestamp"], r["seq"]))
+            chat_data = {
+                "session_id": session_id,
+                "timestamp": records[-1]["timestamp"],
+                "language": records[-1]["language"],
+                "history": [[r["user"], r["bot"]] for r in records],
+            }
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            key = f"{self.prefix}{timestamp}_{session_id}.json"
+            self.backend.put(key, _dumps(chat_data).encode("utf-8"))
+            self.backend.delete(keys)
+            self._forget(session_id)
+            print(f"✅ Chat saved: {key}")
+        except Exception as e:
+            print(f"❌ Failed to compact chat {session_id}: {e}")
+
+    def _forget(self, session_id):
+        self._sessions.pop(session_id, None)
+        with self._lock:
+            self._seq.pop(session_id, None)
+
+
+def backend_from_env():
+    """``CHAT_LOG_DIR`` → filesystem, else ``S3_BUCKET`` → S3, else ./chats."""
+    if os.getenv("CHAT_LOG_DIR"):
+        return FilesystemBackend(os.getenv("CHAT_LOG_DIR"))
+    if os.getenv("S3_BUCKET"):
+        return S3Backend(os.getenv("S3_BUCKET"))
+    return FilesystemBackend(pathlib.Path(__file__).parent)
+
+
+_shipper = None
+_shipper_lock = threading.Lock()
+
+
+def get_chat_shipper():
+    """Return the process-wide ``ChatLogShipper`` (started on first use)."""
+    global _shipper
+    if _shipper is None:
+        with _shipper_lock:
+            if _shipper is None:
+                spool_dir = os.getenv("CHAT_SPOOL_DIR", DEFAULT_SPOOL_DIR)
+                _shipper = ChatLogShipper(
+                    backend_from_env(),
+                    TranscriptSpool(spool_dir),
+                    idle_timeout=float(os.getenv("CHAT_LOG_IDLE_TIMEOUT", "1800")),
+                )
+                get_scheduler().every(
+                    "chat-log-flush",
+                    float(os.getenv("CHAT_LOG_FLUSH_INTERVAL", "5")),
+                    _shipper.flush,
+                )
+                atexit.register(_shipper.close)
+    return _shipper
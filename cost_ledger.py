@@ -0,0 +1,312 @@
+"""Token and cost ledger per day, session, provider and language.
+
+Provider streams report usage since the prompt-cache change (OpenAI with
+``stream_options.include_usage``, DeepSeek in its last chunk), but the
+numbers were only printed. ``CostLedger`` prices them and aggregates
+requests, prompt/cached/completion tokens and USD per
+``(day, session, provider, model, language)``:
+
+- turns come in through finished ``tracing`` traces, which carry the
+  session and language and the usage reported during the turn (also under
+  ``LLM_ASYNC_ENGINE``: the engine's tasks run in a copy of the caller's
+  context, so the usage lands in the turn's trace, once). When a provider
+  reported nothing (a stream dropped before its last chunk) the turn is
+  estimated from the prompt size ``Me`` annotates and the streamed chunk
+  count, and counted as ``estimated``. Cache replays
+  (``tracing.REPLAYED``) cost nothing and are not recorded;
+- usage reported outside any trace (e.g. the non-streaming fallback) is
+  recorded with an empty session.
+
+``query(group_by, **filters)`` aggregates in memory; every
+``COST_LEDGER_FLUSH_INTERVAL`` seconds (default 60) the scheduler writes
+each changed day to ``ledger/<day>/<host>-<pid>.json`` through the chat-log
+backend (``CHAT_LOG_DIR`` or S3), and ``python cost_ledger.py report DIR``
+sums those files.
+
+Budgets (USD, 0 = off): once today's spend reaches ``COST_BUDGET_DAILY``,
+or a session's reaches ``COST_BUDGET_SESSION``, ``restrict`` narrows the
+providers offered to the router to the cheapest one (budgets are tracked
+per process, like everything else in memory). Prices are USD per
+million tokens, overridable with ``LLM_PRICES`` (JSON, same shape as
+``DEFAULT_PRICES``); check the providers' pricing pages.
+"""
+
+import argparse
+import atexit
+import json
+import os
+import pathlib
+import socket
+import threading
+from datetime import date
+
+from tracing import REPLAYED
+
+# model -> USD per 1M tokens: uncached input, cached input, output
+DEFAULT_PRICES = {
+    "gpt-4o": {"input": 2.50, "cached": 1.25, "output": 10.00},
+    "gpt-4o-mini": {"input": 0.15, "cached": 0.075, "output": 0.60},
+    "deepseek-chat": {"input": 0.27, "cached": 0.07, "output": 1.10},
+}
+FIELDS = ("requests", "prompt_tokens", "cached_tokens", "completion_tokens")
+KEY_FIELDS = ("day", "session_id", "provider", "model", "language")
+# Reference request used to rank providers by price.
+REFERENCE_TOKENS = (3000, 400)
+
+
+class CostLedger:
+    def __init__(self, prices=None, daily_budget=0.0, session_budget=0.0):
+        self.prices = dict(DEFAULT_PRICES, **(prices or {}))
+        self.daily_budget = daily_budget
+        self.session_budget = session_budget
+        self._rows = {}  # KEY_FIELDS tuple -> dict of FIELDS + estimated + cost
+        self._day_cost = {}
+        self._session_cost = {}
+        self._dirty = set()  # days changed since the last flush
+        self._lock = threading.Lock()
+        self._warned = set()
+
+    # -- recording ---------------------------------------------------------
+
+    def cost(self, model, prompt_tokens, cached_tokens, completion_tokens):
+        price = self.prices.get(model)
+        if price is None:
+            if model not in self._warned:
+                self._warned.add(model)
+                print(f"⚠️ No price for model {model}; counted as $0")
+            return 0.0
+        uncached = prompt_tokens - cached_tokens
+        return (
+            uncached * price["input"]
+            + cached_tokens * price["cached"]
+            + completion_tokens * price["output"]
+        ) / 1_000_000
+
+    def record(self, usage, session_id=None, language=None, estimated=False):
+        """Add one request's ``PromptUsage``."""
+        day = date.today().isoformat()
+        key = (day, session_id or "", usage.provider, usage.model, language or "")
+        cost = self.cost(
+            usage.model,
+            usage.prompt_tokens,
+            usage.cached_tokens,
+            usage.completion_tokens,
+        )
+        with self._lock:
+            row = self._rows.get(key)
+            if row is None:
+                row = self._rows[key] = dict.fromkeys(FIELDS, 0)
+                row.update(estimated=0, cost_usd=0.0)
+            row["requests"] += 1
+            row["prompt_tokens"] += usage.prompt_tokens
+            row["cached_tokens"] += usage.cached_tokens
+            row["completion_tokens"] += usage.completion_tokens
+            row["estimated"] += int(estimated)
+            row["cost_usd"] += cost
+            self._day_cost[day] = self._day_cost.get(day, 0.0) + cost
+            if session_id:
+                self._session_cost[session_id] = (
+                    self._session_cost.get(session_id, 0.0) + cost
+                )
+            self._dirty.add(day)
+        return cost
+
+    def on_trace(self, trace):
+        """Tracer listener: record the usage of a finished turn."""
+        session_id = trace.attrs.get("session_id")
+        language = trace.attrs.get("language")
+        if trace.usage:
+            for usage in trace.usage:
+                self.record(usage, session_id, language)
+            return
+        prompt = trace.attrs.get("prompt_estimate")
+        if prompt is None or trace.attrs.get("cache") in REPLAYED:
+            return  # nothing was sent upstream in this turn
+        from prompt_cache import PromptUsage
+
+        usage = PromptUsage(
+            provider=trace.attrs.get("provider", ""),
+            model=trace.attrs.get("model", ""),
+            prompt_tokens=prompt,
+            cached_tokens=0,
+            completion_tokens=trace.chunks,  # ~1 token per streamed chunk
+        )
+        self.record(usage, session_id, language, estimated=True)
+
+    def on_usage(self, usage):
+        """UsageTracker listener for requests made outside any trace."""
+        from tracing import current
+
+        if current() is None:
+            self.record(usage)
+
+    # -- queries and budgets ----------------------------------------------
+
+    def query(self, group_by=("provider",), **filters):
+        """Sum rows matching ``filters`` (e.g. ``day=``, ``language=``)
+        grouped by any of ``KEY_FIELDS``; one dict per group."""
+        groups = {}
+        with self._lock:
+            for key, row in self._rows.items():
+                values = dict(zip(KEY_FIELDS, key))
+                if any(values[k] != v for k, v in filters.items() if v is not None):
+                    continue
+                group = tuple(values[k] for k in group_by)
+                total = groups.get(group)
+                if total is None:
+                    total = groups[group] = dict(zip(group_by, group))
+                    total.update(dict.fromkeys(FIELDS, 0), estimated=0, cost_usd=0.0)
+                for field in FIELDS + ("estimated", "cost_usd"):
+                    total[field] += row[field]
+        return sorted(groups.values(), key=lambda r: -r["cost_usd"])
+
+    def spent_today(self):
+        with self._lock:
+            return self._day_cost.get(date.today().isoformat(), 0.0)
+
+    def session_spend(self, session_id):
+        with self._lock:
+            return self._session_cost.get(session_id, 0.0)
+
+    def cheapest(self, providers, models):
+        """The provider whose model costs least for a typical request."""
+        prompt, completion = REFERENCE_TOKENS
+        return min(
+            providers,
+            key=lambda name: self.cost(models[name], prompt, 0, completion),
+        )
+
+    def restrict(self, allowed, models, session_id=None):
+        """``allowed`` narrowed to its cheapest provider when over budget."""
+        if len(allowed) < 2:
+            return allowed
+        reason = None
+        if self.daily_budget and self.spent_today() >= self.daily_budget:
+            reason = f"daily budget ${self.daily_budget:g}"
+        elif (
+            self.session_budget
+            and session_id
+            and self.session_spend(session_id) >= self.session_budget
+        ):
+            reason = f"session budget ${self.session_budget:g}"
+        if reason is None:
+            return allowed
+        cheapest = self.cheapest(allowed, models)
+        if reason not in self._warned:
+            self._warned.add(reason)
+            print(f"⚠️ Over {reason}: routing to {cheapest}")
+        return [cheapest]
+
+    # -- persistence -------------------------------------------------------
+
+    def flush(self, backend, prefix="ledger/"):
+        """Write every changed day's rows to the backend."""
+        with self._lock:
+            days, self._dirty = self._dirty, set()
+            snapshot = {
+                day: [
+                    dict(zip(KEY_FIELDS, key), **row)
+                    for key, row in self._rows.items()
+                    if key[0] == day
+                ]
+                for day in days
+            }
+        writer = f"{socket.gethostname()}-{os.getpid()}"
+        for day, rows in snapshot.items():
+            body = json.dumps(rows, ensure_ascii=False).encode("utf-8")
+            try:
+                backend.put(f"{prefix}{day}/{writer}.json", body)
+            except Exception as e:
+                with self._lock:
+                    self._dirty.add(day)
+                print(f"❌ Cost ledger flush failed for {day}: {e}")
+        self._forget_old_days()
+
+    def _forget_old_days(self, keep=2):
+        """Drop flushed rows older than the last ``keep`` days."""
+        with self._lock:
+            days = sorted({key[0] for key in self._rows} | self._dirty)
+            stale = set(days[:-keep]) - self._dirty
+            for key in [k for k in self._rows if k[0] in stale]:
+                del self._rows[key]
+            for day in stale:
+                self._day_cost.pop(day, None)
+            if stale:
+                self._session_cost.clear()  # rebuilt from the remaining rows
+                for key, row in self._rows.items():
+                    if key[1]:
+                        self._session_cost[key[1]] = (
+                            self._session_cost.get(key[1], 0.0) + row["cost_usd"]
+                        )
+
+
+_ledger = None
+_ledger_lock = threading.Lock()
+
+
+def get_cost_ledger():
+    """Return the process-wide ``CostLedger`` (flushed by the scheduler)."""
+    global _ledger
+    if _ledger is None:
+        with _ledger_lock:
+            if _ledger is None:
+                from chat_log import backend_from_env
+                from prompt_cache import get_usage_tracker
+                from scheduler import get_scheduler
+                from tracing import get_tracer
+
+                prices = json.loads(os.getenv("LLM_PRICES") or "{}")
+                ledger = CostLedger(
+                    prices,
+                    daily_budget=float(os.getenv("COST_BUDGET_DAILY", "0")),
+                    session_budget=float(os.getenv("COST_BUDGET_SESSION", "0")),
+                )
+                get_tracer().add_listener(ledger.on_trace)
+                get_usage_tracker().add_listener(ledger.on_usage)
+                backend = backend_from_env()
+                get_scheduler().every(
+                    "cost-ledger-flush",
+                    float(os.getenv("COST_LEDGER_FLUSH_INTERVAL", "60")),
+                    lambda: ledger.flush(backend),
+                )
+                atexit.register(ledger.flush, backend)
+                _ledger = ledger
+    return _ledger
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sum flushed cost ledger files.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    report = sub.add_parser("report", help="totals from ledger/<day>/*.json")
+    report.add_argument("root", help="directory containing ledger/ (CHAT_LOG_DIR)")
+    report.add_argument("--by", default="day,provider", help="comma-separated keys")
+    report.add_argument("--day", help="only this day (YYYY-MM-DD)")
+    args = parser.parse_args()
+
+    group_by = tuple(args.by.split(","))
+    groups = {}
+    for path in sorted(pathlib.Path(args.root).glob("ledger/*/*.json")):
+        for row in json.loads(path.read_text(encoding="utf-8")):
+            if args.day and row["day"] != args.day:
+                continue
+            group = tuple(row[k] or "-" for k in group_by)
+            total = groups.setdefault(
+                group, dict.fromkeys(FIELDS + ("estimated", "cost_usd"), 0)
+            )
+            for field in total:
+                total[field] += row[field]
+    header = " ".join(f"{k:>14}" for k in group_by)
+    print(
+        f"{header} {'requests':>9} {'prompt':>10} {'cached':>10} {'output':>9} {'usd':>9}"
+    )
+    for group, total in sorted(groups.items()):
+        print(
+            " ".join(f"{str(v)[:14]:>14}" for v in group)
+            + f" {total['requests']:>9} {total['prompt_tokens']:>10}"
+            f" {total['cached_tokens']:>10} {total['completion_tokens']:>9}"
+            f" {total['cost_usd']:>9.4f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
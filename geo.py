@@ -0,0 +1,191 @@
+"""Offline visitor geolocation.
+
+Country routing used to call ipinfo.io on every message, which cost up to 3s
+per turn and geolocated the *server* rather than the visitor. This module
+resolves the visitor's IP against a local IP-range index (sorted arrays +
+bisect) and memoizes results in a small TTL cache, so a lookup costs
+microseconds and never touches the network.
+
+The index is loaded from a CSV with one range per row::
+
+    start_ip,end_ip,country
+
+Addresses may be dotted/colon notation or integers, which covers the free
+db-ip "country lite" and IP2Location LITE CSV exports. Point
+``IP_COUNTRY_DB`` at the file (default: ``data/ip_country.csv``); without it
+every visitor resolves to ``USER_COUNTRY`` and a warning is printed once.
+IPv4 and IPv6 ranges are kept in separate arrays, so an IPv6 address never
+falls into an IPv4 range whose integers happen to cover it (IPv4-mapped
+IPv6 addresses are looked up as IPv4).
+
+The visitor IP comes from ``X-Forwarded-For``, whose left end is whatever
+the client sent. Only the last ``TRUSTED_PROXY_HOPS`` entries (default 1,
+one reverse proxy in front of the app) were appended by proxies we run, so
+the client is the entry that many hops from the right; with 0 the header is
+ignored and the peer address is used.
+"""
+
+import bisect
+import csv
+import ipaddress
+import os
+import pathlib
+import threading
+import time
+
+DEFAULT_DB_PATH = pathlib.Path(__file__).parent / "data" / "ip_country.csv"
+
+
+def _parse_ip(value):
+    """``(version, integer)`` for an address in any notation the CSVs use."""
+    value = value.strip()
+    address = ipaddress.ip_address(int(value) if value.isdigit() else value)
+    if address.version == 6 and address.ipv4_mapped is not None:
+        address = address.ipv4_mapped
+    return address.version, int(address)
+
+
+class IPCountryIndex:
+    """Sorted range index mapping an IP address to an ISO country code.
+
+    ``ranges`` are ``(version, start, end, country)`` tuples.
+    """
+
+    def __init__(self, ranges=()):
+        self._tables = {}
+        for version in (4, 6):
+            rows = sorted(r[1:] for r in ranges if r[0] == version)
+            self._tables[version] = (
+                [start for start, _, _ in rows],
+                [end for _, end, _ in rows],
+                [country for _, _, country in rows],
+            )
+
+    def __len__(self):
+        return sum(len(starts) for starts, _, _ in self._tables.values())
+
+    @classmethod
+    def from_csv(cls, path):
+        ranges = []
+        with open(path, newline="", encoding="utf-8") as f:
+            for row in csv.reader(f):
+                if len(row) < 3 or row[0].startswith("#"):
+                    continue
+                try:
+                    (version, start), (end_version, end) = map(_parse_ip, row[:2])
+                except ValueError:
+                    continue  # header row or malformed line
+                if version != end_version:
+                    continue
+                ranges.append((version, start, end, row[2].strip().lower()))
+        return cls(ranges)
+
+    def lookup(self, ip):
+        """Return the lowercase country code for ``ip`` or ``""``."""
+        try:
+            version, value = _parse_ip(ip)
+        except ValueError:
+            return ""
+        starts, ends, countries = self._tables[version]
+        pos = bisect.bisect_right(starts, value) - 1
+        if pos >= 0 and value <= ends[pos]:
+            return countries[pos]
+        return ""
+
+
+class TTLCache:
+    """Tiny thread-safe dict with per-entry expiry and a size cap."""
+
+    def __init__(self, ttl=3600, maxsize=10000):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+            value, expires = item
+            if expires < time.monotonic():
+                del self._data[key]
+                return default
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            if len(self._data) >= self.maxsize:
+                self.purge_locked()
+                if len(self._data) >= self.maxsize:
+                    self._data.pop(next(iter(self._data)))
+            self._data[key] = (value, time.monotonic() + self.ttl)
+
+    def purge(self):
+        with self._lock:
+            self.purge_locked()
+
+    def purge_locked(self):
+        now = time.monotonic()
+        for key in [k for k, (_, exp) in self._data.items() if exp < now]:
+            del self._data[key]
+
+
+_index = None
+_index_lock = threading.Lock()
+_cache = TTLCache(ttl=int(os.getenv("GEO_CACHE_TTL", "3600")))
+
+
+def get_index():
+    """Load the IP-range index once per process (empty if no DB is present)."""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                path = pathlib.Path(os.getenv("IP_COUNTRY_DB", DEFAULT_DB_PATH))
+                try:
+                    _index = IPCountryIndex.from_csv(path)
+                except OSError as e:
+                    print(
+                        f"⚠️ IP country DB not loaded ({e}); set IP_COUNTRY_DB, "
+                        "visitors fall back to USER_COUNTRY"
+                    )
+                    _index = IPCountryIndex()
+    return _index
+
+
+def country_for_ip(ip):
+    """Resolve ``ip`` to a lowercase country code, memoized with a TTL."""
+    if not ip:
+        return ""
+    country = _cache.get(ip)
+    if country is None:
+        country = get_index().lookup(ip)
+        _cache.set(ip, country)
+    return country
+
+
+def forwarded_client_ip(forwarded, peer, hops=None):
+    """Client IP from an ``X-Forwarded-For`` value, trusting ``hops`` proxies."""
+    if hops is None:
+        hops = int(os.getenv("TRUSTED_PROXY_HOPS", "1"))
+    entries = [e.strip() for e in forwarded.split(",") if e.strip()]
+    if hops <= 0 or not entries:
+        return peer or ""
+    return entries[max(len(entries) - hops, 0)]
+
+
+def get_visitor_ip():
+    """Best-effort client IP for the current Streamlit session."""
+    try:
+        import streamlit as st
+
+        context = st.context
+    except (ImportError, AttributeError):
+        return ""
+    headers = getattr(context, "headers", None) or {}
+    peer = getattr(context, "ip_address", "") or ""
+    forwarded = headers.get("X-Forwarded-For", "")
+    if not forwarded and int(os.getenv("TRUSTED_PROXY_HOPS", "1")) > 0:
+        forwarded = headers.get("X-Real-Ip", "")  # set by the proxy, if any
+    return forwarded_client_ip(forwarded, peer)
@@ -0,0 +1,119 @@
+"""Hedged streaming across two providers.
+
+If the primary provider has not produced a first token within
+``hedge_after`` seconds, the secondary is started in parallel. Whichever
+streams first wins; the other is cancelled. A primary that fails before its
+first token triggers the secondary immediately, so an outage costs one
+failed connect instead of a full timeout plus a second request.
+
+A hedge opened next to a live primary is a second upstream stream, so it
+needs a slot of its own (``extra_slot``, the admission limit in ``Me``);
+with none free the turn keeps waiting on the primary and tries again after
+another ``hedge_after``. Cancelling is cooperative: a loser notices only
+when its next item arrives, so it keeps its connection and thread until
+then (at most the provider read timeout). The secondary holds its slot
+until that point; a losing primary is covered by the turn's own slot only
+until the turn ends, so a turn that finishes before its primary produced
+anything leaves that stream running briefly without a slot.
+"""
+
+import contextvars
+import queue
+import threading
+
+_CHUNK, _DONE, _ERROR = "chunk", "done", "error"
+
+
+class _Candidate(threading.Thread):
+    def __init__(self, index, factory, events, release=None):
+        super().__init__(name=f"hedge-{index}", daemon=True)
+        self.index = index
+        self.factory = factory
+        self.events = events
+        self.release = release  # frees the candidate's own slot, if any
+        self.cancelled = threading.Event()
+        self.context = contextvars.copy_context()  # keeps the turn's trace
+
+    def run(self):
+        self.context.run(self._run)
+
+    def _run(self):
+        stream = None
+        try:
+            stream = self.factory()
+            for item in stream:
+                if self.cancelled.is_set():
+                    return
+                self.events.put((self.index, _CHUNK, item))
+            self.events.put((self.index, _DONE, None))
+        except Exception as e:
+            self.events.put((self.index, _ERROR, e))
+        finally:
+            if stream is not None and hasattr(stream, "close"):
+                stream.close()
+            if self.release is not None:
+                self.release()
+
+
+def hedged_stream(primary, secondary, hedge_after, extra_slot=None):
+    """Yield items from whichever of two stream factories answers first.
+
+    ``primary`` and ``secondary`` are zero-argument callables returning
+    stream iterators. ``secondary`` may be ``None`` to disable hedging.
+    ``extra_slot`` is called before hedging next to a live primary and
+    returns a release callable, or ``None`` when no slot is free.
+    """
+    events = queue.Queue()
+    candidates = [_Candidate(0, primary, events)]
+    candidates[0].start()
+    winner = None
+    errors = []
+
+    def start_secondary():
+        if secondary is None or len(candidates) != 1:
+            return False
+        release = None
+        if extra_slot is not None and not errors:  # primary still open
+            release = extra_slot()
+            if release is None:
+                return False
+        candidates.append(_Candidate(1, secondary, events, release))
+        candidates[1].start()
+        return True
+
+    try:
+        # Phase 1: wait for the first chunk from anyone.
+        while winner is None:
+            timeout = hedge_after if len(candidates) == 1 else None
+            try:
+                index, kind, payload = events.get(timeout=timeout)
+            except queue.Empty:
+                start_secondary()
+                continue
+            if kind == _CHUNK:
+                winner = index
+                for other in candidates:
+                    if other.index != winner:
+                        other.cancelled.set()
+                yield payload
+            elif kind == _DONE:
+                return  # empty answer
+            else:
+                errors.append(payload)
+                if not start_secondary() and len(errors) >= len(candidates):
+                    raise errors[-1]
+
+        # Phase 2: relay the winner only.
+        while True:
+            index, kind, payload = events.get()
+            if index != winner:
+                continue
+            if kind == _CHUNK:
+                yield payload
+            elif kind == _DONE:
+                return
+            else:
+                raise payload
+    finally:
+        for candidate in candidates:
+            candidate.cancelled.set()
@@ -0,0 +1,135 @@
+"""Token-budgeted conversation history.
+
+Replaying every ``(user, bot)`` tuple on each turn makes prompts grow
+without bound until the provider rejects them. ``ConversationMemory`` keeps
+the last few turns verbatim (within a token budget) and folds everything
+older into a rolling summary. Folding is incremental: each turn is
+summarized exactly once, when it leaves the verbatim window, so per-turn
+prompt size and work both stay bounded.
+
+Tuning (environment variables):
+
+- ``HISTORY_KEEP_TURNS``      turns kept verbatim (default 6)
+- ``HISTORY_MAX_TOKENS``      token budget for verbatim turns (default 3000)
+- ``HISTORY_SUMMARY_TOKENS``  token budget for the rolling summary (default 600)
+"""
+
+import os
+import re
+from functools import lru_cache
+
+_encoding = None
+_encoding_loaded = False
+
+_WORDISH = re.compile(r"\w+|[^\w\s]", re.UNICODE)
+_SENTENCE_END = re.compile(r"(?<=[.!?。！？])\s")
+
+
+def _get_encoding():
+    """Load tiktoken on first use; it is slow to import and may be absent."""
+    global _encoding, _encoding_loaded
+    if not _encoding_loaded:
+        try:
+            import tiktoken
+
+            _encoding = tiktoken.get_encoding("cl100k_base")
+        except Exception:  # not installed, or encoding files unavailable offline
+            _encoding = None
+        _encoding_loaded = True
+    return _encoding
+
+
+@lru_cache(maxsize=2048)
+def count_tokens(text):
+    """Count tokens locally (tiktoken if present, else a close heuristic)."""
+    if not text:
+        return 0
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text))
+    # ~1 token per word/punctuation mark, CJK characters count individually.
+    return len(_WORDISH.findall(text)) + sum(1 for ch in text if "一" <= ch <= "鿿")
+
+
+def _clip(text, limit):
+    text = " ".join(text.split())
+    first = _SENTENCE_END.split(text, 1)[0]
+    return first if len(first) <= limit else first[: limit - 1] + "…"
+
+
+def extractive_summary(summary, turns):
+    """Default summarizer: one line per folded turn, no LLM call."""
+    lines = [summary] if summary else []
+    for user_msg, bot_msg in turns:
+        lines.append(f"- Visitor: {_clip(user_msg, 160)} | Me: {_clip(bot_msg, 200)}")
+    return "\n".join(lines)
+
+
+class ConversationMemory:
+    """Per-session history window plus an incrementally updated summary.
+
+    Keep one instance per session (e.g. in ``st.session_state``) so the
+    summary carries over between turns.
+    """
+
+    def __init__(
+        self,
+        keep_turns=None,
+        max_tokens=None,
+        summary_tokens=None,
+        summarizer=extractive_summary,
+    ):
+        self.keep_turns = keep_turns or int(os.getenv("HISTORY_KEEP_TURNS", "6"))
+        self.max_tokens = max_tokens or int(os.getenv("HISTORY_MAX_TOKENS", "3000"))
+        self.summary_tokens = summary_tokens or int(
+            os.getenv("HISTORY_SUMMARY_TOKENS", "600")
+        )
+        self.summarizer = summarizer
+        self.reset()
+
+    def reset(self):
+        self.summary = ""
+        self.folded = 0  # number of leading turns already in the summary
+
+    def _window_start(self, history):
+        start = max(len(history) - self.keep_turns, 0)
+        budget = self.max_tokens
+        for i in range(len(history) - 1, start - 1, -1):
+            user_msg, bot_msg = history[i]
+            budget -= count_tokens(user_msg) + count_tokens(bot_msg)
+            if budget < 0:
+                return i + 1
+        return start
+
+    def _trim_summary(self):
+        lines = self.summary.split("\n")
+        while len(lines) > 1 and count_tokens("\n".join(lines)) > self.summary_tokens:
+            lines.pop(0)
+        self.summary = "\n".join(lines)
+
+    def update(self, history):
+        """Fold turns that fell out of the window; return the verbatim turns."""
+        if len(history) < self.folded:
+            self.reset()  # history was cleared (e.g. language switch)
+        start = max(self._window_start(history), self.folded)
+        if start > self.folded:
+            self.summary = self.summarizer(self.summary, history[self.folded : start])
+            self.folded = start
+            self._trim_summary()
+        return history[start:]
+
+    def messages(self, history):
+        """Chat messages for ``history``: optional summary + recent turns."""
+        recent = self.update(history)
+        messages = []
+        if self.summary:
+            messages.append(
+                {
+                    "role": "system",
+                    "content": "Summary of the earlier conversation:\n" + self.summary,
+                }
+            )
+        for user_msg, bot_msg in recent:
+            messages.append({"role": "user", "content": user_msg})
+            messages.append({"role": "assistant", "content": bot_msg})
+        return messages
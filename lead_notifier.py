@@ -0,0 +1,273 @@
+"""Background lead notifications.
+
+``send_email_alert`` used to call Resend synchronously as soon as an email
+address showed up in the chat, before the LLM call even started: the
+visitor waited on the round-trip, and a failed send was only printed.
+
+``LeadNotifier`` takes the address, returns immediately and leaves the rest
+to a worker thread:
+
+- dedupe: an address already notified (or queued) within
+  ``LEAD_DEDUPE_WINDOW`` seconds (default 86400) is dropped, so a visitor
+  repeating their email in every message sends one alert;
+- digest: after the first lead the worker waits ``LEAD_DIGEST_WINDOW``
+  seconds (default 10) for more, and a burst goes out as one email;
+- retry: a failed send is retried with exponential backoff (capped at
+  ``max_backoff``), merged with any leads that arrived in the meantime;
+  after ``max_attempts`` the batch is dropped, logged and its addresses
+  become eligible again.
+
+Transports are pluggable: ``ResendTransport`` for production,
+``FilesystemTransport`` (``LEAD_ALERT_DIR``) for local development and
+``MemoryTransport`` for tests.
+"""
+
+import atexit
+import html
+import json
+import os
+import pathlib
+import queue
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+
+
+@dataclass(frozen=True)
+class Lead:
+    email: str
+    session_id: str = None
+    received_at: str = field(default_factory=lambda: datetime.now().isoformat())
+
+
+def render_alert(leads):
+    """Return ``(subject, html)`` for one lead or a digest of several."""
+    if len(leads) == 1:
+        lead = leads[0]
+        body = (
+            "<p>User wants to connect with Al: "
+            f"<strong>{html.escape(lead.email)}</strong></p>"
+        )
+        if lead.session_id:
+            body += f"<p>Session: {html.escape(lead.session_id)}</p>"
+        return "📩 New Consultation Request", body
+    items = "".join(
+        f"<li><strong>{html.escape(lead.email)}</strong> "
+        f"({html.escape(lead.received_at)}"
+        + (f", session {html.escape(lead.session_id)}" if lead.session_id else "")
+        + ")</li>"
+        for lead in leads
+    )
+    return (
+        f"📩 {len(leads)} New Consultation Requests",
+        f"<p>{len(leads)} users want to connect with Al:</p><ul>{items}</ul>",
+    )
+
+
+class ResendTransport:
+    """Sends alerts through Resend; raises on failure so the worker retries."""
+
+    def __init__(self, to_address, sender="al@optimops.ai", api_key=None):
+        self.to_address = str(to_address).strip()
+        self.sender = sender
+        self.api_key = api_key
+
+    def send(self, leads):
+        import resend
+
+        resend.api_key = self.api_key or os.getenv("RESEND_API_KEY")
+        subject, body = render_alert(leads)
+        return resend.Emails.send(
+            {
+                "from": self.sender,
+                "to": self.to_address,
+                "subject": subject,
+                "html": body,
+            }
+        )
+
+
+class FilesystemTransport:
+    """Writes each alert as a JSON file under ``root``."""
+
+    def __init__(self, root):
+        self.root = pathlib.Path(root)
+
+    def send(self, leads):
+        subject, body = render_alert(leads)
+        self.root.mkdir(parents=True, exist_ok=True)
+        path = self.root / f"{datetime.now():%Y%m%d_%H%M%S_%f}.json"
+        message = {
+            "subject": subject,
+            "html": body,
+            "leads": [lead.__dict__ for lead in leads],
+        }
+        path.write_text(json.dumps(message, ensure_ascii=False), encoding="utf-8")
+        return str(path)
+
+
+class MemoryTransport:
+    """Keeps sent batches in ``sent``; fails the first ``failures`` sends."""
+
+    def __init__(self, failures=0, delay=0.0):
+        self.sent = []
+        self.attempts = 0
+        self.failures = failures
+        self.delay = delay
+
+    def send(self, leads):
+        self.attempts += 1
+        if self.delay:
+            time.sleep(self.delay)
+        if self.attempts <= self.failures:
+            raise ConnectionError("injected transport failure")
+        self.sent.append(list(leads))
+        return len(self.sent)
+
+
+class LeadNotifier:
+    """Deduplicating, batching, retrying queue in front of a transport."""
+
+    def __init__(
+        self,
+        transport,
+        dedupe_window=86400.0,
+        digest_window=10.0,
+        max_batch=20,
+        max_attempts=5,
+        max_backoff=300.0,
+        clock=time.monotonic,
+    ):
+        self.transport = transport
+        self.dedupe_window = dedupe_window
+        self.digest_window = digest_window
+        self.max_batch = max_batch
+        self.max_attempts = max_attempts
+        self.max_backoff = max_backoff
+        self.clock = clock
+        self._queue = queue.Queue()
+        self._seen = {}  # normalized email -> time queued
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name="lead-notifier", daemon=True
+        )
+        self._thread.start()
+
+    # -- producer side (called from request threads) ----------------------
+
+    def notify(self, email, session_id=None):
+        """Queue an alert for ``email``; False if it is a recent duplicate."""
+        key = email.strip().lower()
+        now = self.clock()
+        with self._lock:
+            seen = self._seen.get(key)
+            if seen is not None and now - seen < self.dedupe_window:
+                return False
+            self._seen[key] = now
+            if len(self._seen) > 10000:
+                cutoff = now - self.dedupe_window
+                self._seen = {k: t for k, t in self._seen.items() if t >= cutoff}
+        self._queue.put(Lead(email.strip(), session_id))
+        return True
+
+    def close(self, timeout=10.0):
+        """Send whatever is queued (one attempt) and stop the worker."""
+        if self._stopped.is_set():
+            return
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+    # -- worker side -------------------------------------------------------
+
+    def _collect(self, batch, deadline):
+        """Add queued leads to ``batch`` until ``deadline``; False on stop."""
+        while len(batch) < self.max_batch:
+            timeout = deadline - self.clock()
+            try:
+                lead = (
+                    self._queue.get(timeout=timeout)
+                    if timeout > 0
+                    else self._queue.get_nowait()
+                )
+            except queue.Empty:
+                return True
+            if lead is None:
+                return False
+            batch.append(lead)
+        return True
+
+    def _run(self):
+        batch = []
+        attempts = 0
+        running = True
+        while running or batch:  # after a stop, one last attempt for the batch
+            if not batch:
+                lead = self._queue.get()
+                if lead is None:
+                    break
+                batch.append(lead)
+                running = self._collect(batch, self.clock() + self.digest_window)
+            try:
+                self.transport.send(batch)
+            except Exception as e:
+                attempts += 1
+                if attempts >= self.max_attempts or not running:
+                    self._drop(batch, e)
+                    batch, attempts = [], 0
+                    continue
+                backoff = min(2 ** (attempts - 1), self.max_backoff)
+                print(
+                    f"⚠️ Lead alert failed (attempt {attempts}, "
+                    f"retry in {backoff:g}s): {e}"
+                )
+                retry_at = self.clock() + backoff
+                running = self._collect(batch, retry_at)
+                if running:  # a full batch returns early; still back off
+                    time.sleep(max(retry_at - self.clock(), 0))
+                continue
+            print(f"✅ Lead alert sent for {', '.join(lead.email for lead in batch)}")
+            batch, attempts = [], 0
+        self._stopped.set()
+
+    def _drop(self, batch, error):
+        print(
+            f"❌ Lead alert dropped for "
+            f"{', '.join(lead.email for lead in batch)}: {error}"
+        )
+        with self._lock:
+            for lead in batch:
+                self._seen.pop(lead.email.lower(), None)
+
+
+def transport_from_env():
+    """``LEAD_ALERT_DIR`` → filesystem, else Resend to ``ALERT_EMAIL``."""
+    if os.getenv("LEAD_ALERT_DIR"):
+        return FilesystemTransport(os.getenv("LEAD_ALERT_DIR"))
+    to_address = os.getenv("ALERT_EMAIL")
+    if not to_address:
+        return None
+    return ResendTransport(to_address)
+
+
+_notifier = None
+_notifier_lock = threading.Lock()
+
+
+def get_lead_notifier():
+    """Return the process-wide ``LeadNotifier`` (``None`` without a transport)."""
+    global _notifier
+    if _notifier is None:
+        with _notifier_lock:
+            if _notifier is None:
+                transport = transport_from_env()
+                if transport is None:
+                    return None
+                _notifier = LeadNotifier(
+                    transport,
+                    dedupe_window=float(os.getenv("LEAD_DEDUPE_WINDOW", "86400")),
+                    digest_window=float(os.getenv("LEAD_DIGEST_WINDOW", "10")),
+                )
+                atexit.register(_notifier.close)
+    return _notifier
@@ -1,161 +1,232 @@
+import asyncio
 import os
 import json
 import re
-import requests
-from functools import lru_cache
-from openai import OpenAI
-from dotenv import load_dotenv
-import resend
+import threading
+import time
 import uuid
 from datetime import datetime
-
-from dotenv import load_dotenv
 import pathlib
+
+# ✅ Only light modules at import time; provider SDKs, NumPy (resume index,
+# semantic cache), resend and boto3 are imported on first use so the first
+# page renders before any of them load.
+from provider_clients import get_registry
+from history_manager import ConversationMemory, count_tokens
+from response_cache import get_response_cache, normalize_prompt, replay_chunks
+from provider_router import get_router
+from hedging import hedged_stream
+from sse_parser import iter_content
+from prompt_cache import FrozenPrompt, get_usage_tracker
+from tracing import annotate, current, span
+from admission import get_admission_controller
+from cost_ledger import get_cost_ledger
+
 # ✅ Explicitly point to .env in project root
 env_path = pathlib.Path(__file__).parent / ".env"
 if env_path.exists():
+    from dotenv import load_dotenv
+
     load_dotenv(dotenv_path=env_path, override=True)
 
-# Import Streamlit for caching only
-try:
-    import streamlit as st
-except ImportError:
-    # Fallbacks for local development without streamlit
-    class StreamlitStub:
-        @staticmethod
-        def cache_resource(*args, **kwargs):
-            def decorator(func):
-                return func
-            return decorator
-        
-        @staticmethod
-        def cache_data(*args, **kwargs):
-            def decorator(func):
-                return func
-            return decorator
-    st = StreamlitStub()
-
-def get_user_country():
-    try:
-        res = requests.get("https://ipinfo.io/json", timeout=3)
-        return res.json().get("country", "").lower()
-    except:
-        return os.getenv("USER_COUNTRY", "").lower()
+OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-4o")
+DEEPSEEK_MODEL = os.getenv("DEEPSEEK_MODEL", "deepseek-chat")
+
+LANGUAGE_INSTRUCTIONS = {
+    "中文 (Chinese)": "请用中文回答：",
+    "Español": "Por favor responde en español: ",
+}
+EMAIL_PATTERN = re.compile(r"[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}")
+
+def localize_prompt(message, language):
+    """Prefix the instruction that makes the model answer in ``language``."""
+    return LANGUAGE_INSTRUCTIONS.get(language, "") + message
+
+def extract_email(text):
+    match = EMAIL_PATTERN.search(text)
+    return match.group(0) if match else None
+
+def get_user_country(ip=None):
+    """Resolve the visitor's country offline (no network, memoized per IP)."""
+    from geo import country_for_ip
+
+    country = country_for_ip(ip) if ip else ""
+    return country or os.getenv("USER_COUNTRY", "").lower()
 
 def call_openai(messages):
-    client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+    client = get_registry().openai()
     res = client.chat.completions.create(
-        model="gpt-4o",
+        model=OPENAI_MODEL,
         messages=messages,
         temperature=0.85
     )
+    get_usage_tracker().record("openai", OPENAI_MODEL, res.usage)
     return res.choices[0].message.content
 
 def call_deepseek(messages):
-    url = "https://api.deepseek.com/chat/completions"
-    headers = {
-        "Authorization": f"Bearer {os.getenv('DEEPSEEK_API_KEY')}",
-        "Content-Type": "application/json"
-    }
+    registry = get_registry()
     payload = {
-        "model": "deepseek-chat",
+        "model": DEEPSEEK_MODEL,
         "messages": messages,
         "temperature": 0.85
     }
-    res = requests.post(url, headers=headers, json=payload, timeout=10)
+    res = registry.deepseek().post(
+        registry.deepseek_url(), json=payload, timeout=registry.timeout()
+    )
     res.raise_for_status()
-    return res.json()["choices"][0]["message"]["content"]
+    body = res.json()
+    get_usage_tracker().record("deepseek", DEEPSEEK_MODEL, body.get("usage"))
+    return body["choices"][0]["message"]["content"]
 
 # ✅ STREAMING FUNCTIONS
 def call_openai_stream(messages):
     """Streaming version for OpenAI"""
-    client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-    stream = client.chat.completions.create(
-        model="gpt-4o",
-        messages=messages,
-        temperature=0.85,
-        stream=True
-    )
+    from async_streaming import async_engine_enabled, get_engine
+
+    if async_engine_enabled():
+        yield from get_engine().stream("openai", messages, OPENAI_MODEL, temperature=0.85)
+        return
+    client = get_registry().openai()
+    with span("connect"):  # returns once the response headers arrived
+        stream = client.chat.completions.create(
+            model=OPENAI_MODEL,
+            messages=messages,
+            temperature=0.85,
+            stream=True,
+            stream_options={"include_usage": True},  # ✅ final chunk reports cached tokens
+        )
     
-    full_response = ""
     for chunk in stream:
-        if chunk.choices[0].delta.content is not None:
-            content = chunk.choices[0].delta.content
-            full_response += content
-            yield content, full_response
+        if getattr(chunk, "usage", None) is not None:
+            get_usage_tracker().record("openai", OPENAI_MODEL, chunk.usage)
+        if chunk.choices and chunk.choices[0].delta.content is not None:
+            yield chunk.choices[0].delta.content
             
 def call_deepseek_stream(messages):
     """Streaming version for DeepSeek"""
-    url = "https://api.deepseek.com/chat/completions"
-    headers = {
-        "Authorization": f"Bearer {os.getenv('DEEPSEEK_API_KEY')}",
-        "Content-Type": "application/json"
-    }
+    from async_streaming import async_engine_enabled, get_engine
+
+    if async_engine_enabled():
+        yield from get_engine().stream("deepseek", messages, DEEPSEEK_MODEL, temperature=0.85)
+        return
+    registry = get_registry()
     payload = {
-        "model": "deepseek-chat",
+        "model": DEEPSEEK_MODEL,
         "messages": messages,
         "temperature": 0.85,
-        "stream": True
+        "stream": True,
+        "stream_options": {"include_usage": True},
     }
     
-    response = requests.post(url, headers=headers, json=payload, stream=True, timeout=30)
+    with span("connect"):  # returns once the response headers arrived
+        response = registry.deepseek().post(
+            registry.deepseek_url(), json=payload, stream=True,
+            timeout=registry.timeout(),
+        )
     response.raise_for_status()
     
-    full_response = ""
-    for line in response.iter_lines():
-        if line:
-            line = line.decode('utf-8')
-            if line.startswith('data: '):
-                data = line[6:]
-                if data != '[DONE]':
-                    try:
-                        chunk = json.loads(data)
-                        if 'choices' in chunk and chunk['choices']:
-                            delta = chunk['choices'][0].get('delta', {})
-                            if 'content' in delta and delta['content']:
-                                content = delta['content']
-                                full_response += content
-                                yield content, full_response
-                    except json.JSONDecodeError:
-                        continue
-
-class Me:
-    def __init__(self):
-        self.name = "Al Mateus"
-        self.resume_data = self._load_resume_data()
-
-    @st.cache_resource(ttl=3600)
-    def _get_s3_client(_self):
-        """Cache S3 client to avoid re-authentication"""
-        import boto3
-        return boto3.client(
-            "s3",
-            aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID"),
-            aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY"),
-            region_name=os.getenv("AWS_REGION"),
+    # ✅ Parse raw bytes incrementally (no per-line decode, UTF-8 safe)
+    with response:
+        yield from iter_content(
+            response.iter_content(chunk_size=None),
+            on_usage=lambda usage: get_usage_tracker().record(
+                "deepseek", DEEPSEEK_MODEL, usage
+            ),
         )
 
-    @st.cache_data(ttl=7200)
-    def _load_resume_data(_self):
-        """Load only linkedin.md data with Streamlit Cloud caching"""
-        if os.getenv("S3_BUCKET"):
-            s3 = _self._get_s3_client()
-            bucket = os.getenv("S3_BUCKET")
-            
-            # ✅ ONLY USE LINKEDIN_KEY (summary is commented out)
-            linkedin_key = os.getenv("LINKEDIN_KEY", "linkedin.md")
+# ✅ Native async streams on the engine loop (chat API, LLM_ASYNC_ENGINE=1)
+def call_openai_astream(messages):
+    from async_streaming import get_engine
+
+    return get_engine().astream("openai", messages, OPENAI_MODEL, temperature=0.85)
+
+def call_deepseek_astream(messages):
+    from async_streaming import get_engine
+
+    return get_engine().astream("deepseek", messages, DEEPSEEK_MODEL, temperature=0.85)
+
+PROVIDERS = {
+    "openai": {"call": call_openai, "stream": call_openai_stream,
+               "astream": call_openai_astream, "model": OPENAI_MODEL},
+    "deepseek": {"call": call_deepseek, "stream": call_deepseek_stream,
+                 "astream": call_deepseek_astream, "model": DEEPSEEK_MODEL},
+}
+
+def allowed_providers(user_country, session_id=None):
+    """Providers a visitor may use, in order of preference.
+
+    Narrowed to the cheapest one once the daily or session cost budget is
+    spent (see ``cost_ledger``); ``session_id`` defaults to the current
+    trace's.
+    """
+    if user_country == "cn":
+        return ["deepseek"]
+    allowed = []
+    if os.getenv("OPENAI_API_KEY"):
+        allowed.append("openai")
+    if os.getenv("DEEPSEEK_API_KEY") or not allowed:
+        allowed.append("deepseek")
+    if session_id is None and current() is not None:
+        session_id = current().attrs.get("session_id")
+    models = {name: PROVIDERS[name]["model"] for name in allowed}
+    return get_cost_ledger().restrict(allowed, models, session_id)
 
-            if not linkedin_key:
-                raise ValueError("LINKEDIN_KEY environment variable is not set")
+class Me:
+    def __init__(self):
+        from resume_store import get_resume_store
 
-            # ✅ Load only linkedin.md from S3 (no PDF, no summary)
-            return s3.get_object(Bucket=bucket, Key=linkedin_key)["Body"].read().decode("utf-8")
+        self.name = "Al Mateus"
+        # ✅ Process-wide resume, re-validated in the background (ETag/mtime)
+        self.resume_store = get_resume_store()
+
+    @property
+    def resume_data(self):
+        return self.resume_store.snapshot.text
+
+    @property
+    def resume_index(self):
+        return self.resume_store.snapshot.index
+
+    @staticmethod
+    def retrieval_enabled():
+        """Set RESUME_TOP_K=0 to disable retrieval and send the full resume."""
+        return int(os.getenv("RESUME_TOP_K", "5")) > 0
+
+    def resume_context(self, query=None, snapshot=None):
+        """Resume text for the prompt: top-k relevant sections, or all of it."""
+        snapshot = snapshot or self.resume_store.snapshot
+        top_k = int(os.getenv("RESUME_TOP_K", "5"))
+        if not query or top_k <= 0:
+            return snapshot.text
+        max_chars = int(os.getenv("RESUME_CONTEXT_CHARS", "6000"))
+        return snapshot.index.context_for(query, k=top_k, max_chars=max_chars)
+
+    def prompt_prefix(self, snapshot=None):
+        """The frozen system prompt, built once per resume version.
+
+        It is the first message of every request and must stay byte-identical
+        so provider prompt caching can hit; anything that varies per request
+        goes into later messages (see ``build_messages``).
+        """
+        snapshot = snapshot or self.resume_store.snapshot
+        full_resume = not self.retrieval_enabled()
+
+        def build():
+            prefix = FrozenPrompt.build(
+                self.system_prompt(full_resume, snapshot.text), snapshot.version
+            )
+            print(f"✅ System prompt frozen: {prefix.digest[:12]} ({len(prefix.text)} chars)")
+            return prefix
+
+        return snapshot.derive(("prompt_prefix", full_resume), build)
+
+    def system_prompt(self, full_resume=False, resume_text=None):
+        if full_resume:
+            resume_section = f"""## Your Resume Data - USE THIS FOR SPECIFIC EXAMPLES
+{resume_text if resume_text is not None else self.resume_data}"""
         else:
-            # ✅ Load only linkedin.md locally
-            with open("me/linkedin.md", "r", encoding="utf-8") as f:
-                return f.read()
-
-    def system_prompt(self):
+            resume_section = """## Your Resume Data
+The most relevant sections of my resume are provided in a separate message right before each question - USE THEM FOR SPECIFIC EXAMPLES."""
         return f"""
 You are Al Mateus - speak in first person as yourself. You are charismatic, enthusiastic, and witty, bringing joy to technical conversations while maintaining professional authority.
 Your mission is to explain **your** work, philosophy, and career — someone who has deployed Agentic AI, LLM Engineering and MLOps enterprise-grade solutions in 9 countries, built cloud-native systems and Landing Zones across 3 clouds, and helped enterprises turn chaos into architecture.
@@ -256,61 +327,243 @@ After sharing links, optionally add:
 - **AWS**: AWS Solutions Architect Pro, AWS DevOps Engineer Pro
 - **Agile**: Scrum.org PSPO II, PSM I, Advanced Agile Leadership
 
-## Your Complete Resume Data - USE THIS FOR SPECIFIC EXAMPLES
-{self.resume_data}
+{resume_section}
 
-**CRITICAL: When discussing my experience, always pull specific details, projects, companies, technologies, and metrics from the resume data above. Never give generic responses - every answer should include concrete examples from my actual work.**
+**CRITICAL: When discussing my experience, always pull specific details, projects, companies, technologies, and metrics from my resume data. Never give generic responses - every answer should include concrete examples from my actual work.**
 """
 
-    def chat(self, message, history):
-        messages = [{"role": "system", "content": self.system_prompt()}]
-        messages.append({"role": "user", "content": message})
-
-        user_country = get_user_country()
-        if user_country == "cn" or not os.getenv("OPENAI_API_KEY"):
-            return call_deepseek(messages)
-        else:
-            return call_openai(messages)
-
-    # ✅ ADD STREAMING METHOD
-    def chat_stream(self, message, history):
-        """Streaming version of chat - returns generator"""
-        messages = [{"role": "system", "content": self.system_prompt()}]
+    def build_messages(self, message, history, memory=None, snapshot=None):
+        # ✅ Stable prefix first (provider prompt cache), then what varies:
+        # summary and turns (stable within a session), then retrieval + question
+        snapshot = snapshot or self.resume_store.snapshot
+        messages = [{"role": "system", "content": self.prompt_prefix(snapshot).text}]
         
-        # ✅ ADD HISTORY TO MESSAGES
-        for user_msg, bot_msg in history:
-            messages.append({"role": "user", "content": user_msg})
-            messages.append({"role": "assistant", "content": bot_msg})
+        # ✅ ADD TOKEN-BUDGETED HISTORY (recent turns + rolling summary)
+        if history:
+            if memory is None:
+                memory = ConversationMemory()
+            messages.extend(memory.messages(history))
         
+        if self.retrieval_enabled():
+            messages.append({
+                "role": "system",
+                "content": "## Your Resume Data (most relevant sections) - USE THIS FOR SPECIFIC EXAMPLES\n"
+                + self.resume_context(message, snapshot),
+            })
         messages.append({"role": "user", "content": message})
+        return messages
+
+    def chat(self, message, history, user_country=None, memory=None, language=None):
+        """Non-streaming chat; same arguments as ``chat_stream`` (``language``
+        is accepted for parity and unused here)."""
+        messages = self.build_messages(message, history, memory)
+
+        if user_country is None:
+            user_country = get_user_country()
+        router = get_router()
+        provider = router.choose(allowed_providers(user_country))
+        with get_admission_controller().slot():
+            router.begin(provider)
+            try:
+                reply = PROVIDERS[provider]["call"](messages)
+            except Exception:
+                router.record(provider, False)
+                raise
+        router.record(provider, True)  # no first token here: not a TTFT sample
+        return reply
+
+    def traced_messages(self, message, history, memory, snapshot):
+        """``build_messages`` inside a ``prompt_build`` span."""
+        with span("prompt_build"):
+            messages = self.build_messages(message, history, memory, snapshot)
+        if current() is not None:  # fallback cost estimate, see cost_ledger
+            annotate(prompt_estimate=sum(count_tokens(m["content"]) for m in messages))
+        return messages
 
-        user_country = get_user_country()
-        if user_country == "cn" or not os.getenv("OPENAI_API_KEY"):
-            return call_deepseek_stream(messages)
-        else:
-            return call_openai_stream(messages)
-
-def send_email_alert(user_email: str):
-    try:
-        resend.api_key = os.getenv("RESEND_API_KEY")
-        to_address = os.getenv("ALERT_EMAIL")
-        
-        if not to_address:
-            print("❌ ALERT_EMAIL not set — email not sent")
-            return None
-
-        response = resend.Emails.send({
-            "from": "al@optimops.ai",
-            "to": str(to_address).strip(),
-            "subject": "📩 New Consultation Request",
-            "html": f"<p>User wants to connect with Al: <strong>{user_email}</strong></p>"
-        })
-        print("✅ Email sent:", response)
-        return response
-
-    except Exception as e:
-        print("❌ Resend send_email_alert failed:", e)
-        return None
+    # ✅ ADD STREAMING METHOD
+    def chat_stream(self, message, history, user_country=None, memory=None,
+                    language=None, cacheable=False, hedge_after=None):
+        """Streaming version of chat - returns a generator of text chunks
+
+        ``user_country`` should be resolved once per session by the caller;
+        when omitted it falls back to ``get_user_country()``. ``memory`` is the
+        session's ``ConversationMemory``; pass the same instance every turn so
+        older turns are summarized once instead of replayed.
+
+        ``cacheable`` marks canned prompts (the menu buttons): their answers
+        are shared across visitors regardless of history, served from the
+        response cache and coalesced while in flight. Free-text first turns
+        go through the semantic cache instead.
+
+        ``hedge_after`` (seconds, default ``LLM_HEDGE_AFTER``; 0 disables)
+        starts a second provider in parallel if the first has not produced a
+        token by then, keeping whichever streams first.
+
+        Turns that go upstream wait for a slot of the global stream limit
+        and raise ``admission.Busy`` when none frees up in time; callers
+        check the per-visitor rate limits (``admit``) before calling.
+        """
+        if user_country is None:
+            user_country = get_user_country()
+        if hedge_after is None:
+            hedge_after = float(os.getenv("LLM_HEDGE_AFTER", "0"))
+        # ✅ Fastest healthy provider the visitor is allowed to use
+        router = get_router()
+        allowed = allowed_providers(user_country)
+        provider = router.choose(allowed)
+        model = PROVIDERS[provider]["model"]
+        snapshot = self.resume_store.snapshot  # one resume version per answer
+        annotate(provider=provider, model=model)
+
+        admission = get_admission_controller()
+
+        def produce():
+            messages = self.traced_messages(
+                message, [] if cacheable else history, memory, snapshot
+            )
+
+            def start(name):
+                return lambda: router.stream(name, PROVIDERS[name]["stream"](messages))
+
+            if hedge_after <= 0:
+                return start(provider)()
+            # Hedge on another allowed provider, or a second connection to
+            # the same one when it is the only choice (e.g. China).
+            alternatives = [n for n in allowed if n != provider]
+
+            def backup():
+                name = router.choose(alternatives) if alternatives else provider
+                return start(name)()
+
+            return hedged_stream(
+                start(provider), backup, hedge_after, admission.try_slot
+            )
+
+        # 🚦 Upstream streams hold a slot of the global limit (see admission)
+        version = snapshot.version
+        if not cacheable:
+            if history:
+                annotate(cache="none")
+                return admission.upstream(produce)
+            # ✅ First turn: reuse answers to near-duplicate opening questions
+            from semantic_cache import get_semantic_cache
+
+            semantic = get_semantic_cache()
+            with span("semantic_lookup"):
+                chunks = semantic.lookup(message, language, version)
+            if chunks is not None:
+                annotate(cache="semantic-hit")
+                return replay_chunks(chunks)
+            annotate(cache="semantic-miss")
+            return semantic.record(
+                message, language, version, admission.upstream(produce)
+            )
+        key = (normalize_prompt(message), language, version, model)
+        annotate(cache="response")
+        cache = get_response_cache()
+        if cache.pending(key):  # replay or follow: nothing new upstream
+            return cache.stream(key, produce)
+        return admission.upstream(lambda: cache.stream(key, produce))
+
+    async def achat_stream(self, message, history, user_country=None, memory=None,
+                           language=None, cacheable=False, hedge_after=None):
+        """``chat_stream`` for async callers (the chat API): returns an async
+        iterator of text chunks, raising ``admission.Busy`` like ``chat_stream``.
+
+        With ``LLM_ASYNC_ENGINE=1`` free-text turns stream natively from the
+        engine loop (``astream``), so an open stream holds no thread; the
+        prompt build and a queued admission wait take a worker thread only
+        briefly. Menu prompts (their response-cache flights run on threads),
+        hedged turns and the sync engine go through ``chat_stream`` with one
+        worker-thread hop per chunk, as Starlette does for sync bodies.
+        """
+        from async_streaming import async_engine_enabled, iterate_in_thread
+
+        if hedge_after is None:
+            hedge_after = float(os.getenv("LLM_HEDGE_AFTER", "0"))
+        if cacheable or hedge_after > 0 or not async_engine_enabled():
+            chunks = await asyncio.to_thread(
+                self.chat_stream, message, history, user_country, memory,
+                language, cacheable, hedge_after,
+            )
+            return iterate_in_thread(chunks)
+
+        if user_country is None:
+            user_country = get_user_country()
+        router = get_router()
+        provider = router.choose(allowed_providers(user_country))
+        model = PROVIDERS[provider]["model"]
+        snapshot = self.resume_store.snapshot
+        annotate(provider=provider, model=model)
+        admission = get_admission_controller()
+
+        async def upstream():
+            messages = await asyncio.to_thread(
+                self.traced_messages, message, history, memory, snapshot
+            )
+            return await admission.aupstream(
+                lambda: router.astream(provider, PROVIDERS[provider]["astream"](messages))
+            )
+
+        if history:
+            annotate(cache="none")
+            return await upstream()
+        from semantic_cache import get_semantic_cache
+
+        semantic = get_semantic_cache()
+        with span("semantic_lookup"):
+            chunks = semantic.lookup(message, language, snapshot.version)
+        if chunks is not None:
+            annotate(cache="semantic-hit")
+            return _areplay(chunks)
+        annotate(cache="semantic-miss")
+        return semantic.arecord(message, language, snapshot.version, await upstream())
+
+
+async def _areplay(chunks):
+    for content in chunks:
+        yield content
+
+_me = None
+_me_lock = threading.Lock()
+
+def get_me():
+    """Process-wide ``Me`` (resume, index and frozen prompt are built once)."""
+    global _me
+    if _me is None:
+        with _me_lock:
+            if _me is None:
+                start = time.perf_counter()
+                _me = Me()
+                _me.prompt_prefix()
+                print(f"✅ Me ready in {(time.perf_counter() - start) * 1000:.0f} ms")
+    return _me
+
+def warm_up():
+    """Build ``Me`` on a background thread (e.g. right after the first page)."""
+    if _me is not None:
+        return
+
+    def run():
+        try:
+            get_me()
+            from geo import get_index
+
+            get_index()  # IP ranges (or the missing-DB warning) at startup
+        except Exception as e:
+            print(f"⚠️ Warm-up failed: {e}")
+
+    threading.Thread(target=run, name="me-warm-up", daemon=True).start()
+
+def send_email_alert(user_email: str, session_id=None):
+    """Queue a lead alert; returns at once (see ``lead_notifier``)."""
+    from lead_notifier import get_lead_notifier
+
+    notifier = get_lead_notifier()
+    if notifier is None:
+        print("❌ ALERT_EMAIL not set — email not sent")
+        return False
+    return notifier.notify(user_email, session_id=session_id)
 
 def save_chat_to_s3(history, session_id=None, language="English"):
     """Save chat history to S3 as JSON"""
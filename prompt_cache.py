@@ -0,0 +1,141 @@
+"""Stable prompt prefix and provider prompt-cache accounting.
+
+OpenAI and DeepSeek both cache the longest previously seen *prefix* of a
+request and bill those input tokens at a discount (OpenAI from 1,024 tokens
+on, DeepSeek in 64-token units). The system prompt used to be rebuilt on
+every call with the retrieved resume sections spliced into its middle, so
+no two requests shared more than the first few hundred tokens.
+
+``FrozenPrompt`` holds the persona (plus the full resume when retrieval is
+off) built once per resume version, with a SHA-256 digest so logs can show
+that consecutive requests really send the same bytes. ``Me.build_messages``
+puts it first and moves everything that varies (summary, turns, retrieved
+sections, the question) after it.
+
+``UsageTracker`` reads the usage block returned with each response
+(OpenAI ``prompt_tokens_details.cached_tokens``, DeepSeek
+``prompt_cache_hit_tokens``/``prompt_cache_miss_tokens``) and reports
+cached vs uncached input tokens per request and in total. Set
+``PROMPT_CACHE_LOG=0`` to silence the per-request line.
+"""
+
+import hashlib
+import os
+import threading
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True)
+class FrozenPrompt:
+    text: str
+    version: str
+    digest: str
+
+    @classmethod
+    def build(cls, text, version):
+        digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        return cls(text=text, version=version, digest=digest)
+
+
+@dataclass(frozen=True)
+class PromptUsage:
+    provider: str
+    model: str
+    prompt_tokens: int
+    cached_tokens: int
+    completion_tokens: int
+
+    @property
+    def uncached_tokens(self):
+        return self.prompt_tokens - self.cached_tokens
+
+    @property
+    def hit_ratio(self):
+        return self.cached_tokens / self.prompt_tokens if self.prompt_tokens else 0.0
+
+
+def parse_usage(provider, model, usage):
+    """Normalize an OpenAI/DeepSeek usage object or dict to ``PromptUsage``."""
+    if hasattr(usage, "model_dump"):
+        usage = usage.model_dump()
+    prompt = usage.get("prompt_tokens") or 0
+    details = usage.get("prompt_tokens_details") or {}
+    cached = usage.get("prompt_cache_hit_tokens")
+    if cached is None:
+        cached = details.get("cached_tokens") or 0
+    return PromptUsage(
+        provider=provider,
+        model=model,
+        prompt_tokens=prompt,
+        cached_tokens=min(cached, prompt),
+        completion_tokens=usage.get("completion_tokens") or 0,
+    )
+
+
+class UsageTracker:
+    """Per-provider totals of cached and uncached input tokens."""
+
+    def __init__(self, log=True):
+        self.log = log
+        self._totals = {}
+        self._listeners = []
+        self._lock = threading.Lock()
+
+    def add_listener(self, listener):
+        """Call ``listener(PromptUsage)`` for every recorded request."""
+        self._listeners.append(listener)
+
+    def record(self, provider, model, usage):
+        if not usage:
+            return None
+        entry = parse_usage(provider, model, usage)
+        with self._lock:
+            totals = self._totals.setdefault(
+                provider, {"requests": 0, "prompt": 0, "cached": 0, "completion": 0}
+            )
+            totals["requests"] += 1
+            totals["prompt"] += entry.prompt_tokens
+            totals["cached"] += entry.cached_tokens
+            totals["completion"] += entry.completion_tokens
+        if self.log:
+            print(
+                f"📊 {provider} prompt {entry.prompt_tokens} tokens: "
+                f"{entry.cached_tokens} cached / {entry.uncached_tokens} uncached "
+                f"({entry.hit_ratio:.0%} hit), {entry.completion_tokens} completion"
+            )
+        for listener in list(self._listeners):
+            try:
+                listener(entry)
+            except Exception as e:
+                print(f"⚠️ Usage listener failed: {e}")
+        return entry
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                provider: dict(
+                    totals,
+                    uncached=totals["prompt"] - totals["cached"],
+                    hit_ratio=(
+                        totals["cached"] / totals["prompt"] if totals["prompt"] else 0.0
+                    ),
+                )
+                for provider, totals in self._totals.items()
+            }
+
+
+_tracker = None
+_tracker_lock = threading.Lock()
+
+
+def get_usage_tracker():
+    """Return the process-wide ``UsageTracker``."""
+    global _tracker
+    if _tracker is None:
+        with _tracker_lock:
+            if _tracker is None:
+                _tracker = UsageTracker(
+                    log=os.getenv("PROMPT_CACHE_LOG", "1").lower()
+                    not in ("0", "false", "no")
+                )
+    return _tracker
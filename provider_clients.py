@@ -0,0 +1,129 @@
+"""Process-wide pooled HTTP clients for the LLM providers.
+
+Building a new ``OpenAI`` client or calling ``requests.post`` without a
+session means every message pays for DNS, TCP and TLS setup. The registry
+below owns exactly one keep-alive client per provider, shared by every
+``Me`` instance and every Streamlit session in the process.
+
+Tuning (environment variables):
+
+- ``LLM_POOL_SIZE``          max pooled connections per provider (default 20)
+- ``LLM_KEEPALIVE_EXPIRY``   seconds an idle connection is kept (default 120)
+- ``LLM_CONNECT_TIMEOUT``    connect timeout in seconds (default 5)
+- ``LLM_READ_TIMEOUT``       read timeout in seconds (default 60)
+- ``OPENAI_BASE_URL`` / ``DEEPSEEK_BASE_URL`` override provider endpoints
+"""
+
+import os
+import threading
+from dataclasses import dataclass, field
+
+DEEPSEEK_DEFAULT_BASE_URL = "https://api.deepseek.com"
+
+
+@dataclass
+class PoolConfig:
+    pool_size: int = field(
+        default_factory=lambda: int(os.getenv("LLM_POOL_SIZE", "20"))
+    )
+    keepalive_expiry: float = field(
+        default_factory=lambda: float(os.getenv("LLM_KEEPALIVE_EXPIRY", "120"))
+    )
+    connect_timeout: float = field(
+        default_factory=lambda: float(os.getenv("LLM_CONNECT_TIMEOUT", "5"))
+    )
+    read_timeout: float = field(
+        default_factory=lambda: float(os.getenv("LLM_READ_TIMEOUT", "60"))
+    )
+
+
+class ProviderClientRegistry:
+    """Lazily builds and caches one pooled client per provider."""
+
+    def __init__(self, config=None):
+        self.config = config or PoolConfig()
+        self._clients = {}
+        self._lock = threading.Lock()
+
+    def _get(self, name, factory):
+        client = self._clients.get(name)
+        if client is None:
+            with self._lock:
+                client = self._clients.get(name)
+                if client is None:
+                    client = self._clients[name] = factory()
+        return client
+
+    def openai(self):
+        """Shared ``OpenAI`` client backed by a keep-alive httpx pool."""
+        return self._get("openai", self._build_openai)
+
+    def deepseek(self):
+        """Shared ``requests.Session`` with a sized connection pool."""
+        return self._get("deepseek", self._build_deepseek)
+
+    def deepseek_url(self, path="/chat/completions"):
+        base = os.getenv("DEEPSEEK_BASE_URL", DEEPSEEK_DEFAULT_BASE_URL)
+        return base.rstrip("/") + path
+
+    def timeout(self):
+        """``(connect, read)`` tuple for requests-style calls."""
+        return (self.config.connect_timeout, self.config.read_timeout)
+
+    def _build_openai(self):
+        import httpx
+        from openai import OpenAI
+
+        cfg = self.config
+        http_client = httpx.Client(
+            limits=httpx.Limits(
+                max_connections=cfg.pool_size,
+                max_keepalive_connections=cfg.pool_size,
+                keepalive_expiry=cfg.keepalive_expiry,
+            ),
+            timeout=httpx.Timeout(cfg.read_timeout, connect=cfg.connect_timeout),
+        )
+        return OpenAI(
+            api_key=os.getenv("OPENAI_API_KEY"),
+            base_url=os.getenv("OPENAI_BASE_URL") or None,
+            http_client=http_client,
+        )
+
+    def _build_deepseek(self):
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.config.pool_size)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        session.headers.update(
+            {
+                "Authorization": f"Bearer {os.getenv('DEEPSEEK_API_KEY')}",
+                "Content-Type": "application/json",
+            }
+        )
+        return session
+
+    def close(self):
+        with self._lock:
+            for client in self._clients.values():
+                try:
+                    client.close()
+                except Exception:
+                    pass
+            self._clients.clear()
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_registry():
+    """Return the process-wide ``ProviderClientRegistry``."""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = ProviderClientRegistry()
+    return _registry
@@ -0,0 +1,234 @@
+"""Latency-aware provider routing with a per-provider circuit breaker.
+
+Provider choice used to be a fixed switch (``country == "cn"`` or no
+``OPENAI_API_KEY``), so a slow or failing provider made every visitor wait
+for a timeout. The router keeps rolling time-to-first-token (TTFT) and
+error-rate stats per provider, opens a circuit after repeated failures, and
+picks the best healthy provider within the caller's allowed set:
+
+- providers are tried in the caller's preference order;
+- a healthy provider is skipped for a later one whose median TTFT is
+  faster by more than ``switch_ratio``;
+- a provider with an open circuit is skipped until its cooldown ends, then
+  a single half-open trial decides whether it closes again;
+- every ``probe_every``-th request goes to another healthy provider, so
+  latency stats for the alternatives never go stale.
+
+Tuning (environment variables): ``ROUTER_FAILURE_THRESHOLD`` (default 3),
+``ROUTER_COOLDOWN`` seconds (default 30), ``ROUTER_SWITCH_RATIO``
+(default 1.5), ``ROUTER_WINDOW`` samples (default 50),
+``ROUTER_PROBE_EVERY`` requests (default 20, 0 disables probing).
+"""
+
+import asyncio
+import os
+import statistics
+import threading
+import time
+from collections import deque
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold=3, cooldown=30.0, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.clock = clock
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._trial_in_flight = False
+
+    def available(self):
+        """True if a request may be sent now (no side effects)."""
+        if self.state == CLOSED:
+            return True
+        if self.state == OPEN and self.clock() - self.opened_at < self.cooldown:
+            return False
+        return not self._trial_in_flight
+
+    def begin(self):
+        """Mark a request as started; after a cooldown it is the trial."""
+        if self.state == OPEN and self.clock() - self.opened_at >= self.cooldown:
+            self.state = HALF_OPEN
+        if self.state == HALF_OPEN:
+            self._trial_in_flight = True
+
+    def abandon(self):
+        """The request ended without an outcome (e.g. the visitor left)."""
+        self._trial_in_flight = False
+
+    def record_success(self):
+        self.state = CLOSED
+        self.failures = 0
+        self._trial_in_flight = False
+
+    def record_failure(self):
+        self.failures += 1
+        self._trial_in_flight = False
+        if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+            self.state = OPEN
+            self.opened_at = self.clock()
+
+
+class ProviderStats:
+    """Rolling TTFT samples and outcomes for one provider."""
+
+    def __init__(self, window=50):
+        self.ttft = deque(maxlen=window)
+        self.outcomes = deque(maxlen=window)
+
+    def median_ttft(self):
+        return statistics.median(self.ttft) if self.ttft else None
+
+    def error_rate(self):
+        if not self.outcomes:
+            return 0.0
+        return 1.0 - sum(self.outcomes) / len(self.outcomes)
+
+
+class ProviderRouter:
+    """Chooses a provider and instruments its streams."""
+
+    def __init__(
+        self,
+        failure_threshold=3,
+        cooldown=30.0,
+        switch_ratio=1.5,
+        window=50,
+        probe_every=20,
+        clock=time.monotonic,
+    ):
+        self.switch_ratio = switch_ratio
+        self.probe_every = probe_every
+        self._requests = 0
+        self.clock = clock
+        self._window = window
+        self._breaker_args = (failure_threshold, cooldown, clock)
+        self._stats = {}
+        self._breakers = {}
+        self._lock = threading.Lock()
+
+    def _ensure(self, name):
+        if name not in self._stats:
+            self._stats[name] = ProviderStats(self._window)
+            self._breakers[name] = CircuitBreaker(*self._breaker_args)
+
+    def choose(self, allowed):
+        """Pick a provider name from ``allowed`` (ordered by preference)."""
+        if not allowed:
+            raise ValueError("no providers allowed")
+        with self._lock:
+            healthy = []
+            for name in allowed:
+                self._ensure(name)
+                if self._breakers[name].available():
+                    healthy.append(name)
+            if not healthy:
+                # Everything is failing: try whichever circuit opened first.
+                return min(allowed, key=lambda n: self._breakers[n].opened_at)
+            best = healthy[0]
+            best_ttft = self._stats[best].median_ttft()
+            for name in healthy[1:]:
+                ttft = self._stats[name].median_ttft()
+                if ttft is not None and best_ttft is not None:
+                    if best_ttft > ttft * self.switch_ratio:
+                        best, best_ttft = name, ttft
+            others = [n for n in healthy if n != best]
+            self._requests += 1
+            if others and self.probe_every and self._requests % self.probe_every == 0:
+                # Probe the least-sampled alternative to keep its stats fresh.
+                return min(others, key=lambda n: len(self._stats[n].outcomes))
+            return best
+
+    def begin(self, name):
+        """Call right before sending a request to ``name``."""
+        with self._lock:
+            self._ensure(name)
+            self._breakers[name].begin()
+
+    def abandon(self, name):
+        with self._lock:
+            self._breakers[name].abandon()
+
+    def record(self, name, ok, ttft=None):
+        with self._lock:
+            self._ensure(name)
+            stats = self._stats[name]
+            stats.outcomes.append(1 if ok else 0)
+            if ttft is not None:
+                stats.ttft.append(ttft)
+            if ok:
+                self._breakers[name].record_success()
+            else:
+                self._breakers[name].record_failure()
+
+    def stream(self, name, stream):
+        """Wrap a provider stream, recording TTFT and success/failure."""
+        self.begin(name)
+        start = self.clock()
+        ttft = None
+        try:
+            for item in stream:
+                if ttft is None:
+                    ttft = self.clock() - start
+                yield item
+        except GeneratorExit:
+            self.abandon(name)
+            raise
+        except Exception:
+            self.record(name, False, ttft)
+            raise
+        self.record(name, True, ttft)
+
+    async def astream(self, name, stream):
+        """``stream`` for an async iterator."""
+        self.begin(name)
+        start = self.clock()
+        ttft = None
+        try:
+            async for item in stream:
+                if ttft is None:
+                    ttft = self.clock() - start
+                yield item
+        except (GeneratorExit, asyncio.CancelledError):
+            self.abandon(name)
+            raise
+        except Exception:
+            self.record(name, False, ttft)
+            raise
+        self.record(name, True, ttft)
+
+    def snapshot(self):
+        """Per-provider stats, for logging and the test harness."""
+        with self._lock:
+            return {
+                name: {
+                    "state": self._breakers[name].state,
+                    "median_ttft": stats.median_ttft(),
+                    "error_rate": stats.error_rate(),
+                    "samples": len(stats.outcomes),
+                }
+                for name, stats in self._stats.items()
+            }
+
+
+_router = None
+_router_lock = threading.Lock()
+
+
+def get_router():
+    """Return the process-wide ``ProviderRouter``."""
+    global _router
+    if _router is None:
+        with _router_lock:
+            if _router is None:
+                _router = ProviderRouter(
+                    failure_threshold=int(os.getenv("ROUTER_FAILURE_THRESHOLD", "3")),
+                    cooldown=float(os.getenv("ROUTER_COOLDOWN", "30")),
+                    switch_ratio=float(os.getenv("ROUTER_SWITCH_RATIO", "1.5")),
+                    window=int(os.getenv("ROUTER_WINDOW", "50")),
+                    probe_every=int(os.getenv("ROUTER_PROBE_EVERY", "20")),
+                )
+    return _router
@@ -0,0 +1,176 @@
+"""Response cache with single-flight coalescing for canned prompts.
+
+The menu buttons ("Show me 📊 Projects", Experience, Skills and their
+localized variants) send identical prompts for every visitor. Answers are
+cached by ``(normalized prompt, language, resume version, model)`` with a
+TTL and LRU eviction. Concurrent identical requests share one upstream
+stream, and later visitors get the cached answer replayed chunk by chunk,
+so the UI still "types" the answer but without any provider latency.
+Expired entries are purged every ``RESPONSE_CACHE_PURGE_INTERVAL`` seconds
+(default 300) by the shared maintenance scheduler.
+"""
+
+import contextvars
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from scheduler import get_scheduler
+from tracing import annotate
+
+
+def normalize_prompt(prompt):
+    return " ".join(prompt.lower().split())
+
+
+class _Flight:
+    """One upstream generation that any number of readers can follow."""
+
+    def __init__(self):
+        self.chunks = []
+        self.done = False
+        self.error = None
+        self.cond = threading.Condition()
+
+    def run(self, producer, on_success):
+        try:
+            for content in producer():
+                with self.cond:
+                    self.chunks.append(content)
+                    self.cond.notify_all()
+        except Exception as e:
+            with self.cond:
+                self.error = e
+        else:
+            on_success(self.chunks)
+        finally:
+            with self.cond:
+                self.done = True
+                self.cond.notify_all()
+
+    def follow(self):
+        i = 0
+        while True:
+            with self.cond:
+                while i >= len(self.chunks) and not self.done:
+                    self.cond.wait()
+                new = self.chunks[i:]
+                done, error = self.done, self.error
+            yield from new
+            i += len(new)
+            if done:
+                if error is not None:
+                    raise error
+                return
+
+
+def replay_chunks(chunks):
+    """Re-emit stored chunks as a stream."""
+    yield from chunks
+
+
+class ResponseCache:
+    """TTL + LRU cache of streamed answers, with in-flight coalescing."""
+
+    def __init__(self, maxsize=256, ttl=3600):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (chunks, expires)
+        self._flights = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            chunks, expires = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return chunks
+
+    def put(self, key, chunks):
+        with self._lock:
+            self._entries[key] = (list(chunks), time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def purge(self):
+        """Drop expired entries."""
+        now = time.monotonic()
+        with self._lock:
+            for key in [k for k, (_, exp) in self._entries.items() if exp < now]:
+                del self._entries[key]
+
+    def pending(self, key):
+        """True if ``key`` is cached or being generated (no new upstream)."""
+        if self.get(key) is not None:
+            return True
+        with self._lock:
+            return key in self._flights
+
+    def stream(self, key, producer):
+        """Yield the answer chunks for ``key``.
+
+        Served from cache when possible; otherwise joins an in-flight
+        generation for the same key or starts one. ``producer`` is a
+        zero-argument callable returning the upstream stream generator. The
+        upstream runs on its own thread so it completes (and is cached) even
+        if the visitor who triggered it navigates away.
+        """
+        chunks = self.get(key)
+        if chunks is not None:
+            annotate(cache="response-hit")
+            return replay_chunks(chunks)
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is None:
+                flight = self._flights[key] = _Flight()
+                leader = True
+            else:
+                leader = False
+        if leader:
+
+            def on_success(chunks):
+                self.put(key, chunks)
+
+            def run():
+                try:
+                    flight.run(producer, on_success)
+                finally:
+                    with self._lock:
+                        self._flights.pop(key, None)
+
+            threading.Thread(
+                target=contextvars.copy_context().run,  # keeps the turn's trace
+                args=(run,),
+                name="response-cache-flight",
+                daemon=True,
+            ).start()
+        return flight.follow()
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_response_cache():
+    """Return the process-wide ``ResponseCache``."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ResponseCache(
+                    maxsize=int(os.getenv("RESPONSE_CACHE_SIZE", "256")),
+                    ttl=float(os.getenv("RESPONSE_CACHE_TTL", "3600")),
+                )
+                get_scheduler().every(
+                    "response-cache-purge",
+                    float(os.getenv("RESPONSE_CACHE_PURGE_INTERVAL", "300")),
+                    _cache.purge,
+                )
+    return _cache
@@ -0,0 +1,195 @@
+"""Lexical retrieval over the resume markdown.
+
+Instead of pasting the whole of ``linkedin.md`` into every system prompt,
+the resume is split into sections (jobs, projects, certifications, ...) at
+load time and indexed with BM25. Only the top-k sections relevant to the
+current question are sent to the model.
+
+The index is keyed by a hash of the resume text and persisted under
+``RESUME_INDEX_DIR`` (default ``.cache/resume_index``), so it is rebuilt
+automatically whenever ``Me._load_resume_data`` returns new content.
+"""
+
+import hashlib
+import json
+import os
+import pathlib
+import re
+import threading
+
+import numpy as np
+
+DEFAULT_INDEX_DIR = pathlib.Path(__file__).parent / ".cache" / "resume_index"
+
+_HEADING = re.compile(r"^(#{1,6})\s+(.*\S)\s*$")
+_TOKEN = re.compile(r"[a-z0-9]+|[\u4e00-\u9fff]")
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from has have i in is it me my of on or "
+    "show tell that the this to was what with you your about".split()
+)
+
+
+def content_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+
+
+def tokenize(text):
+    return [t for t in _TOKEN.findall(text.lower()) if t not in _STOPWORDS]
+
+
+def chunk_markdown(text, max_chars=1500):
+    """Split markdown into heading-scoped sections.
+
+    Each chunk keeps its heading trail (e.g. ``Experience > Accenture``) so
+    it still makes sense out of context. Sections longer than ``max_chars``
+    are split further on blank lines.
+    """
+    chunks = []
+    trail = []
+    lines = []
+
+    def flush():
+        body = "\n".join(lines).strip()
+        lines.clear()
+        if not body:
+            return
+        title = " > ".join(name for _, name in trail)
+        paragraphs = re.split(r"\n\s*\n", body)
+        current = ""
+        for para in paragraphs:
+            if current and len(current) + len(para) + 2 > max_chars:
+                chunks.append({"title": title, "text": current})
+                current = ""
+            current = f"{current}\n\n{para}" if current else para
+        if current:
+            chunks.append({"title": title, "text": current})
+
+    for line in text.splitlines():
+        match = _HEADING.match(line)
+        if match:
+            flush()
+            level = len(match.group(1))
+            while trail and trail[-1][0] >= level:
+                trail.pop()
+            trail.append((level, match.group(2).strip("*_ ")))
+        else:
+            lines.append(line)
+    flush()
+    return chunks
+
+
+class ResumeIndex:
+    """BM25 index over resume chunks, vectorized with NumPy."""
+
+    def __init__(self, chunks, vocab, tf, version, k1=1.5, b=0.75):
+        self.chunks = chunks
+        self.vocab = vocab
+        self.version = version
+        self.k1 = k1
+        self.b = b
+        self._tf = tf.astype(np.float32)
+        doc_len = self._tf.sum(axis=1)
+        avg_len = float(doc_len.mean()) if len(doc_len) else 1.0
+        self._norm = k1 * (1 - b + b * doc_len / max(avg_len, 1.0))
+        df = (self._tf > 0).sum(axis=0)
+        n = len(chunks)
+        self._idf = np.log(1 + (n - df + 0.5) / (df + 0.5)).astype(np.float32)
+
+    @classmethod
+    def build(cls, text, version=None):
+        chunks = chunk_markdown(text)
+        docs = [tokenize(c["title"] + " " + c["text"]) for c in chunks]
+        vocab = {}
+        for doc in docs:
+            for tok in doc:
+                vocab.setdefault(tok, len(vocab))
+        tf = np.zeros((len(chunks), len(vocab)), dtype=np.float32)
+        for row, doc in enumerate(docs):
+            for tok in doc:
+                tf[row, vocab[tok]] += 1
+        return cls(chunks, vocab, tf, version or content_hash(text))
+
+    def scores(self, query):
+        ids = [self.vocab[t] for t in set(tokenize(query)) if t in self.vocab]
+        if not ids:
+            return np.zeros(len(self.chunks), dtype=np.float32)
+        tf = self._tf[:, ids]
+        weight = tf * (self.k1 + 1) / (tf + self._norm[:, None])
+        return weight @ self._idf[ids]
+
+    def search(self, query, k=5):
+        """Return up to ``k`` chunk indices, best first (empty if no match)."""
+        scores = self.scores(query)
+        order = np.argsort(-scores, kind="stable")[:k]
+        return [int(i) for i in order if scores[i] > 0]
+
+    def context_for(self, query, k=5, max_chars=6000):
+        """Render the top-k chunks for ``query`` within a character budget.
+
+        Falls back to the leading sections (summary / headline) when nothing
+        matches, e.g. small-talk or questions in another language.
+        """
+        picked = self.search(query, k) or list(range(min(k, len(self.chunks))))
+        # Keep resume order so the excerpt reads naturally.
+        parts = []
+        used = 0
+        for i in sorted(picked):
+            chunk = self.chunks[i]
+            block = (
+                f"### {chunk['title']}\n{chunk['text']}"
+                if chunk["title"]
+                else chunk["text"]
+            )
+            if parts and used + len(block) > max_chars:
+                break
+            parts.append(block[:max_chars])
+            used += len(block)
+        return "\n\n".join(parts)
+
+    # -- persistence -----------------------------------------------------
+
+    def save(self, directory):
+        directory = pathlib.Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        tmp = directory / f"{self.version}.tmp.npz"
+        np.savez_compressed(
+            tmp,
+            tf=self._tf,
+            meta=np.array(json.dumps({"chunks": self.chunks, "vocab": self.vocab})),
+        )
+        os.replace(tmp, directory / f"{self.version}.npz")
+
+    @classmethod
+    def load(cls, directory, version):
+        path = pathlib.Path(directory) / f"{version}.npz"
+        with np.load(path, allow_pickle=False) as data:
+            meta = json.loads(str(data["meta"]))
+            return cls(meta["chunks"], meta["vocab"], data["tf"], version)
+
+
+_indexes = {}
+_lock = threading.Lock()
+
+
+def get_resume_index(text):
+    """Return the index for ``text``, loading or rebuilding as needed."""
+    version = content_hash(text)
+    index = _indexes.get(version)
+    if index is not None:
+        return index
+    with _lock:
+        index = _indexes.get(version)
+        if index is None:
+            directory = os.getenv("RESUME_INDEX_DIR", DEFAULT_INDEX_DIR)
+            try:
+                index = ResumeIndex.load(directory, version)
+            except (OSError, ValueError, KeyError):
+                index = ResumeIndex.build(text, version)
+                try:
+                    index.save(directory)
+                except OSError as e:
+                    print(f"⚠️ Could not persist resume index: {e}")
+            # Only the current resume version is worth keeping in memory.
+            _indexes.clear()
+            _indexes[version] = index
+    return index
@@ -0,0 +1,197 @@
+"""Process-wide resume store with conditional, hot-reloading refresh.
+
+``Me`` used to load ``linkedin.md`` through ``st.cache_data(ttl=7200)``:
+every expiry re-downloaded the file from S3 whether or not it had changed,
+the local fallback depended on the working directory, and each rerun's
+``Me()`` went through the cache machinery again.
+
+``ResumeStore`` loads the resume once per process and re-validates it as a
+``resume-refresh`` job on the shared maintenance scheduler:
+
+- S3 (``S3_BUCKET`` + ``LINKEDIN_KEY``): conditional GET with
+  ``IfNoneMatch`` on the last ETag, so an unchanged resume costs a 304;
+- local file (``RESUME_PATH``, default ``me/linkedin.md``; relative paths
+  are resolved next to this module): ``stat`` (mtime + size) before reading.
+
+When the content really changed (same bytes under a new ETag/mtime do not
+count), a new ``ResumeSnapshot`` is built, including its search index, and
+swapped in with a single reference assignment, so readers always see text
+and index from the same version. Other derived data (the frozen system
+prompt) hangs off the snapshot via ``derive`` and is rebuilt lazily, once,
+for each new version. Listeners registered with ``subscribe`` are called
+after each swap.
+
+``RESUME_REFRESH_INTERVAL`` (seconds, default 300; 0 disables the job).
+"""
+
+import os
+import pathlib
+import threading
+import time
+
+from resume_index import content_hash, get_resume_index
+from scheduler import get_scheduler
+
+DEFAULT_RESUME_PATH = pathlib.Path(__file__).parent / "me" / "linkedin.md"
+
+
+class LocalResumeSource:
+    """Reads a file; the validator is ``(mtime_ns, size)``."""
+
+    def __init__(self, path):
+        self.path = pathlib.Path(path)
+
+    def fetch(self, validator=None):
+        """Return ``(text, validator)``, or ``None`` if unchanged."""
+        st = self.path.stat()
+        current = (st.st_mtime_ns, st.st_size)
+        if current == validator:
+            return None
+        return self.path.read_text(encoding="utf-8"), current
+
+    def __str__(self):
+        return str(self.path)
+
+
+class S3ResumeSource:
+    """Reads an S3 object with conditional GETs; the validator is the ETag."""
+
+    def __init__(self, bucket, key, client=None):
+        self.bucket = bucket
+        self.key = key
+        self._client = client
+
+    @property
+    def client(self):
+        if self._client is None:
+            import boto3
+
+            self._client = boto3.client(
+                "s3",
+                aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID"),
+                aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY"),
+                region_name=os.getenv("AWS_REGION"),
+            )
+        return self._client
+
+    def fetch(self, validator=None):
+        kwargs = {"Bucket": self.bucket, "Key": self.key}
+        if validator:
+            kwargs["IfNoneMatch"] = validator
+        try:
+            obj = self.client.get_object(**kwargs)
+        except Exception as e:
+            response = getattr(e, "response", None) or {}
+            status = response.get("ResponseMetadata", {}).get("HTTPStatusCode")
+            code = response.get("Error", {}).get("Code")
+            if status == 304 or code in ("304", "NotModified"):
+                return None
+            raise
+        return obj["Body"].read().decode("utf-8"), obj.get("ETag")
+
+    def __str__(self):
+        return f"s3://{self.bucket}/{self.key}"
+
+
+class ResumeSnapshot:
+    """One immutable resume version plus data derived from it."""
+
+    def __init__(self, text, validator=None):
+        self.text = text
+        self.version = content_hash(text)
+        self.validator = validator
+        self.loaded_at = time.time()
+        self.index = get_resume_index(text)
+        self._derived = {}
+        self._lock = threading.Lock()
+
+    def derive(self, key, build):
+        """Return ``build()`` computed once for this version."""
+        value = self._derived.get(key)
+        if value is None:
+            with self._lock:
+                value = self._derived.get(key)
+                if value is None:
+                    value = self._derived[key] = build()
+        return value
+
+
+class ResumeStore:
+    """Holds the current ``ResumeSnapshot`` and swaps in new versions."""
+
+    def __init__(self, source, interval=300.0):
+        self.source = source
+        self.interval = interval
+        self._listeners = []
+        self._refresh_lock = threading.Lock()
+        text, validator = source.fetch()
+        self._snapshot = ResumeSnapshot(text, validator)
+
+    @property
+    def snapshot(self):
+        return self._snapshot
+
+    def subscribe(self, listener):
+        """Call ``listener(snapshot)`` after each content change."""
+        self._listeners.append(listener)
+
+    def refresh(self):
+        """Re-validate the source; return True if new content was swapped in."""
+        with self._refresh_lock:
+            current = self._snapshot
+            result = self.source.fetch(current.validator)
+            if result is None:
+                return False
+            text, validator = result
+            if content_hash(text) == current.version:
+                current.validator = validator  # touched, not changed
+                return False
+            snapshot = ResumeSnapshot(text, validator)  # index built before swap
+            self._snapshot = snapshot
+        print(
+            f"✅ Resume reloaded from {self.source} (version {snapshot.version[:12]})"
+        )
+        for listener in list(self._listeners):
+            try:
+                listener(snapshot)
+            except Exception as e:
+                print(f"⚠️ Resume listener failed: {e}")
+        return True
+
+
+def source_from_env():
+    """``S3_BUCKET`` + ``LINKEDIN_KEY`` → S3, else ``RESUME_PATH``."""
+    if os.getenv("S3_BUCKET"):
+        key = os.getenv("LINKEDIN_KEY", "linkedin.md")
+        if not key:
+            raise ValueError("LINKEDIN_KEY environment variable is not set")
+        return S3ResumeSource(os.getenv("S3_BUCKET"), key)
+    path = pathlib.Path(os.getenv("RESUME_PATH") or DEFAULT_RESUME_PATH)
+    if not path.is_absolute():
+        path = pathlib.Path(__file__).parent / path
+    return LocalResumeSource(path)
+
+
+def _refresh():
+    try:
+        _store.refresh()
+    except Exception as e:
+        print(f"⚠️ Resume refresh failed, keeping current version: {e}")
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_resume_store():
+    """Return the process-wide ``ResumeStore`` (loaded on first use)."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = ResumeStore(
+                    source_from_env(),
+                    interval=float(os.getenv("RESUME_REFRESH_INTERVAL", "300")),
+                )
+                get_scheduler().every("resume-refresh", _store.interval, _refresh)
+    return _store
@@ -0,0 +1,174 @@
+"""Process-wide scheduler for periodic background maintenance.
+
+``app.py`` used to ping the site inline, inside a visitor's page render,
+every 10th rerun or 30 minutes *per session*: up to 5 seconds of blocked
+page for that visitor, and as many pingers as open sessions. Periodic work
+now runs on one daemon thread per process, off the request path:
+
+- ``keep-warm``: GET ``KEEP_WARM_URL`` (default https://almateus.me, empty
+  disables) every ``KEEP_WARM_INTERVAL`` seconds (default 1800);
+- ``resume-refresh``, ``response-cache-purge``, ``session-evict`` and
+  ``chat-log-flush`` are registered by ``resume_store``,
+  ``response_cache``, ``session_store`` and ``chat_log`` when those are
+  first used.
+
+Each run is rescheduled ``interval`` seconds later, give or take
+``jitter`` (default ±10%), so processes started together don't fire in
+lockstep. A failing job is logged and retried at its next slot; jobs run
+one at a time and should bound their own I/O with timeouts.
+"""
+
+import heapq
+import itertools
+import os
+import random
+import threading
+import time
+
+
+class Job:
+    def __init__(self, name, interval, func, jitter):
+        self.name = name
+        self.interval = interval
+        self.func = func
+        self.jitter = jitter
+        self.runs = 0
+        self.failures = 0
+        self.last_duration = None
+
+
+class Scheduler:
+    """Runs registered jobs on a single background thread."""
+
+    def __init__(self, clock=time.monotonic, rng=None):
+        self.clock = clock
+        self.rng = rng or random.Random()
+        self._jobs = {}
+        self._heap = []  # (due, seq, job)
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._thread = None
+        self._stopped = False
+
+    def _delay(self, job):
+        return job.interval * (1 + self.rng.uniform(-job.jitter, job.jitter))
+
+    def every(self, name, interval, func, jitter=0.1, initial_delay=None):
+        """Run ``func()`` every ``interval`` seconds; replaces a job of the
+        same name. ``interval <= 0`` cancels it."""
+        with self._cond:
+            if interval <= 0:
+                self._jobs.pop(name, None)
+                return None
+            job = Job(name, interval, func, jitter)
+            self._jobs[name] = job
+            delay = self._delay(job) if initial_delay is None else initial_delay
+            heapq.heappush(self._heap, (self.clock() + delay, next(self._seq), job))
+            self._cond.notify()
+        self.start()
+        return job
+
+    def cancel(self, name):
+        with self._cond:
+            self._jobs.pop(name, None)
+
+    def start(self):
+        with self._cond:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="maintenance-scheduler", daemon=True
+                )
+                self._thread.start()
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+
+    def _next_job(self):
+        """Block until a live job is due; ``None`` once stopped."""
+        with self._cond:
+            while not self._stopped:
+                if not self._heap:
+                    self._cond.wait()
+                    continue
+                due, _, job = self._heap[0]
+                if self._jobs.get(job.name) is not job:
+                    heapq.heappop(self._heap)  # cancelled or replaced
+                    continue
+                wait = due - self.clock()
+                if wait > 0:
+                    self._cond.wait(wait)
+                    continue
+                heapq.heappop(self._heap)
+                heapq.heappush(
+                    self._heap, (self.clock() + self._delay(job), next(self._seq), job)
+                )
+                return job
+            return None
+
+    def _run(self):
+        while True:
+            job = self._next_job()
+            if job is None:
+                return
+            start = self.clock()
+            try:
+                job.func()
+            except Exception as e:
+                job.failures += 1
+                print(f"⚠️ Scheduled job {job.name} failed: {e}")
+            job.runs += 1
+            job.last_duration = self.clock() - start
+
+    def snapshot(self):
+        with self._cond:
+            return {
+                name: {
+                    "interval": job.interval,
+                    "runs": job.runs,
+                    "failures": job.failures,
+                    "last_duration": job.last_duration,
+                }
+                for name, job in self._jobs.items()
+            }
+
+
+def keep_warm(url):
+    import requests
+
+    requests.get(url, timeout=5)
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+_maintenance_started = False
+
+
+def get_scheduler():
+    """Return the process-wide ``Scheduler``."""
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                _scheduler = Scheduler()
+    return _scheduler
+
+
+def start_maintenance(keep_warm_enabled=True):
+    """Register the process-level jobs once (safe to call on every rerun)."""
+    global _maintenance_started
+    if _maintenance_started:
+        return
+    with _scheduler_lock:
+        if _maintenance_started:
+            return
+        _maintenance_started = True
+    scheduler = get_scheduler()
+    url = os.getenv("KEEP_WARM_URL", "https://almateus.me")
+    if keep_warm_enabled and url:
+        scheduler.every(
+            "keep-warm",
+            float(os.getenv("KEEP_WARM_INTERVAL", "1800")),
+            lambda: keep_warm(url),
+        )
@@ -0,0 +1,186 @@
+"""Semantic answer cache for near-duplicate opening questions.
+
+Most sessions open with a paraphrase of a handful of questions ("what do
+you do", "tell me about your projects", and the Chinese/Spanish versions
+``app.py`` prefixes with a language instruction). First-turn questions are
+fingerprinted locally as hashed character n-gram vectors (NumPy, no model
+download) and compared by cosine similarity; a stored answer is reused
+above ``SEMANTIC_CACHE_THRESHOLD`` (default 0.9).
+
+Character n-grams barely notice a swapped entity: "Kubernetes on Azure?"
+and "Kubernetes on AWS?" score 0.92, "available in March?" and "in May?"
+0.89. A hit therefore also needs the same set of content words, i.e. the
+words left after dropping stopwords and question filler ("what", "tell me
+about", "your"), with plurals folded; Chinese is compared per character.
+``benchmarks/semantic_calibration.py`` checks both rules against
+paraphrase pairs that must and must not share an answer.
+
+Capacity is bounded (least-recently-used rows are overwritten) and the whole
+cache is invalidated when the resume version changes.
+"""
+
+import hashlib
+import os
+import re
+import threading
+import time
+
+import numpy as np
+
+# Instructions me_chatbot.localize_prompt prepends for non-English UIs; the
+# language is part of the lookup key instead, so they must not dominate the
+# fingerprint.
+LANGUAGE_PREFIXES = ("请用中文回答：", "Por favor responde en español:")
+_PUNCTUATION = re.compile(r"[^\w\s]")
+_WORD = re.compile(r"[^\W\d_]+|\d+")
+_CJK = re.compile(r"[\u3400-\u9fff]")
+STOPWORDS = frozenset("""
+    a about also an and any are as at be been can could describe did do does
+    doing done for from give have hey hi how in is it its just know like me
+    more my of ok on or please share show so some tell that the there this
+    to us was what when where which who why will with would you your
+    yourself
+    de del el en la las los me mas por que qué sobre su sus tu tus un una y
+    """.split())
+CJK_STOPWORDS = frozenset("的了过吗呢么吧啊你您我是在有什哪些做下一个请介绍说讲和与")
+
+
+def strip_language_prefix(text):
+    for prefix in LANGUAGE_PREFIXES:
+        if text.startswith(prefix):
+            return text[len(prefix) :]
+    return text
+
+
+def content_words(text):
+    """Words that distinguish ``text`` from a paraphrase that means the same."""
+    text = strip_language_prefix(text).lower()
+    words = set()
+    for word in _WORD.findall(text):
+        if _CJK.match(word):
+            words.update(c for c in word if c not in CJK_STOPWORDS)
+        elif word not in STOPWORDS and (len(word) > 1 or word.isdigit()):
+            if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+                word = word[:-1]
+            words.add(word)
+    return frozenset(words)
+
+
+def _bucket(gram, dim):
+    digest = hashlib.blake2b(gram.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little") % dim
+
+
+def fingerprint(text, dim=2048, ngrams=(2, 3, 4)):
+    """L2-normalized hashed character n-gram vector for ``text``."""
+    text = _PUNCTUATION.sub(" ", strip_language_prefix(text).lower())
+    text = " " + " ".join(text.split()) + " "
+    vec = np.zeros(dim, dtype=np.float32)
+    for n in ngrams:
+        for i in range(len(text) - n + 1):
+            vec[_bucket(text[i : i + n], dim)] += 1.0
+    norm = np.linalg.norm(vec)
+    return vec / norm if norm else vec
+
+
+class SemanticCache:
+    """Fixed-capacity nearest-neighbour cache of first-turn answers."""
+
+    def __init__(self, capacity=512, threshold=0.9, dim=2048):
+        self.capacity = capacity
+        self.threshold = threshold
+        self.dim = dim
+        self._lock = threading.Lock()
+        self._reset(None)
+
+    def clear(self):
+        with self._lock:
+            self._reset(self.version)
+
+    def _reset(self, version):
+        self.version = version
+        self._vectors = np.zeros((self.capacity, self.dim), dtype=np.float32)
+        self._used = np.zeros(self.capacity, dtype=np.float64)  # 0 = empty
+        self._languages = [None] * self.capacity
+        self._words = [None] * self.capacity
+        self._answers = [None] * self.capacity
+
+    def _check_version(self, version):
+        if version != self.version:
+            self._reset(version)  # resume changed: every answer is stale
+
+    def matches(self, question, other):
+        """``(similarity, hit)`` for two questions, as ``lookup`` judges them."""
+        score = float(fingerprint(question, self.dim) @ fingerprint(other, self.dim))
+        hit = score >= self.threshold and content_words(question) == content_words(
+            other
+        )
+        return score, hit
+
+    def lookup(self, question, language, version):
+        """Return cached answer chunks for a similar question, or ``None``."""
+        vec = fingerprint(question, self.dim)
+        words = content_words(question)
+        with self._lock:
+            self._check_version(version)
+            sims = self._vectors @ vec
+            for row in np.argsort(-sims)[:8]:
+                if sims[row] < self.threshold:
+                    break
+                if (
+                    self._used[row]
+                    and self._languages[row] == language
+                    and self._words[row] == words
+                ):
+                    self._used[row] = time.monotonic()
+                    return self._answers[row]
+        return None
+
+    def store(self, question, language, version, chunks):
+        vec = fingerprint(question, self.dim)
+        with self._lock:
+            self._check_version(version)
+            row = int(np.argmin(self._used))  # empty slot, else LRU
+            self._vectors[row] = vec
+            self._used[row] = time.monotonic()
+            self._languages[row] = language
+            self._words[row] = content_words(question)
+            self._answers[row] = list(chunks)
+
+    def record(self, question, language, version, stream):
+        """Pass ``stream`` through, storing the answer once it completes."""
+        chunks = []
+        for content in stream:
+            chunks.append(content)
+            yield content
+        if chunks:
+            self.store(question, language, version, chunks)
+
+    async def arecord(self, question, language, version, stream):
+        """``record`` for an async iterator."""
+        chunks = []
+        async for content in stream:
+            chunks.append(content)
+            yield content
+        if chunks:
+            self.store(question, language, version, chunks)
+
+    def __len__(self):
+        return int(np.count_nonzero(self._used))
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_semantic_cache():
+    """Return the process-wide ``SemanticCache``."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = SemanticCache(
+                    capacity=int(os.getenv("SEMANTIC_CACHE_SIZE", "512")),
+                    threshold=float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.9")),
+                )
+    return _cache
@@ -0,0 +1,284 @@
+"""Compact, bounded per-session chat history.
+
+``st.session_state.history`` was a list of full Markdown ``(user, bot)``
+string tuples, kept for as long as the browser tab stayed open, and every
+rerun re-rendered all of it. ``SessionHistory`` replaces the list with the
+same sequence interface (``len``, indexing, slicing, iteration, ``append``
+of a tuple), so ``ConversationMemory`` and ``Me`` take it unchanged:
+
+- each turn is a ``Turn`` with ``__slots__`` holding one UTF-8 ``bytes``
+  object (a ``str`` takes 4 bytes per character as soon as an answer
+  contains an emoji);
+- turns older than the last ``SESSION_HOT_TURNS`` (default
+  ``HISTORY_KEEP_TURNS``, 6) are zlib-compressed. By then
+  ``ConversationMemory`` has folded them into its summary, so only the
+  "show earlier messages" view reads them again, and a rerun renders just
+  the hot turns;
+- past ``SESSION_MAX_BYTES`` (default 64 KiB) the oldest compressed turns
+  are dropped; they remain in the transcript log. Indices stay stable and a
+  dropped turn reads as ``("", "")``.
+
+``SessionStore`` holds the histories of the process by session id. Every
+``SESSION_EVICT_INTERVAL`` seconds (default 60) the scheduler writes the
+sessions idle for ``SESSION_IDLE_TIMEOUT`` seconds (default 900) to
+``<CHAT_SPOOL_DIR>/sessions/<session_id>.z`` and frees them; ``get`` reads
+a session back on its next turn. Files nobody claimed within
+``SESSION_FILE_TTL`` seconds (default one day) are deleted.
+"""
+
+import json
+import os
+import pathlib
+import re
+import threading
+import time
+import zlib
+
+DROPPED = ("", "")
+FILE_SUFFIX = ".z"
+_SAFE_ID = re.compile(r"[\w-]{1,128}")
+
+
+class Turn:
+    """One ``(user, bot)`` exchange as UTF-8, compressed once it is old."""
+
+    __slots__ = ("data", "split", "packed")
+
+    def __init__(self, user, bot):
+        user_bytes = user.encode("utf-8")
+        self.data = user_bytes + bot.encode("utf-8")
+        self.split = len(user_bytes)
+        self.packed = False
+
+    @classmethod
+    def raw(cls, data, split, packed):
+        turn = cls.__new__(cls)
+        turn.data, turn.split, turn.packed = data, split, packed
+        return turn
+
+    def pack(self):
+        """Compress in place when that actually saves space."""
+        if not self.packed:
+            packed = zlib.compress(self.data, 6)
+            if len(packed) < len(self.data):
+                self.data, self.packed = packed, True
+
+    def text(self):
+        data = zlib.decompress(self.data) if self.packed else self.data
+        return data[: self.split].decode("utf-8"), data[self.split :].decode("utf-8")
+
+
+class SessionHistory:
+    """List-compatible chat history of ``(user, bot)`` tuples."""
+
+    def __init__(self, hot_turns=6, max_bytes=64 * 1024):
+        self.hot_turns = hot_turns
+        self.max_bytes = max_bytes
+        self.dropped = 0  # leading turns removed by the byte cap
+        self.nbytes = 0
+        self._turns = []
+
+    def __len__(self):
+        return self.dropped + len(self._turns)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("history index out of range")
+        if index < self.dropped:
+            return DROPPED
+        return self._turns[index - self.dropped].text()
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    @property
+    def hot_start(self):
+        """Index of the first uncompressed turn."""
+        return max(len(self) - self.hot_turns, self.dropped)
+
+    def append(self, turn):
+        user, bot = turn
+        self._turns.append(Turn(user, bot))
+        self.nbytes += len(self._turns[-1].data)
+        if len(self._turns) > self.hot_turns:
+            old = self._turns[-self.hot_turns - 1]
+            self.nbytes -= len(old.data)
+            old.pack()
+            self.nbytes += len(old.data)
+        while self.nbytes > self.max_bytes and len(self._turns) > self.hot_turns:
+            self.nbytes -= len(self._turns.pop(0).data)
+            self.dropped += 1
+
+    def clear(self):
+        self._turns = []
+        self.dropped = 0
+        self.nbytes = 0
+
+    # -- spooling ------------------------------------------------------------
+
+    def to_bytes(self):
+        header = {
+            "dropped": self.dropped,
+            "turns": [[t.split, t.packed, len(t.data)] for t in self._turns],
+        }
+        return b"".join(
+            [json.dumps(header).encode("utf-8"), b"\n"] + [t.data for t in self._turns]
+        )
+
+    @classmethod
+    def from_bytes(cls, blob, **limits):
+        line, _, body = blob.partition(b"\n")
+        header = json.loads(line)
+        history = cls(**limits)
+        history.dropped = header["dropped"]
+        offset = 0
+        for split, packed, size in header["turns"]:
+            data = body[offset : offset + size]
+            if len(data) != size:
+                raise ValueError("truncated session file")
+            history._turns.append(Turn.raw(data, split, packed))
+            history.nbytes += size
+            offset += size
+        return history
+
+
+class SessionStore:
+    """Histories by session id; idle ones are spooled to disk."""
+
+    def __init__(
+        self,
+        directory,
+        hot_turns=6,
+        max_bytes=64 * 1024,
+        idle_timeout=900.0,
+        file_ttl=86400.0,
+        clock=time.monotonic,
+    ):
+        self.directory = pathlib.Path(directory)
+        self.limits = {"hot_turns": hot_turns, "max_bytes": max_bytes}
+        self.idle_timeout = idle_timeout
+        self.file_ttl = file_ttl
+        self.clock = clock
+        self._sessions = {}  # session_id -> SessionHistory
+        self._seen = {}  # session_id -> last get()
+        self._saving = {}  # evicted, file not written yet
+        self._lock = threading.Lock()
+
+    def get(self, session_id):
+        """The session's history: in memory, spooled, or a new one."""
+        with self._lock:
+            history = self._sessions.get(session_id)
+            if history is None:
+                history = self._saving.get(session_id)
+                if history is None:
+                    history = self._load(session_id)
+                self._sessions[session_id] = history
+            self._seen[session_id] = self.clock()
+            return history
+
+    def evict_idle(self):
+        """Spool sessions idle for ``idle_timeout``; return how many."""
+        cutoff = self.clock() - self.idle_timeout
+        with self._lock:
+            idle = [sid for sid, seen in self._seen.items() if seen < cutoff]
+            for session_id in idle:
+                del self._seen[session_id]
+                self._saving[session_id] = self._sessions.pop(session_id)
+        for session_id in idle:
+            history = self._saving[session_id]
+            if len(history) > history.dropped:
+                self._save(session_id, history)
+            with self._lock:
+                del self._saving[session_id]
+                if session_id in self._sessions:  # came back while saving
+                    self._path(session_id).unlink(missing_ok=True)
+        self._expire_files()
+        return len(idle)
+
+    def stats(self):
+        with self._lock:
+            histories = list(self._sessions.values())
+        return {
+            "sessions": len(histories),
+            "turns": sum(len(h) - h.dropped for h in histories),
+            "bytes": sum(h.nbytes for h in histories),
+        }
+
+    def _path(self, session_id):
+        return self.directory / f"{session_id}{FILE_SUFFIX}"
+
+    def _load(self, session_id):
+        history = None
+        if _SAFE_ID.fullmatch(session_id):
+            path = self._path(session_id)
+            try:
+                history = SessionHistory.from_bytes(path.read_bytes(), **self.limits)
+                path.unlink(missing_ok=True)
+            except FileNotFoundError:
+                pass
+            except (OSError, ValueError, KeyError) as e:
+                print(f"⚠️ Could not restore session {session_id}: {e}")
+        return history if history is not None else SessionHistory(**self.limits)
+
+    def _save(self, session_id, history):
+        if not _SAFE_ID.fullmatch(session_id):
+            return
+        path = self._path(session_id)
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_name(path.name + ".tmp")
+            tmp.write_bytes(history.to_bytes())
+            os.replace(tmp, path)
+        except OSError as e:
+            print(f"❌ Failed to spool session {session_id}: {e}")
+
+    def _expire_files(self):
+        cutoff = time.time() - self.file_ttl
+        for path in self.directory.glob(f"*{FILE_SUFFIX}"):
+            try:
+                if path.stat().st_mtime < cutoff:
+                    path.unlink()
+            except OSError:
+                pass
+
+
+def history_limits():
+    """``SessionHistory`` keyword arguments from the environment."""
+    keep_turns = os.getenv("HISTORY_KEEP_TURNS", "6")
+    return {
+        "hot_turns": int(os.getenv("SESSION_HOT_TURNS", keep_turns)),
+        "max_bytes": int(os.getenv("SESSION_MAX_BYTES", str(64 * 1024))),
+    }
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_session_store():
+    """Return the process-wide ``SessionStore`` (swept by the scheduler)."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                from chat_log import DEFAULT_SPOOL_DIR
+                from scheduler import get_scheduler
+
+                spool_dir = os.getenv("CHAT_SPOOL_DIR", DEFAULT_SPOOL_DIR)
+                _store = SessionStore(
+                    pathlib.Path(spool_dir) / "sessions",
+                    **history_limits(),
+                    idle_timeout=float(os.getenv("SESSION_IDLE_TIMEOUT", "900")),
+                    file_ttl=float(os.getenv("SESSION_FILE_TTL", "86400")),
+                )
+                get_scheduler().every(
+                    "session-evict",
+                    float(os.getenv("SESSION_EVICT_INTERVAL", "60")),
+                    _store.evict_idle,
+                )
+    return _store
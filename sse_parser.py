@@ -0,0 +1,166 @@
+"""Incremental Server-Sent Events parser for provider streams.
+
+The DeepSeek stream used to go through ``iter_lines()``, decode every line
+to ``str``, check prefixes and ``json.loads`` each payload, silently
+skipping anything that failed to parse. ``SSEParser`` instead works on the
+raw bytes as they arrive: chunks are appended to one ``bytearray``, lines
+are located with ``find`` and only the ``data:`` values are copied out.
+Nothing is decoded until a complete event is handed to ``json.loads``
+(which accepts UTF-8 bytes), so a multi-byte character split across two
+network reads, common on the Chinese path, is never decoded half-way.
+
+Supported: LF and CRLF line endings, multi-line ``data:`` fields (joined
+with ``\\n``), comment lines such as DeepSeek's ``: keep-alive``, a leading
+BOM, and the ``[DONE]`` sentinel. Other fields (``event``, ``id``,
+``retry``) are ignored.
+"""
+
+import json
+
+DONE = b"[DONE]"
+_BOM = b"\xef\xbb\xbf"
+_LF, _CR, _COLON, _SPACE = 10, 13, 58, 32
+_CONTENT = b'"delta":{"content":"'
+
+
+class SSEParser:
+    """Feed raw byte chunks, get back the ``data`` payload of each event."""
+
+    def __init__(self):
+        self._buf = bytearray()
+        self._data = []
+        self._scanned = 0  # bytes of the pending partial line already searched
+        self._started = False
+
+    def feed(self, chunk):
+        """Add ``chunk`` and return the payloads (bytes) of completed events."""
+        buf = self._buf
+        buf += chunk
+        if not self._started:
+            if len(buf) < len(_BOM) and _BOM.startswith(buf):
+                return []
+            if buf.startswith(_BOM):
+                del buf[: len(_BOM)]
+            self._started = True
+        events = []
+        pos = 0
+        view = memoryview(buf)
+        nl = buf.find(_LF, self._scanned)
+        try:
+            while nl >= 0:
+                end = nl - 1 if nl > pos and buf[nl - 1] == _CR else nl
+                if end == pos:
+                    if self._data:
+                        events.append(self._dispatch())
+                elif buf[pos] != _COLON and buf.startswith(b"data", pos, end):
+                    start = pos + 4
+                    if start == end or buf[start] == _COLON:
+                        start += 1
+                        if start < end and buf[start] == _SPACE:
+                            start += 1
+                        self._data.append(bytes(view[start:end]))
+                pos = nl + 1
+                nl = buf.find(_LF, pos)
+        finally:
+            view.release()
+        if pos:
+            del buf[:pos]
+        self._scanned = len(buf)
+        return events
+
+    def close(self):
+        """Flush an event the server did not terminate with a blank line."""
+        if self._buf:
+            self.feed(b"\n")
+        return [self._dispatch()] if self._data else []
+
+    def _dispatch(self):
+        data = self._data
+        self._data = []
+        return data[0] if len(data) == 1 else b"\n".join(data)
+
+
+def delta_content(payload):
+    """Content delta of one ``chat.completion.chunk`` payload, or ``None``.
+
+    Compact ``"delta":{"content":"..."}`` payloads without escapes, which is
+    nearly every DeepSeek/OpenAI token, are sliced out and decoded directly;
+    everything else goes through ``json.loads``. Raises ``ValueError`` (including ``json.JSONDecodeError``) for a
+    malformed payload and ``RuntimeError`` for an error event, instead of
+    skipping them.
+    """
+    start = payload.find(_CONTENT)
+    if start >= 0:
+        start += len(_CONTENT)
+        end = payload.find(b'"', start)
+        if end > start and payload.find(b"\\", start, end) < 0:
+            return payload[start:end].decode("utf-8")
+    elif b'"content"' not in payload and b'"error"' not in payload:
+        return None  # role-only first chunk, usage chunk, ...
+    chunk = json.loads(payload.decode("utf-8"))
+    if not isinstance(chunk, dict):
+        raise ValueError(f"unexpected SSE payload: {payload[:80]!r}")
+    if "error" in chunk:
+        error = chunk["error"]
+        message = error.get("message") if isinstance(error, dict) else error
+        raise RuntimeError(message or "provider stream error")
+    try:
+        choices = chunk.get("choices")
+        if not choices:
+            return None
+        return (choices[0].get("delta") or {}).get("content") or None
+    except (AttributeError, IndexError, KeyError, TypeError):
+        raise ValueError(f"unexpected SSE payload: {payload[:80]!r}") from None
+
+
+def usage_of(payload):
+    """The ``usage`` block of a payload (final chunk), or ``None``."""
+    if b'"usage"' not in payload or b'"usage":null' in payload:
+        return None
+    chunk = json.loads(payload.decode("utf-8"))
+    return chunk.get("usage") if isinstance(chunk, dict) else None
+
+
+def _content(payload, on_usage):
+    if on_usage is not None:
+        usage = usage_of(payload)
+        if usage:
+            on_usage(usage)
+    return delta_content(payload)
+
+
+def iter_content(chunks, on_usage=None):
+    """Yield content deltas from an OpenAI-format SSE byte stream.
+
+    ``on_usage(dict)`` is called with the usage block if the stream has one.
+    """
+    parser = SSEParser()
+    for chunk in chunks:
+        for payload in parser.feed(chunk):
+            if payload == DONE:
+                return
+            content = _content(payload, on_usage)
+            if content:
+                yield content
+    for payload in parser.close():
+        if payload != DONE:
+            content = _content(payload, on_usage)
+            if content:
+                yield content
+
+
+async def aiter_content(chunks, on_usage=None):
+    """Async variant of ``iter_content`` for ``httpx`` byte iterators."""
+    parser = SSEParser()
+    async for chunk in chunks:
+        for payload in parser.feed(chunk):
+            if payload == DONE:
+                return
+            content = _content(payload, on_usage)
+            if content:
+                yield content
+    for payload in parser.close():
+        if payload != DONE:
+            content = _content(payload, on_usage)
+            if content:
+                yield content
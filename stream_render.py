@@ -0,0 +1,80 @@
+"""Frame-coalesced rendering of streamed answers.
+
+Provider streams yield plain text chunks. The UI used to receive the whole
+accumulated answer for every chunk (built with ``full += chunk``) and call
+``st.markdown`` on it each time, so both the string building and the
+Markdown re-render/websocket traffic grew quadratically with answer length.
+
+Here chunks are collected in a list-backed ``StreamBuffer`` and the
+accumulated text is only materialized when a frame is drawn: at most once
+every ``STREAM_FRAME_MS`` milliseconds (default 75), or earlier once
+``STREAM_FRAME_CHARS`` new characters (default 256) have arrived so a burst
+(e.g. a cached answer being replayed) still "types" instead of appearing in
+one go. The final frame is always drawn, without the cursor.
+"""
+
+import os
+import time
+
+CURSOR = "▌"
+
+
+class StreamBuffer:
+    """Append-only text buffer that joins its chunks only when read."""
+
+    def __init__(self):
+        self._parts = []
+        self.length = 0
+
+    def append(self, chunk):
+        self._parts.append(chunk)
+        self.length += len(chunk)
+
+    def text(self):
+        if len(self._parts) > 1:
+            self._parts = ["".join(self._parts)]
+        return self._parts[0] if self._parts else ""
+
+    def __len__(self):
+        return self.length
+
+
+def frames(chunks, interval=None, min_chars=None, clock=time.monotonic):
+    """Yield the accumulated text at most once per frame.
+
+    ``interval`` is in seconds and ``min_chars`` is the number of new
+    characters that forces a frame regardless of time; both default to the
+    ``STREAM_FRAME_MS``/``STREAM_FRAME_CHARS`` environment variables. The last
+    frame always holds the complete text.
+    """
+    if interval is None:
+        interval = int(os.getenv("STREAM_FRAME_MS", "75")) / 1000
+    if min_chars is None:
+        min_chars = int(os.getenv("STREAM_FRAME_CHARS", "256"))
+    buffer = StreamBuffer()
+    drawn = 0
+    last = clock()
+    for chunk in chunks:
+        if not chunk:
+            continue
+        buffer.append(chunk)
+        now = clock()
+        if now - last >= interval or (min_chars and len(buffer) - drawn >= min_chars):
+            drawn = len(buffer)
+            last = now
+            yield buffer.text()
+    if len(buffer) != drawn or not drawn:
+        yield buffer.text()
+
+
+def render_stream(chunks, render, cursor=CURSOR, **options):
+    """Draw ``chunks`` through ``render(text)`` in frames; return the answer.
+
+    Frames are drawn with ``cursor`` appended while the answer streams, then
+    once more without it. ``options`` are passed to ``frames``.
+    """
+    text = ""
+    for text in frames(chunks, **options):
+        render(text + cursor)
+    render(text)
+    return text
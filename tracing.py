@@ -0,0 +1,450 @@
+"""Per-turn latency tracing: stage timings, TTFT and tokens/sec.
+
+A chat turn passes through geolocation, cache lookups, prompt building,
+the provider connect, the first token, streaming and persistence, and until
+now none of it was measured. A ``Trace`` records one turn:
+
+    trace = get_tracer().start("chat", session_id=session_id)
+    with trace.active():                     # spans inside Me see the trace
+        chunks = me.chat_stream(...)
+    answer = render_stream(trace.stream(chunks), box.markdown)
+    with trace.span("persist"):
+        shipper.record_turn(...)
+    trace.finish()
+
+Code deeper in the stack records into whichever trace is current, and is a
+no-op when there is none: ``span("prompt_build")``, ``annotate(provider=...)``.
+``Trace.stream`` makes the trace current around every ``next()``, so spans
+inside provider generators land in the right turn; threads started for a
+turn (hedging, response-cache flights) copy the context.
+
+Derived stages: ``ttft`` (trace start to first chunk, what the visitor
+waits), ``stream`` (first to last chunk) and ``total``. Tokens are the
+provider's ``completion_tokens`` when usage is reported, else the chunk
+count (about one token per chunk for OpenAI and DeepSeek). Tokens/sec
+measures the provider, so it is only derived for turns that opened a
+provider stream (a ``connect`` span) and were not replayed from a cache
+(``cache`` attr in ``REPLAYED``); a replay would report 500k+ tokens/s.
+
+Finished traces feed in-process Prometheus histograms (``/metrics`` on the
+chat API, or ``TRACE_METRICS_PORT`` for the Streamlit process) and, with
+``TRACE_LOG`` set, one JSON line each. Histograms are per process; the JSONL
+file can be shared, one ``write`` per line in append mode. Summarize with::
+
+    python tracing.py summary chat-traces.jsonl --by provider
+"""
+
+import argparse
+import contextvars
+import json
+import math
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+
+STAGE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+RATE_BUCKETS = (5, 10, 20, 40, 80, 160, 320, 640)
+REPLAYED = ("semantic-hit", "response-hit")  # cache attrs of replayed answers
+
+_current = contextvars.ContextVar("trace", default=None)
+
+
+def current():
+    """The ``Trace`` of the turn being processed, or ``None``."""
+    return _current.get()
+
+
+@contextmanager
+def span(name):
+    """Time the block as stage ``name`` of the current trace, if any."""
+    trace = _current.get()
+    if trace is None:
+        yield
+        return
+    with trace.span(name):
+        yield
+
+
+def annotate(**attrs):
+    trace = _current.get()
+    if trace is not None:
+        trace.attrs.update(attrs)
+
+
+def _on_usage(entry):
+    trace = _current.get()
+    if trace is not None:
+        trace.usage.append(entry)
+        if entry.completion_tokens:
+            trace.tokens = entry.completion_tokens
+
+
+class Trace:
+    def __init__(self, tracer, name, attrs):
+        self.tracer = tracer
+        self.name = name
+        self.attrs = attrs
+        self.trace_id = uuid.uuid4().hex[:16]
+        self.started_at = datetime.now().isoformat()
+        self.start = tracer.clock()
+        self.stages = {}
+        self.tokens = None
+        self.usage = []  # PromptUsage reported by providers during the turn
+        self.chunks = 0
+        self.chars = 0
+        self.first_chunk = None
+        self.last_chunk = None
+        self.status = "ok"
+        self.finished = False
+
+    def record(self, stage, seconds):
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    @contextmanager
+    def span(self, stage):
+        start = self.tracer.clock()
+        try:
+            yield
+        finally:
+            self.record(stage, self.tracer.clock() - start)
+
+    @contextmanager
+    def active(self):
+        token = _current.set(self)
+        try:
+            yield self
+        finally:
+            _current.reset(token)
+
+    def stream(self, chunks):
+        """Pass ``chunks`` through, timing first/last chunk and counting."""
+        clock = self.tracer.clock
+        iterator = iter(chunks)
+        try:
+            while True:
+                token = _current.set(self)
+                try:
+                    chunk = next(iterator)
+                except StopIteration:
+                    return
+                except Exception:
+                    self.status = "error"
+                    raise
+                finally:
+                    _current.reset(token)
+                now = clock()
+                if self.first_chunk is None:
+                    self.first_chunk = now
+                self.last_chunk = now
+                self.chunks += 1
+                self.chars += len(chunk)
+                yield chunk
+        finally:
+            if hasattr(iterator, "close"):
+                iterator.close()
+
+    async def astream(self, chunks):
+        """``stream`` for an async iterator."""
+        clock = self.tracer.clock
+        iterator = chunks.__aiter__()
+        try:
+            while True:
+                token = _current.set(self)
+                try:
+                    chunk = await iterator.__anext__()
+                except StopAsyncIteration:
+                    return
+                except Exception:
+                    self.status = "error"
+                    raise
+                finally:
+                    _current.reset(token)
+                now = clock()
+                if self.first_chunk is None:
+                    self.first_chunk = now
+                self.last_chunk = now
+                self.chunks += 1
+                self.chars += len(chunk)
+                yield chunk
+        finally:
+            if hasattr(iterator, "aclose"):
+                await iterator.aclose()
+
+    def finish(self, status=None):
+        """Derive TTFT/stream/total and export; later calls are ignored."""
+        if self.finished:
+            return
+        self.finished = True
+        if status is not None:
+            self.status = status
+        self.record("total", self.tracer.clock() - self.start)
+        if self.first_chunk is not None:
+            self.record("ttft", self.first_chunk - self.start)
+            self.record("stream", self.last_chunk - self.first_chunk)
+        self.tracer.export(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.finish("error" if exc_type else None)
+
+    @property
+    def token_count(self):
+        return self.tokens if self.tokens is not None else self.chunks
+
+    @property
+    def tokens_per_second(self):
+        duration = self.stages.get("stream")
+        if not duration or self.token_count < 2:
+            return None
+        if "connect" not in self.stages or self.attrs.get("cache") in REPLAYED:
+            return None  # not the provider's rate
+        return (self.token_count - 1) / duration  # tokens after the first
+
+    def to_dict(self):
+        return {
+            "trace_id": self.trace_id,
+            "name": self.name,
+            "started_at": self.started_at,
+            "status": self.status,
+            "attrs": self.attrs,
+            "stages": {k: round(v, 6) for k, v in self.stages.items()},
+            "tokens": self.token_count,
+            "chunks": self.chunks,
+            "chars": self.chars,
+            "tokens_per_second": self.tokens_per_second,
+        }
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.sum += value
+        self.count += 1
+
+
+def _labels(pairs):
+    return ",".join(f'{k}="{v}"' for k, v in pairs)
+
+
+class Tracer:
+    """Collects finished traces into histograms and an optional JSONL log."""
+
+    def __init__(self, path=None, clock=time.perf_counter):
+        self.path = path
+        self.clock = clock
+        self._stages = {}  # (trace, provider, stage) -> Histogram
+        self._rates = {}  # (trace, provider) -> Histogram
+        self._turns = {}  # (trace, provider, status) -> count
+        self._lock = threading.Lock()
+        self._file = None
+        self._listeners = []
+
+    def start(self, name, **attrs):
+        return Trace(self, name, attrs)
+
+    def add_listener(self, listener):
+        """Call ``listener(trace)`` for every finished trace."""
+        self._listeners.append(listener)
+
+    def export(self, trace):
+        provider = trace.attrs.get("provider", "")
+        rate = trace.tokens_per_second
+        with self._lock:
+            for stage, seconds in trace.stages.items():
+                key = (trace.name, provider, stage)
+                if key not in self._stages:
+                    self._stages[key] = Histogram(STAGE_BUCKETS)
+                self._stages[key].observe(seconds)
+            if rate is not None:
+                key = (trace.name, provider)
+                if key not in self._rates:
+                    self._rates[key] = Histogram(RATE_BUCKETS)
+                self._rates[key].observe(rate)
+            key = (trace.name, provider, trace.status)
+            self._turns[key] = self._turns.get(key, 0) + 1
+            if self.path:
+                try:
+                    if self._file is None:
+                        self._file = open(self.path, "a", encoding="utf-8")
+                    line = json.dumps(trace.to_dict(), ensure_ascii=False)
+                    self._file.write(line + "\n")
+                    self._file.flush()
+                except OSError as e:
+                    print(f"⚠️ Trace log write failed: {e}")
+        for listener in list(self._listeners):
+            try:
+                listener(trace)
+            except Exception as e:
+                print(f"⚠️ Trace listener failed: {e}")
+
+    def prometheus(self):
+        """Render all metrics in the Prometheus text exposition format."""
+        lines = []
+
+        def histogram(metric, help_text, series):
+            lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} histogram")
+            for pairs, hist in series:
+                cumulative = 0
+                for bound, count in zip(list(hist.buckets) + ["+Inf"], hist.counts):
+                    cumulative += count
+                    labels = _labels(pairs + [("le", bound)])
+                    lines.append(f"{metric}_bucket{{{labels}}} {cumulative}")
+                lines.append(f"{metric}_sum{{{_labels(pairs)}}} {hist.sum}")
+                lines.append(f"{metric}_count{{{_labels(pairs)}}} {hist.count}")
+
+        with self._lock:
+            histogram(
+                "chat_stage_seconds",
+                "Duration of each stage of a chat turn.",
+                [
+                    ([("trace", n), ("provider", p), ("stage", s)], h)
+                    for (n, p, s), h in sorted(self._stages.items())
+                ],
+            )
+            histogram(
+                "chat_tokens_per_second",
+                "Streaming rate after the first token.",
+                [
+                    ([("trace", n), ("provider", p)], h)
+                    for (n, p), h in sorted(self._rates.items())
+                ],
+            )
+            lines.append("# HELP chat_turns_total Finished traces by status.")
+            lines.append("# TYPE chat_turns_total counter")
+            for (n, p, status), count in sorted(self._turns.items()):
+                labels = _labels([("trace", n), ("provider", p), ("status", status)])
+                lines.append(f"chat_turns_total{{{labels}}} {count}")
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port, host="0.0.0.0"):
+        """Expose ``/metrics`` on a background HTTP server."""
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        tracer = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = tracer.prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(
+            target=server.serve_forever, name="trace-metrics", daemon=True
+        ).start()
+        print(f"✅ Trace metrics on http://{host}:{server.server_port}/metrics")
+        return server
+
+
+_tracer = None
+_tracer_lock = threading.Lock()
+
+
+def get_tracer():
+    """Return the process-wide ``Tracer`` (``TRACE_LOG``, ``TRACE_METRICS_PORT``)."""
+    global _tracer
+    if _tracer is None:
+        with _tracer_lock:
+            if _tracer is None:
+                from prompt_cache import get_usage_tracker
+
+                tracer = Tracer(path=os.getenv("TRACE_LOG") or None)
+                get_usage_tracker().add_listener(_on_usage)
+                port = int(os.getenv("TRACE_METRICS_PORT") or 0)
+                if port:
+                    try:
+                        tracer.serve(port)
+                    except OSError as e:  # another process already serves it
+                        print(f"⚠️ Trace metrics server not started: {e}")
+                _tracer = tracer
+    return _tracer
+
+
+# -- summary CLI -----------------------------------------------------------
+
+
+def percentile(values, q):
+    """Nearest-rank percentile of a sorted list."""
+    if not values:
+        return None
+    rank = max(math.ceil(q / 100 * len(values)) - 1, 0)
+    return values[rank]
+
+
+def summarize(records, by=None):
+    """``{group: {stage: sorted values}}`` from trace dicts."""
+    groups = {}
+    for record in records:
+        group = record["attrs"].get(by, "") if by else "all"
+        stages = groups.setdefault(str(group), {})
+        for stage, seconds in record["stages"].items():
+            stages.setdefault(stage, []).append(seconds * 1000)
+        rate = record.get("tokens_per_second")
+        if rate is not None and record["attrs"].get("cache") not in REPLAYED:
+            stages.setdefault("tokens/s", []).append(rate)
+        if record.get("status") != "ok":
+            stages.setdefault("errors", []).append(1)
+    for stages in groups.values():
+        for values in stages.values():
+            values.sort()
+    return groups
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarize TRACE_LOG files.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    summary = sub.add_parser("summary", help="p50/p95/p99 per stage")
+    summary.add_argument("paths", nargs="+")
+    summary.add_argument("--by", help="group by this attribute (e.g. provider)")
+    summary.add_argument("--name", help="only traces with this name (e.g. chat)")
+    args = parser.parse_args()
+
+    records = []
+    for path in args.paths:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    if args.name is None or record["name"] == args.name:
+                        records.append(record)
+    print(f"{len(records)} traces")
+    for group, stages in sorted(summarize(records, args.by).items()):
+        if args.by:
+            print(f"\n{args.by} = {group or '-'}")
+        print(f"{'stage':>16} {'n':>6} {'p50':>9} {'p95':>9} {'p99':>9}")
+        for stage, values in sorted(stages.items()):
+            if stage == "errors":
+                print(f"{stage:>16} {len(values):>6}")
+                continue
+            p50, p95, p99 = (percentile(values, q) for q in (50, 95, 99))
+            unit = "" if stage == "tokens/s" else " ms"
+            print(
+                f"{stage:>16} {len(values):>6} {p50:9.1f} {p95:9.1f} {p99:9.1f}{unit}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+"""Crash-safe local write-ahead spool for chat transcripts.
+
+Every turn is appended here *before* anything talks to S3, as one compact
+JSON line in the current segment file. Appends are flushed to the OS
+immediately and fsync'd in batches (every ``fsync_every`` records or when
+the owner calls ``sync()``), so writes stay fast while a crash loses at most
+the last un-synced batch.
+
+Segments roll over at ``segment_bytes``. Sealed segments are drained by an
+uploader (see ``chat_log.ChatLogShipper``) and deleted only after a
+successful upload.
+
+Several processes may share one spool directory (``uvicorn --workers N``),
+so each spool writes to its own ``<host>-<pid>-<n>/`` subdirectory and only ever
+drains that one, holding an exclusive ``flock`` on its ``owner.lock`` for
+its lifetime. Another process's directory is taken over only once its lock
+can be acquired, i.e. its owner is dead: each segment is claimed with an
+atomic ``os.rename`` into the claimer's directory, so nothing is lost
+across restarts or crashes and no segment is shipped twice.
+"""
+
+import itertools
+import json
+import os
+import pathlib
+import socket
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to a pid check on the same host
+    fcntl = None
+
+SEGMENT_SUFFIX = ".log"
+LOCK_NAME = "owner.lock"
+_instances = itertools.count()
+
+
+class TranscriptSpool:
+    """Append-only, segment-based JSONL spool."""
+
+    def __init__(self, directory, segment_bytes=1 << 20, fsync_every=32):
+        self.root = pathlib.Path(directory)
+        self.owner = f"{socket.gethostname()}-{os.getpid()}-{next(_instances)}"
+        self.directory = self.root / self.owner
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._owner_lock = open(self.directory / LOCK_NAME, "a+b")
+        if fcntl is not None:
+            fcntl.flock(self._owner_lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        self.segment_bytes = segment_bytes
+        self.fsync_every = fsync_every
+        self._lock = threading.Lock()
+        self._counter = 0
+        self._file = None
+        self._path = None
+        self._size = 0
+        self._unsynced = 0
+
+    # -- writing -----------------------------------------------------------
+
+    def _open_segment(self):
+        self._counter += 1
+        name = f"seg-{time.time_ns():020d}-{self._counter:06d}{SEGMENT_SUFFIX}"
+        self._path = self.directory / name
+        self._file = open(self._path, "ab")
+        self._size = 0
+
+    def append(self, record):
+        """Append one record; returns once it is in the OS page cache."""
+        line = (
+            json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n"
+        ).encode("utf-8")
+        with self._lock:
+            if self._file is None:
+                self._open_segment()
+            self._file.write(line)
+            self._file.flush()
+            self._size += len(line)
+            self._unsynced += 1
+            if self._unsynced >= self.fsync_every:
+                self._sync_locked()
+            if self._size >= self.segment_bytes:
+                self._seal_locked()
+
+    def sync(self):
+        """fsync any records appended since the last sync."""
+        with self._lock:
+            self._sync_locked()
+
+    def _sync_locked(self):
+        if self._file is not None and self._unsynced:
+            os.fsync(self._file.fileno())
+            self._unsynced = 0
+
+    def seal(self):
+        """Close the active segment so it can be uploaded."""
+        with self._lock:
+            self._seal_locked()
+
+    def _seal_locked(self):
+        if self._file is None:
+            return
+        self._sync_locked()
+        self._file.close()
+        self._file = None
+        if self._size == 0:
+            self._path.unlink(missing_ok=True)
+        self._path = None
+
+    def has_active_data(self):
+        with self._lock:
+            return self._file is not None and self._size > 0
+
+    # -- draining ----------------------------------------------------------
+
+    def pending_segments(self):
+        """This process's sealed segments (and claimed ones), oldest first."""
+        with self._lock:
+            active = self._path
+        return sorted(
+            p for p in self.directory.glob(f"*{SEGMENT_SUFFIX}") if p != active
+        )
+
+    def claim_orphans(self):
+        """Move segments of dead processes into this spool; return them."""
+        claimed = []
+        # Segments at the top level were written before per-process spools.
+        sources = [(None, self.root)]
+        for owner_dir in self.root.iterdir():
+            if owner_dir != self.directory and (owner_dir / LOCK_NAME).exists():
+                lock = _lock_if_dead(owner_dir)
+                if lock is not None:
+                    sources.append((lock, owner_dir))
+        for lock, source in sources:
+            for path in sorted(source.glob(f"*{SEGMENT_SUFFIX}")):
+                target = self.directory / path.name
+                try:
+                    os.rename(path, target)  # atomic: one claimer wins
+                except OSError:
+                    continue
+                claimed.append(target)
+            if lock is not None:
+                _remove_owner_dir(source, lock)
+        return claimed
+
+    @staticmethod
+    def read(path):
+        """Records in ``path``; a torn final line from a crash is skipped."""
+        records = []
+        with open(path, "rb") as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    continue
+        return records
+
+    @staticmethod
+    def remove(path):
+        pathlib.Path(path).unlink(missing_ok=True)
+
+    def close(self):
+        self.seal()
+        if not any(self.directory.glob(f"*{SEGMENT_SUFFIX}")):
+            _remove_owner_dir(self.directory, self._owner_lock)
+
+
+def _lock_if_dead(owner_dir):
+    """The open, locked ``owner.lock`` of a dead owner, else ``None``."""
+    try:
+        lock = open(owner_dir / LOCK_NAME, "a+b")
+    except OSError:
+        return None
+    if fcntl is not None:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return lock
+        except OSError:
+            lock.close()  # the owner is alive
+            return None
+    host, pid, _ = (owner_dir.name.rsplit("-", 2) + ["", ""])[:3]
+    alive = host != socket.gethostname() or not pid.isdigit()
+    if not alive:
+        try:
+            os.kill(int(pid), 0)
+            alive = True
+        except ProcessLookupError:
+            pass
+        except OSError:
+            alive = True
+    if alive:
+        lock.close()
+        return None
+    return lock
+
+
+def _remove_owner_dir(owner_dir, lock):
+    """Delete an emptied owner directory (its lock file last)."""
+    try:
+        (owner_dir / LOCK_NAME).unlink(missing_ok=True)
+        lock.close()
+        owner_dir.rmdir()
+    except OSError:
+        pass